@@ -0,0 +1 @@
+default_app_config = 'service_now_cmdb.apps.ServiceNowCMDB'
@@ -2,28 +2,71 @@ from django.contrib import admin
 
 from service_now_cmdb.forms import CMDBObjectForm, CMDBObjectTypeForm, CMDBObjectFieldForm, CMDBObjectValueForm
 from service_now_cmdb.models import CMDBObjectType, CMDBObjectField, CMDBObject, CMDBObjectValue
+from service_now_cmdb.utility.pagination import EstimatedCountPaginator
 
 
 @admin.register(CMDBObjectType)
 class CMDBObjectTypeAdmin(admin.ModelAdmin):
     form = CMDBObjectTypeForm
     list_display = ['name', 'endpoint', 'content_type']
+    list_select_related = ['content_type']
 
 
 @admin.register(CMDBObjectField)
 class CMDBObjectFieldAdmin(admin.ModelAdmin):
     form = CMDBObjectFieldForm
-    list_display = ['name', 'type', 'order']
+    list_display = ['name', 'type', 'order', 'source', 'reference_type']
+    list_select_related = ['type', 'reference_type']
+    list_filter = ['type']
+
+
+class CMDBObjectValueInline(admin.TabularInline):
+    """
+    The values of an object, loaded with their fields in one query. The field choices are limited to the object's type
+    and evaluated once for the whole formset instead of once per row.
+    """
+    model = CMDBObjectValue
+    form = CMDBObjectValueForm
+    fields = ['field', 'value']
+    extra = 0
+
+    def get_queryset(self, request):
+        return super(CMDBObjectValueInline, self).get_queryset(request).select_related('field__type').order_by(
+            'field__order', 'field__name')
+
+    def get_formset(self, request, obj=None, **kwargs):
+        request._cmdb_type_id = obj.type_id if obj is not None else None
+        return super(CMDBObjectValueInline, self).get_formset(request, obj, **kwargs)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'field':
+            kwargs['queryset'] = CMDBObjectField.objects.select_related('type').filter(
+                type_id=getattr(request, '_cmdb_type_id', None))
+        formfield = super(CMDBObjectValueInline, self).formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == 'field':
+            formfield.choices = list(formfield.choices)
+        return formfield
 
 
 @admin.register(CMDBObject)
 class CMDBObjectAdmin(admin.ModelAdmin):
     form = CMDBObjectForm
-    list_display = ['type', 'service_now_id']
+    list_display = ['type', 'object_id', 'service_now_id']
+    list_select_related = ['type']
+    list_filter = ['type']
+    search_fields = ['=service_now_id']
+    readonly_fields = ['attributes']
+    inlines = [CMDBObjectValueInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(CMDBObjectValue)
 class CMDBObjectValueAdmin(admin.ModelAdmin):
     form = CMDBObjectValueForm
     list_display = ['object', 'field', 'value']
-
+    list_select_related = ['object__type', 'field__type']
+    list_filter = ['field__type']
+    raw_id_fields = ['object', 'field']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,85 @@
+import base64
+import json
+
+
+def encode_cursor(pk):
+    """
+    :param pk: id of the last object of a page
+    :return: opaque cursor of the next page
+    """
+    return base64.urlsafe_b64encode(str(pk).encode('ascii')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    :param cursor: value of the cursor parameter
+    :return: id after which the page starts
+    :raises ValueError: if the cursor is malformed
+    """
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('ascii'))
+    except (TypeError, ValueError):
+        raise ValueError("Invalid cursor.")
+
+
+def serialize_object(cmdb_object, fields=None):
+    """
+    :param cmdb_object: CMDBObject loaded with with_key_values
+    :param fields: field names to include, all by default
+    :return: Dictionary
+    """
+    values = cmdb_object.key_value
+    if fields is not None:
+        values = {name: value for name, value in values.items() if name in fields}
+    return {
+        'id': cmdb_object.pk,
+        'type': cmdb_object.type_id,
+        'object_id': cmdb_object.object_id,
+        'service_now_id': cmdb_object.service_now_id,
+        'values': values,
+    }
+
+
+def stream_page(cmdb_objects, next_url, fields=None):
+    """
+    Encode a page one object at a time so a large page is never held as one string.
+
+    :param cmdb_objects: list of CMDBObject
+    :param next_url: url of the next page, or None
+    :param fields: field names to include, all by default
+    :return: Generator of JSON text chunks
+    """
+    yield '{"results": ['
+    for i, cmdb_object in enumerate(cmdb_objects):
+        yield (',' if i else '') + json.dumps(serialize_object(cmdb_object, fields))
+    yield '], "next": {}}}'.format(json.dumps(next_url))
+
+
+def read_records(stream, ndjson):
+    """
+    Decode upsert records. NDJSON is read one line at a time, so the body is never decoded as a whole.
+
+    :param stream: file like object, e.g. the request
+    :param ndjson: whether the body is NDJSON rather than a JSON array
+    :return: Generator of records, or of ValueError for the records that are not valid JSON
+    :raises ValueError: if a JSON array body cannot be decoded
+    """
+    if not ndjson:
+        try:
+            records = json.loads(stream.read().decode('utf-8'))
+        except (UnicodeError, ValueError):
+            raise ValueError("The body is not valid JSON.")
+        if not isinstance(records, list):
+            raise ValueError("The body must be a JSON array.")
+        for record in records:
+            yield record
+        return
+
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line.decode('utf-8'))
+        except (UnicodeError, ValueError):
+            yield ValueError("The line is not valid JSON.")
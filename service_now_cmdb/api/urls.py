@@ -0,0 +1,11 @@
+from django.conf.urls import url
+
+from service_now_cmdb.api import views
+
+app_name = 'api'
+
+urlpatterns = [
+    url(r'^objects/$', views.CMDBObjectListView.as_view(), name='object-list'),
+    url(r'^objects/bulk/$', views.CMDBObjectUpsertView.as_view(), name='object-upsert'),
+    url(r'^objects/(?P<pk>\d+)/$', views.CMDBObjectDetailView.as_view(), name='object-detail'),
+]
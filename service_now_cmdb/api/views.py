@@ -0,0 +1,204 @@
+import calendar
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.http import JsonResponse, StreamingHttpResponse, Http404
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date
+from django.views import View
+from django.middleware.csrf import CsrfViewMiddleware
+from django.views.decorators.csrf import csrf_exempt
+
+from service_now_cmdb.api.serializers import encode_cursor, decode_cursor, serialize_object, stream_page, \
+    read_records
+from service_now_cmdb.mappers import attach_source_values
+from service_now_cmdb.models import CMDBObject, CMDBObjectType
+from service_now_cmdb.schema import registry
+from service_now_cmdb.upsert import BulkUpserter
+
+DEFAULT_API_PAGE_SIZE = 100
+DEFAULT_API_MAX_PAGE_SIZE = 1000
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonlines')
+
+
+class APIView(View):
+    """
+    Base of the API views: JSON errors and authentication.
+    """
+
+    @staticmethod
+    def error(message, status=400):
+        return JsonResponse({'error': message}, status=status)
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return self.error("Authentication required.", status=403)
+        try:
+            return super(APIView, self).dispatch(request, *args, **kwargs)
+        except (ValueError, CMDBObjectType.DoesNotExist) as e:
+            return self.error(str(e))
+
+
+class CMDBObjectReadMixin:
+
+    @staticmethod
+    def requested_fields(request):
+        """
+        :return: set of the field names of the fields parameter, or None for every field
+        """
+        fields = request.GET.get('fields')
+        if not fields:
+            return None
+        return {name.strip() for name in fields.split(',') if name.strip()}
+
+    @staticmethod
+    def validators(request, rows, next_url=None):
+        """
+        The ETag and Last-Modified of objects, computed from (pk, type_id, modified, service_now_id) rows without
+        loading their values. Values computed from the mapped model do not change the object's modified time, so
+        pages with sourced fields get no validators.
+
+        :return: tuple of the ETag and the Last-Modified timestamp, or (None, None)
+        """
+        if not rows:
+            return None, None
+        for type_id in {row[1] for row in rows}:
+            if registry.get_for_type(type_id).sourced_fields:
+                return None, None
+        digest = hashlib.sha1(json.dumps([
+            request.GET.get('fields', ''), next_url, [[row[0], row[2].isoformat(), row[3]] for row in rows]
+        ]).encode('utf-8'))
+        last_modified = calendar.timegm(max(row[2] for row in rows).utctimetuple())
+        return '"{}"'.format(digest.hexdigest()), last_modified
+
+    @staticmethod
+    def load(pks, fields):
+        """
+        Load objects with their values in a constant number of queries.
+
+        :return: list of CMDBObject ordered by pk
+        """
+        cmdb_objects = list(CMDBObject.objects.filter(pk__in=pks).with_key_values(fields).order_by('pk'))
+        return attach_source_values(cmdb_objects)
+
+    @staticmethod
+    def conditional_response(request, etag, last_modified):
+        """
+        :return: a 304 or 412 response when the request's conditions allow it, otherwise None
+        """
+        if etag is None:
+            return None
+        return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+    @staticmethod
+    def add_validators(response, etag, last_modified):
+        if etag is not None:
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class CMDBObjectListView(CMDBObjectReadMixin, APIView):
+    """
+    GET the CMDB objects with their values, ordered by id.
+
+    Parameters: type (id or name), service_now_id, object_id, fields (comma separated field names), limit and cursor
+    (the next url of the previous page). A page is read with a query for the validators, one for the objects, one for
+    their values and one per type with sourced fields, and is streamed.
+    """
+
+    def get(self, request):
+        queryset = CMDBObject.objects.order_by('pk')
+        cmdb_type = request.GET.get('type')
+        if cmdb_type:
+            lookup = {'pk': cmdb_type} if cmdb_type.isdigit() else {'name': cmdb_type}
+            queryset = queryset.filter(type=CMDBObjectType.objects.get(**lookup))
+        for name in ('service_now_id', 'object_id'):
+            if request.GET.get(name):
+                queryset = queryset.filter(**{name: request.GET[name]})
+        if request.GET.get('cursor'):
+            queryset = queryset.filter(pk__gt=decode_cursor(request.GET['cursor']))
+
+        limit = int(request.GET.get('limit') or getattr(settings, 'SERVICE_NOW_API_PAGE_SIZE', DEFAULT_API_PAGE_SIZE))
+        limit = max(1, min(limit, getattr(settings, 'SERVICE_NOW_API_MAX_PAGE_SIZE', DEFAULT_API_MAX_PAGE_SIZE)))
+        rows = list(queryset.values_list('pk', 'type_id', 'modified', 'service_now_id')[:limit + 1])
+        has_next = len(rows) > limit
+        rows = rows[:limit]
+
+        next_url = None
+        if has_next:
+            query = request.GET.copy()
+            query['cursor'] = encode_cursor(rows[-1][0])
+            next_url = request.build_absolute_uri("{}?{}".format(request.path, query.urlencode()))
+
+        etag, last_modified = self.validators(request, rows, next_url)
+        conditional = self.conditional_response(request, etag, last_modified)
+        if conditional is not None:
+            return self.add_validators(conditional, etag, last_modified)
+
+        fields = self.requested_fields(request)
+        cmdb_objects = self.load([row[0] for row in rows], fields)
+        response = StreamingHttpResponse(stream_page(cmdb_objects, next_url, fields), content_type='application/json')
+        return self.add_validators(response, etag, last_modified)
+
+
+class CMDBObjectDetailView(CMDBObjectReadMixin, APIView):
+    """
+    GET one CMDB object with its values. Accepts the fields parameter.
+    """
+
+    def get(self, request, pk):
+        rows = list(CMDBObject.objects.filter(pk=pk).values_list('pk', 'type_id', 'modified', 'service_now_id'))
+        if not rows:
+            raise Http404("No CMDB object with id {}.".format(pk))
+
+        etag, last_modified = self.validators(request, rows)
+        conditional = self.conditional_response(request, etag, last_modified)
+        if conditional is not None:
+            return self.add_validators(conditional, etag, last_modified)
+
+        fields = self.requested_fields(request)
+        response = JsonResponse(serialize_object(self.load([rows[0][0]], fields)[0], fields))
+        return self.add_validators(response, etag, last_modified)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class CMDBObjectUpsertView(APIView):
+    """
+    POST records {"type": <id or name>, "object_id": <mapped model id>, "fields": {<name>: <value>}} as NDJSON, one
+    record per line, or as a JSON array. Objects are created when missing and their values created or updated in
+    bulk. With ?queue=1 the objects whose values changed are queued for a push.
+
+    Invalid records are skipped and reported by their position. Clients authenticated by a session cookie must pass
+    the CSRF check; the view is only exempt for the other authentication schemes, which a browser does not replay.
+    """
+
+    @staticmethod
+    def passes_csrf_check(request):
+        """
+        :return: False for a session authenticated request that fails the CSRF check, otherwise True
+        """
+        session = getattr(request, 'session', None)
+        if session is None or not session.get(SESSION_KEY):
+            return True
+        check = CsrfViewMiddleware()
+        check.process_request(request)
+        return check.process_view(request, None, (), {}) is None
+
+    def post(self, request):
+        if not self.passes_csrf_check(request):
+            return self.error("CSRF verification failed.", status=403)
+        if not request.user.has_perm('service_now_cmdb.change_cmdbobject'):
+            return self.error("Permission denied.", status=403)
+
+        ndjson = request.content_type in NDJSON_CONTENT_TYPES
+        if not ndjson and request.content_type != 'application/json':
+            return self.error("Send application/json or {}.".format(", ".join(NDJSON_CONTENT_TYPES)), status=415)
+        upserter = BulkUpserter(queue=request.GET.get('queue') in ('1', 'true'),
+                                batch_size=getattr(settings, 'SERVICE_NOW_API_UPSERT_BATCH_SIZE', None))
+        result = upserter.run(read_records(request, ndjson))
+        status = 400 if result['errors'] and len(result['errors']) == result['received'] else 200
+        return JsonResponse(result, status=status)
@@ -1,9 +1,19 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ServiceNowCMDB(AppConfig):
-    name = 'service-now-cmdb'
+    name = 'service_now_cmdb'
     verbose_name = 'ServiceNowCMDB'
 
     def ready(self):
-        pass
+        # Connects the signals that invalidate the schema registry.
+        from service_now_cmdb import schema  # noqa: F401
+
+        # Also follows SERVICE_NOW_AUTO_SYNC when it changes, e.g. with override_settings.
+        from service_now_cmdb import signals
+        if getattr(settings, 'SERVICE_NOW_AUTO_SYNC', False):
+            signals.connect()
+
+        from service_now_cmdb import instrumentation
+        instrumentation.load_exporters()
@@ -0,0 +1,137 @@
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from requests import ConnectionError, Timeout, TooManyRedirects
+
+from service_now_cmdb.client import ServiceNowURLMixin, instance_url, DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
+from service_now_cmdb import instrumentation
+from service_now_cmdb.ratelimit import get_rate_limiter, endpoint_from_url, RetryPolicy, throttle_stats
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+DEFAULT_CONCURRENCY = 16
+
+
+async def run_sync(func, *args):
+    """
+    Run blocking code, such as ORM queries or a token refresh, in a thread so it does not stall the event loop. The
+    database connection the thread opened is closed afterwards.
+
+    :param func:
+    :return: the result of func(*args)
+    """
+    def call():
+        try:
+            return func(*args)
+        finally:
+            connection.close()
+
+    return await asyncio.get_event_loop().run_in_executor(None, call)
+
+
+class AsyncServiceNowClient(ServiceNowURLMixin):
+    """
+    An asyncio ServiceNow client built on httpx. A semaphore bounds the number of requests in flight.
+
+    Transport errors are raised as the matching requests exceptions so callers handle both clients the same way.
+
+    Usage:
+        async with AsyncServiceNowClient() as client:
+            await cmdb_object.apost(access_token, client)
+    """
+
+    def __init__(self, domain=None, concurrency=None, connect_timeout=None, read_timeout=None, base_url=None):
+        if httpx is None:
+            raise ImproperlyConfigured("The async ServiceNow client requires httpx. Install it with 'pip install httpx'.")
+        self.domain = domain or getattr(settings, 'SERVICE_NOW_DOMAIN', None)
+        self.base_url = instance_url(self.domain, base_url)
+        self.concurrency = concurrency or getattr(settings, 'SERVICE_NOW_ASYNC_CONCURRENCY', DEFAULT_CONCURRENCY)
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        timeout = httpx.Timeout(
+            read_timeout or getattr(settings, 'SERVICE_NOW_READ_TIMEOUT', DEFAULT_READ_TIMEOUT),
+            connect=connect_timeout or getattr(settings, 'SERVICE_NOW_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT),
+        )
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        self.session = httpx.AsyncClient(timeout=timeout, limits=limits)
+        self.retry_policy = RetryPolicy()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _send_once(self, method, url, data=None, **kwargs):
+        async with self.semaphore:
+            try:
+                return await self.session.request(method, url, content=data, **kwargs)
+            except httpx.TooManyRedirects as e:
+                raise TooManyRedirects(str(e))
+            except httpx.TimeoutException as e:
+                raise Timeout(str(e))
+            except httpx.TransportError as e:
+                raise ConnectionError(str(e))
+
+    async def request(self, method, url, **kwargs):
+        """
+        Async variant of ServiceNowClient.request. Waiting for the rate limiter or a retry does not hold a slot of the
+        semaphore.
+        """
+        limiter = get_rate_limiter()
+        endpoint = endpoint_from_url(url)
+        attempt = 0
+        start = time.perf_counter()
+        while True:
+            wait = limiter.reserve(endpoint)
+            if wait:
+                await asyncio.sleep(wait)
+            r = await self._send_once(method, url, **kwargs)
+            delay = self.retry_policy.delay(r, attempt)
+            if delay is None:
+                instrumentation.record_request(method, endpoint, r.status_code, time.perf_counter() - start,
+                                               len(kwargs.get('data') or ''), attempt)
+                return r
+            throttle_stats.record_retry(delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    async def aresolve_token(access_token):
+        """
+        Async variant of resolve_token. A cached token is used as it is, a refresh runs in a thread.
+
+        :param access_token: access token or TokenProvider
+        :return: String
+        """
+        if not hasattr(access_token, 'refresh'):
+            return access_token
+        return access_token.peek() or await run_sync(access_token.get)
+
+    async def send(self, method, url, access_token, **kwargs):
+        """
+        Async variant of ServiceNowClient.send.
+        """
+        token = await self.aresolve_token(access_token)
+        r = await self.request(method, url, headers=self.headers(token), **kwargs)
+        if r.status_code == 401 and hasattr(access_token, 'refresh'):
+            token = await run_sync(access_token.refresh, token)
+            r = await self.request(method, url, headers=self.headers(token), **kwargs)
+        return r
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    async def put(self, url, **kwargs):
+        return await self.request('PUT', url, **kwargs)
+
+    async def close(self):
+        await self.session.aclose()
@@ -0,0 +1,291 @@
+import base64
+import json
+import threading
+import time
+import uuid
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+
+from service_now_cmdb import instrumentation
+from service_now_cmdb.ratelimit import get_rate_limiter, endpoint_from_url, RetryPolicy, throttle_stats
+
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 30
+DEFAULT_BATCH_SIZE = 100
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that can report how often a pooled connection was reused.
+    """
+
+    def pool_stats(self):
+        """
+        A request served by an already open connection is a hit, a request that had to open a new connection is a miss.
+
+        :return: Dictionary
+        """
+        requests_made = 0
+        connections_opened = 0
+        pools = self.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_made += pool.num_requests
+            connections_opened += pool.num_connections
+        return {
+            'hits': max(requests_made - connections_opened, 0),
+            'misses': connections_opened,
+            'requests': requests_made,
+        }
+
+
+def instance_url(domain=None, base_url=None):
+    """
+    The root of every ServiceNow call: the given base_url, else SERVICE_NOW_BASE_URL, else the instance of the domain.
+
+    :param domain: instance name, e.g. companyname for companyname.service-now.com
+    :param base_url: e.g. http://127.0.0.1:8080 for a local simulator
+    :return: String without a trailing slash
+    """
+    base_url = base_url or getattr(settings, 'SERVICE_NOW_BASE_URL', None)
+    if not base_url:
+        if not domain:
+            raise ImproperlyConfigured("Set SERVICE_NOW_DOMAIN or SERVICE_NOW_BASE_URL.")
+        base_url = "https://{}.service-now.com".format(domain)
+    return base_url.rstrip('/')
+
+
+class ServiceNowURLMixin:
+    """
+    URL and payload helpers shared by the sync and async ServiceNow clients. Expects a base_url attribute.
+    """
+
+    def url(self, path):
+        """
+        :param path: path relative to the instance, e.g. /api/now/table/cmdb_ci
+        :return: String
+        """
+        return "{}/{}".format(self.base_url, path.lstrip('/'))
+
+    def table_url(self, endpoint, sys_id=None):
+        """
+        :param endpoint: ServiceNow table name
+        :param sys_id:
+        :return: String
+        """
+        if sys_id:
+            return self.url("api/now/table/{}/{}".format(endpoint, sys_id))
+        return self.url("api/now/table/{}".format(endpoint))
+
+    @staticmethod
+    def headers(access_token=None, content_type="application/json"):
+        headers = {
+            'Content-Type': content_type,
+            'Accept': "application/json",
+        }
+        if access_token:
+            headers['Authorization'] = 'Bearer {}'.format(access_token)
+        return headers
+
+    @staticmethod
+    def resolve_token(access_token):
+        """
+        :param access_token: access token or TokenProvider
+        :return: String
+        """
+        if hasattr(access_token, 'refresh'):
+            return access_token.get()
+        return access_token
+
+    @staticmethod
+    def batch_request(request_id, method, path, body=None):
+        """
+        A single sub request of a Batch API call.
+
+        :param request_id: used to match the sub response back to the caller
+        :param method:
+        :param path: path relative to the instance, e.g. /api/now/table/cmdb_ci
+        :param body: Dictionary
+        :return: Dictionary
+        """
+        rest_request = {
+            'id': str(request_id),
+            'method': method,
+            'url': '/{}'.format(path.lstrip('/')),
+            'headers': [
+                {'name': 'Content-Type', 'value': 'application/json'},
+                {'name': 'Accept', 'value': 'application/json'},
+            ],
+        }
+        if body is not None:
+            rest_request['body'] = base64.b64encode(json.dumps(body).encode('utf-8')).decode('ascii')
+        return rest_request
+
+
+class ServiceNowClient(ServiceNowURLMixin):
+    """
+    A keep-alive, connection pooled HTTP session used for every call to ServiceNow.
+    """
+
+    def __init__(self, domain=None, pool_connections=None, pool_size=None, connect_timeout=None, read_timeout=None,
+                 base_url=None):
+        self.domain = domain or getattr(settings, 'SERVICE_NOW_DOMAIN', None)
+        self.base_url = instance_url(self.domain, base_url)
+        self.timeout = (
+            connect_timeout or getattr(settings, 'SERVICE_NOW_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT),
+            read_timeout or getattr(settings, 'SERVICE_NOW_READ_TIMEOUT', DEFAULT_READ_TIMEOUT),
+        )
+        self.adapter = CountingHTTPAdapter(
+            pool_connections=pool_connections or getattr(settings, 'SERVICE_NOW_POOL_CONNECTIONS',
+                                                         DEFAULT_POOL_CONNECTIONS),
+            pool_maxsize=pool_size or getattr(settings, 'SERVICE_NOW_POOL_SIZE', DEFAULT_POOL_SIZE),
+            pool_block=True,
+        )
+        self.session = requests.Session()
+        # The session is shared by every user's token, so ServiceNow session cookies must never be stored.
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self.retry_policy = RetryPolicy()
+
+    def batch(self, access_token, rest_requests):
+        """
+        Send many Table API operations in one round trip through /api/now/v1/batch.
+
+        :param access_token: access token or TokenProvider
+        :param rest_requests: list of dictionaries built with batch_request
+        :return: Dictionary of sub request id -> (status code, decoded body)
+        """
+        r = self.send(
+            'POST',
+            self.url("api/now/v1/batch"),
+            access_token,
+            data=json.dumps({
+                'batch_request_id': uuid.uuid4().hex,
+                'rest_requests': rest_requests,
+            })
+        )
+        if r.status_code == 401:
+            raise ValueError("Bad Access Token")
+        if r.status_code != 200:
+            raise ValueError("Batch request failed with status {}".format(r.status_code))
+
+        resp = json.loads(r.text)
+        results = dict()
+        for serviced in resp.get('serviced_requests', []):
+            body = serviced.get('body')
+            if body:
+                body = json.loads(base64.b64decode(body).decode('utf-8'))
+            results[serviced['id']] = (serviced['status_code'], body)
+        for unserviced in resp.get('unserviced_requests', []):
+            results[str(unserviced)] = (None, None)
+        return results
+
+    def request(self, method, url, **kwargs):
+        """
+        Send a request within the configured rate limits. 429 and 503 responses are retried after Retry-After or an
+        exponential backoff with jitter.
+
+        :return: Response
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        limiter = get_rate_limiter()
+        endpoint = endpoint_from_url(url)
+        attempt = 0
+        start = time.perf_counter()
+        while True:
+            wait = limiter.reserve(endpoint)
+            if wait:
+                time.sleep(wait)
+            r = self.session.request(method, url, **kwargs)
+            delay = self.retry_policy.delay(r, attempt)
+            if delay is None:
+                instrumentation.record_request(method, endpoint, r.status_code, time.perf_counter() - start,
+                                               len(kwargs.get('data') or ''), attempt)
+                return r
+            throttle_stats.record_retry(delay)
+            time.sleep(delay)
+            attempt += 1
+
+    def send(self, method, url, access_token, **kwargs):
+        """
+        Send a request authorized with the access token. When a TokenProvider is given, a 401 is retried once with a
+        refreshed token.
+
+        :param method:
+        :param url:
+        :param access_token: access token or TokenProvider
+        :return: Response
+        """
+        token = self.resolve_token(access_token)
+        r = self.request(method, url, headers=self.headers(token), **kwargs)
+        if r.status_code == 401 and hasattr(access_token, 'refresh'):
+            token = access_token.refresh(stale=token)
+            r = self.request(method, url, headers=self.headers(token), **kwargs)
+        return r
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    @property
+    def stats(self):
+        """
+        Connection pool hit/miss counters.
+
+        :return: Dictionary
+        """
+        return self.adapter.pool_stats()
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Return the per process ServiceNow client, creating it on first use.
+
+    :return: ServiceNowClient
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ServiceNowClient()
+    return _client
+
+
+def reset_client():
+    """
+    Close and drop the per process client. Used after a fork or when the settings change.
+    """
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+
+
+@receiver(setting_changed)
+def reset_client_on_setting_changed(setting, **kwargs):
+    if setting.startswith('SERVICE_NOW_'):
+        reset_client()
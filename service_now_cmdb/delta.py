@@ -0,0 +1,54 @@
+import hashlib
+import json
+import threading
+
+
+def payload_hash(payload):
+    """
+    A stable hash of a key_value payload.
+
+    :param payload: Dictionary
+    :return: String
+    """
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def changed_fields(payload, snapshot):
+    """
+    :param payload: Dictionary of the current values
+    :param snapshot: Dictionary of the values last pushed
+    :return: Dictionary of the fields whose value differs from the snapshot, with the fields that are no longer in
+        the payload cleared to ''
+    """
+    changed = {name: value for name, value in payload.items() if snapshot.get(name) != value}
+    changed.update((name, '') for name in snapshot if name not in payload and snapshot[name] != '')
+    return changed
+
+
+class PushStats:
+    """
+    Thread safe counters of the pushes that were sent and the ones skipped because nothing changed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.skipped = 0
+
+    def record(self, sent):
+        with self._lock:
+            if sent:
+                self.sent += 1
+            else:
+                self.skipped += 1
+
+    def as_dict(self):
+        return {'sent': self.sent, 'skipped': self.skipped}
+
+    def reset(self):
+        with self._lock:
+            self.sent = 0
+            self.skipped = 0
+
+
+push_stats = PushStats()
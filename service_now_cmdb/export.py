@@ -0,0 +1,167 @@
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from itertools import groupby
+
+from django.conf import settings
+from django.db import connection
+
+from service_now_cmdb import instrumentation
+from service_now_cmdb.client import get_client, DEFAULT_BATCH_SIZE
+from service_now_cmdb.delta import payload_hash, push_stats
+from service_now_cmdb.mappers import source_values
+from service_now_cmdb.models import CMDBObject, CMDBObjectValue
+from service_now_cmdb.models.cmdb import json_storage
+from service_now_cmdb.references import resolve_many
+from service_now_cmdb.schema import registry
+from service_now_cmdb.utility.bulk import chunks, bulk_update
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXPORT_CONCURRENCY = 4
+
+ExportPayload = namedtuple('ExportPayload', ['object_id', 'service_now_id', 'values'])
+
+
+class StreamingExporter:
+    """
+    Pushes every object of one CMDB object type with memory that does not grow with the table.
+
+    The objects and their values are read with ordered QuerySet.iterator() queries, which use server side cursors on
+    PostgreSQL, and merged into one payload per object by a generator. Sourced and reference fields are resolved per
+    batch. Payloads are sent in Batch API requests with at most `concurrency` batches in flight, and objects whose
+    values did not change since the last push are skipped.
+    """
+
+    def __init__(self, cmdb_type, access_token, client=None, batch_size=None, concurrency=None):
+        self.schema = registry.get_for_type(cmdb_type)
+        self.access_token = access_token
+        self.client = client or get_client()
+        self.batch_size = batch_size or getattr(settings, 'SERVICE_NOW_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+        self.concurrency = concurrency or getattr(settings, 'SERVICE_NOW_EXPORT_CONCURRENCY',
+                                                  DEFAULT_EXPORT_CONCURRENCY)
+
+    def objects(self):
+        """
+        :return: iterator of (pk, mapped model id, service_now_id, pushed_hash) ordered by pk
+        """
+        return CMDBObject.objects.filter(type_id=self.schema.type_id).order_by('pk').values_list(
+            'pk', 'object_id', 'service_now_id', 'pushed_hash'
+        ).iterator()
+
+    def rows(self):
+        """
+        :return: iterator of (object pk, field name, value) ordered by object pk
+        """
+        return CMDBObjectValue.objects.filter(object__type_id=self.schema.type_id).order_by(
+            'object_id', 'field__order', 'field__name'
+        ).values_list('object_id', 'field__name', 'value').iterator()
+
+    def grouped(self):
+        """
+        Merge join the objects with their stored values. Both cursors are ordered by object pk, so only one object is
+        held in memory at a time. With the json storage the values come with the object row.
+
+        :return: Generator of (pk, mapped model id, service_now_id, pushed_hash, values)
+        """
+        if json_storage():
+            field_names = self.schema.field_names
+            rows = CMDBObject.objects.filter(type_id=self.schema.type_id).order_by('pk').values_list(
+                'pk', 'object_id', 'service_now_id', 'pushed_hash', 'attributes'
+            ).iterator()
+            for pk, object_id, service_now_id, pushed_hash, attributes in rows:
+                attributes = attributes or {}
+                yield pk, object_id, service_now_id, pushed_hash, {
+                    name: attributes[name] for name in field_names if name in attributes}
+            return
+
+        groups = groupby(self.rows(), key=lambda row: row[0])
+        current = next(groups, None)
+        for pk, object_id, service_now_id, pushed_hash in self.objects():
+            while current is not None and current[0] < pk:
+                current = next(groups, None)
+            values = dict()
+            if current is not None and current[0] == pk:
+                values = {name: value for _, name, value in current[1]}
+                current = next(groups, None)
+            yield pk, object_id, service_now_id, pushed_hash, values
+
+    def payloads(self):
+        """
+        :return: Generator of ExportPayload for the objects that changed since their last push
+        """
+        for chunk in chunks(self.grouped(), self.batch_size):
+            sources = source_values(self.schema, [row[1] for row in chunk])
+            for row in chunk:
+                row[4].update(sources.get(row[1], {}))
+            resolved = resolve_many(self.schema, [row[4] for row in chunk])
+            for (pk, object_id, service_now_id, pushed_hash, _), values in zip(chunk, resolved):
+                if not values:
+                    continue
+                if pushed_hash and pushed_hash == payload_hash(values):
+                    push_stats.record(sent=False)
+                    continue
+                yield ExportPayload(pk, service_now_id, values)
+
+    def _send(self, batch):
+        rest_requests = []
+        for payload in batch:
+            if payload.service_now_id:
+                path = "api/now/table/{}/{}".format(self.schema.endpoint, payload.service_now_id)
+                rest_requests.append(self.client.batch_request(payload.object_id, 'PUT', path, payload.values))
+            else:
+                path = "api/now/table/{}".format(self.schema.endpoint)
+                rest_requests.append(self.client.batch_request(payload.object_id, 'POST', path, payload.values))
+        try:
+            return self.client.batch(self.access_token, rest_requests)
+        finally:
+            # The token provider may have queried the database from this worker thread.
+            connection.close()
+
+    def _collect(self, future, batch, stats):
+        """
+        Store the results of one sent batch. A batch that failed as a whole is counted, and the others are still
+        stored, so the sys_ids of records they created are never lost.
+        """
+        try:
+            responses = future.result()
+        except Exception as e:
+            logger.warning("Export batch of %s objects to '%s' failed: %s", len(batch), self.schema.endpoint, e)
+            stats['failed'] += len(batch)
+            return
+        self._store(batch, responses, stats)
+
+    def _store(self, batch, responses, stats):
+        pushed = []
+        for payload in batch:
+            status_code, body = responses.get(str(payload.object_id), (None, None))
+            if status_code not in (200, 201) or not body:
+                stats['failed'] += 1
+                continue
+            cmdb_object = CMDBObject(pk=payload.object_id, service_now_id=body['result']['sys_id'])
+            cmdb_object.mark_pushed(payload.values)
+            push_stats.record(sent=True)
+            pushed.append(cmdb_object)
+        bulk_update(pushed, ['service_now_id', 'pushed_hash', 'pushed_values'])
+        stats['sent'] += len(pushed)
+
+    def run(self, payloads=None):
+        """
+        :param payloads: iterable of ExportPayload to send instead of the changed objects of the type
+        :return: Dictionary with the number of sent and failed objects
+        """
+        if payloads is None:
+            payloads = self.payloads()
+        stats = {'sent': 0, 'failed': 0}
+        in_flight = dict()
+        with instrumentation.operation('export', self.schema.endpoint), \
+                ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for batch in chunks(payloads, self.batch_size):
+                if len(in_flight) >= self.concurrency:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._collect(future, in_flight.pop(future), stats)
+                in_flight[executor.submit(self._send, batch)] = batch
+            for future, batch in in_flight.items():
+                self._collect(future, batch, stats)
+        return stats
@@ -12,7 +12,7 @@ class CMDBObjectTypeForm(forms.ModelForm):
 class CMDBObjectFieldForm(forms.ModelForm):
     class Meta:
         model = CMDBObjectField
-        fields = ['name', 'type', 'order']
+        fields = ['name', 'type', 'order', 'source', 'reference_type']
 
 
 class CMDBObjectForm(forms.ModelForm):
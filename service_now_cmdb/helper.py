@@ -1,19 +1,39 @@
+import asyncio
 import getpass
+import json
 
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
-
-from config import settings
-from service_now_cmdb.models import CMDBObjectType, CMDBObject, CMDBObjectValue, ServiceNowToken, CMDBObjectField
+from django.core.exceptions import ValidationError
+from django.db import transaction, IntegrityError
+from requests import RequestException
+
+from service_now_cmdb import instrumentation
+from service_now_cmdb.async_client import AsyncServiceNowClient, run_sync
+from service_now_cmdb.client import get_client, DEFAULT_BATCH_SIZE
+from service_now_cmdb.delta import push_stats
+from service_now_cmdb.models import CMDBObjectType, CMDBObject, CMDBObjectValue, ServiceNowToken, CMDBObjectField, \
+    CMDBOutbox
+from service_now_cmdb.mappers import attach_source_values
+from service_now_cmdb.models.cmdb import json_storage
+from service_now_cmdb.planner import SyncPlanner
+from service_now_cmdb.pull import TablePuller
+from service_now_cmdb.references import attach_references
+from service_now_cmdb.schema import registry
+from service_now_cmdb.tokens import get_token_provider
+from service_now_cmdb.utility.bulk import chunks, bulk_update
 
 
 class SNCMDBHandler:
 
     def __init__(self, user, *args, **kwargs):
         self.user = user
-        self.domain = settings.SERVICE_NOW_DOMAIN
+        self.domain = getattr(settings, 'SERVICE_NOW_DOMAIN', None)
         self.client_id = settings.SERVICE_NOW_CLIENT_ID
         self.client_secret = settings.SERVICE_NOW_CLIENT_SECRET
         self.token = None
+        self.token_provider = None
+        self.client = get_client()
 
     def create_credentials(self, username):
         """
@@ -25,16 +45,29 @@ class SNCMDBHandler:
         password = getpass.getpass(prompt='Enter your password: ')
         data = ServiceNowToken.get_credentials(username, password)
         self.token = ServiceNowToken.create_token(data, self.user)
+        self.token_provider = get_token_provider(self.user)
+        self.token_provider.reset()
         return True
 
     def get_credentials(self):
         """
+        Use the per process token provider of the user, which caches the token and refreshes it before it expires.
 
         :return:
         """
-        self.token = ServiceNowToken.objects.get(user=self.user)
+        self.token_provider = get_token_provider(self.user)
+        self.token = self.token_provider.token
         return True
 
+    @property
+    def access_token(self):
+        """
+        The token provider when there is one, otherwise the token set on the handler.
+
+        :return:
+        """
+        return self.token_provider or self.token
+
     @staticmethod
     def create_cmdb_object_type(model, endpoint):
         """
@@ -77,11 +110,16 @@ class SNCMDBHandler:
         :param order:
         :return:
         """
-        cmdb_object_field = CMDBObjectField.objects.create(
-            name=name,
-            type=cmdb_type,
-            order=order
-        )
+        try:
+            with transaction.atomic():
+                cmdb_object_field = CMDBObjectField.objects.create(
+                    name=name,
+                    type=cmdb_type,
+                    order=order
+                )
+        except IntegrityError:
+            raise ValidationError("There already exists a field '{}' associated with this object type '{}'.".format(
+                name, cmdb_type.name))
         return cmdb_object_field
 
     @staticmethod
@@ -99,7 +137,14 @@ class SNCMDBHandler:
             cmdb_object_field.name = new_name
         if order:
             cmdb_object_field.order = order
-        cmdb_object_field.save()
+        with transaction.atomic():
+            cmdb_object_field.save()
+            if new_name and new_name != name:
+                if json_storage():
+                    CMDBObject.objects.rename_attribute(cmdb_type.pk, name, new_name)
+                else:
+                    CMDBObject.objects.touch(list(cmdb_object_field.cmdbobjectvalue_set.values_list('object_id',
+                                                                                                    flat=True)))
 
         return cmdb_object_field
 
@@ -112,6 +157,9 @@ class SNCMDBHandler:
         :param value:
         :return:
         """
+        if json_storage():
+            cmdb_object.set_field(cmdb_field.name, value)
+            return cmdb_object.get_field(cmdb_field.name)
         cmdb_object_value = CMDBObjectValue.objects.create(
             object=cmdb_object,
             field=cmdb_field,
@@ -128,6 +176,11 @@ class SNCMDBHandler:
         :param value:
         :return:
         """
+        if json_storage():
+            if cmdb_field.name not in cmdb_object.attributes:
+                raise CMDBObjectValue.DoesNotExist
+            cmdb_object.set_field(cmdb_field.name, value)
+            return cmdb_object.get_field(cmdb_field.name)
         cmdb_object_value = CMDBObjectValue.objects.get(
             object=cmdb_object,
             field=cmdb_field
@@ -136,21 +189,35 @@ class SNCMDBHandler:
         cmdb_object_value.save()
         return cmdb_object_value
 
+    @staticmethod
+    def bulk_set_values(items, batch_size=None):
+        """
+        Create or update many CMDB object values with a few bulk statements.
+
+        :param items: iterable of (cmdb_object, field name, value)
+        :param batch_size:
+        :return: tuple of the number of created and updated values
+        """
+        if batch_size:
+            return CMDBObjectValue.objects.bulk_set(items, batch_size=batch_size)
+        return CMDBObjectValue.objects.bulk_set(items)
+
     def create_cmdb_object(self, model_object):
         """
 
         :param model_object:
         :return:
         """
-        model = ContentType.objects.get_for_model(model_object)
-        cmdb_object_type = CMDBObjectType.objects.get(content_type=model.id)
+        schema = registry.get_for_model(model_object)
 
-        cmdb_object = CMDBObject.objects.create(
-            type=cmdb_object_type,
-            object_id=model_object.id
-        )
+        with instrumentation.operation('create', schema.endpoint):
+            cmdb_object, _ = CMDBObject.objects.get_or_create(
+                type_id=schema.type_id,
+                object_id=model_object.id
+            )
 
-        cmdb_object.post(self.token.access_token)
+            if cmdb_object.post(self.access_token):
+                cmdb_object.save(update_fields=['service_now_id', 'pushed_hash', 'pushed_values'])
         return cmdb_object
 
     @staticmethod
@@ -162,12 +229,11 @@ class SNCMDBHandler:
         :return:
         """
 
-        model = ContentType.objects.get_for_model(model_object)
-        cmdb_object_type = CMDBObjectType.objects.get(content_type=model.id)
+        schema = registry.get_for_model(model_object)
         object_id = model_object.id
 
         cmdb_object_exists = CMDBObject.objects.filter(
-            type=cmdb_object_type,
+            type_id=schema.type_id,
             object_id=object_id
         ).exists()
 
@@ -182,15 +248,251 @@ class SNCMDBHandler:
         :param model_object:
         :return:
         """
-        model = ContentType.objects.get_for_model(model_object)
-        cmdb_object_type = CMDBObjectType.objects.get(content_type=model.id)
+        schema = registry.get_for_model(model_object)
         object_id = model_object.id
 
-        cmdb_object = CMDBObject.objects.get(
-            type=cmdb_object_type,
-            object_id=object_id
-        )
+        with instrumentation.operation('update', schema.endpoint):
+            cmdb_object = CMDBObject.objects.select_related('type').get(
+                type_id=schema.type_id,
+                object_id=object_id
+            )
 
-        cmdb_object.put(self, self.token)
+            if cmdb_object.put(self.access_token):
+                cmdb_object.save(update_fields=['service_now_id', 'pushed_hash', 'pushed_values'])
 
         return True
+
+    def pull_cmdb_object_type(self, cmdb_type, full=False):
+        """
+        Pull the records of the type that changed since the last pull into the local values.
+
+        :param cmdb_type: CMDBObjectType or its id
+        :param full: ignore the sys_updated_on watermark
+        :return: Dictionary with the number of records seen and values created and updated
+        """
+        puller = TablePuller(cmdb_type, self.access_token, client=self.client)
+        with instrumentation.operation('pull', puller.schema.endpoint):
+            return puller.run(full=full)
+
+    @staticmethod
+    def queue_cmdb_object(model_object):
+        """
+        Usage: call inside the transaction that saves the model. The push is done later by the cmdb_sync_worker
+        command, so the request that saved the model does not wait for ServiceNow.
+
+        :param model_object:
+        :return: CMDBOutbox
+        """
+        schema = registry.get_for_model(model_object)
+        with transaction.atomic():
+            cmdb_object, _ = CMDBObject.objects.get_or_create(
+                type_id=schema.type_id,
+                object_id=model_object.id
+            )
+            return CMDBOutbox.enqueue(cmdb_object)
+
+    def push_many(self, queryset, chunk_size=None):
+        """
+        Push many CMDB objects through the ServiceNow Batch API. Objects without a service_now_id are created, the
+        rest are updated with only the fields that changed since the last push, or skipped if nothing changed. The
+        returned sys_ids are written back with one bulk update after every batch request. A batch that cannot be sent
+        because of a connection error or timeout adds its objects to failed.
+
+        :param queryset: CMDBObject QuerySet or list
+        :param chunk_size: number of objects per batch request, SERVICE_NOW_BATCH_SIZE by default
+        :return: Dictionary with the created, updated, skipped and failed objects
+        """
+        chunk_size = chunk_size or getattr(settings, 'SERVICE_NOW_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+        with instrumentation.operation('push_many') as current:
+            result = self._push_many(queryset, chunk_size)
+            current['endpoint'] = instrumentation.common_endpoint(
+                cmdb_object for cmdb_objects in result.values() for cmdb_object in cmdb_objects)
+            return result
+
+    def _push_many(self, queryset, chunk_size):
+        if hasattr(queryset, 'with_key_values'):
+            queryset = queryset.with_key_values()
+
+        result = {'created': [], 'updated': [], 'skipped': [], 'failed': []}
+        for chunk in chunks(queryset, chunk_size):
+            attach_references(attach_source_values(chunk))
+            rest_requests = []
+            pending = []
+            for cmdb_object in chunk:
+                if cmdb_object.service_now_id:
+                    payload, values = cmdb_object.delta_payload()
+                    if payload is None:
+                        push_stats.record(sent=False)
+                        result['skipped'].append(cmdb_object)
+                        continue
+                    path = "api/now/table/{}/{}".format(cmdb_object.type.endpoint, cmdb_object.service_now_id)
+                    method = 'PUT'
+                else:
+                    payload = values = cmdb_object.push_values
+                    path = "api/now/table/{}".format(cmdb_object.type.endpoint)
+                    method = 'POST'
+                rest_requests.append(self.client.batch_request(cmdb_object.pk, method, path, payload))
+                pending.append((cmdb_object, values))
+
+            if not rest_requests:
+                continue
+            try:
+                responses = self.client.batch(self.access_token, rest_requests)
+            except RequestException:
+                result['failed'].extend(cmdb_object for cmdb_object, _ in pending)
+                continue
+
+            pushed = []
+            for cmdb_object, values in pending:
+                status_code, body = responses.get(str(cmdb_object.pk), (None, None))
+                if status_code not in (200, 201) or not body:
+                    result['failed'].append(cmdb_object)
+                    continue
+                key = 'updated' if cmdb_object.service_now_id else 'created'
+                cmdb_object.service_now_id = body['result']['sys_id']
+                cmdb_object.mark_pushed(values)
+                push_stats.record(sent=True)
+                result[key].append(cmdb_object)
+                pushed.append(cmdb_object)
+
+            # Stored before the next request, so the sys_ids of created records survive a failure of a later chunk.
+            bulk_update(pushed, ['service_now_id', 'pushed_hash', 'pushed_values'])
+        return result
+
+    def delete_many(self, queryset, chunk_size=None):
+        """
+        Delete the ServiceNow records of many CMDB objects through the Batch API, then the objects. A record that is
+        already gone counts as deleted, an object without a service_now_id is only deleted locally.
+
+        :param queryset: CMDBObject QuerySet or list
+        :param chunk_size: number of objects per batch request, SERVICE_NOW_BATCH_SIZE by default
+        :return: Dictionary with the deleted and failed objects
+        """
+        chunk_size = chunk_size or getattr(settings, 'SERVICE_NOW_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+        if hasattr(queryset, 'select_related'):
+            queryset = queryset.select_related('type')
+
+        result = {'deleted': [], 'failed': []}
+        for chunk in chunks(queryset, chunk_size):
+            deleted = [cmdb_object for cmdb_object in chunk if not cmdb_object.service_now_id]
+            linked = [cmdb_object for cmdb_object in chunk if cmdb_object.service_now_id]
+            responses = dict()
+            if linked:
+                try:
+                    responses = self.client.batch(self.access_token, [
+                        self.client.batch_request(cmdb_object.pk, 'DELETE', "api/now/table/{}/{}".format(
+                            cmdb_object.type.endpoint, cmdb_object.service_now_id))
+                        for cmdb_object in linked
+                    ])
+                except RequestException:
+                    pass
+            for cmdb_object in linked:
+                status_code, _ = responses.get(str(cmdb_object.pk), (None, None))
+                if status_code in (200, 204, 404):
+                    deleted.append(cmdb_object)
+                else:
+                    result['failed'].append(cmdb_object)
+
+            CMDBObject.objects.filter(pk__in=[cmdb_object.pk for cmdb_object in deleted]).delete()
+            result['deleted'].extend(deleted)
+        return result
+
+    def push_planned(self, queryset, chunk_size=None, concurrency=None):
+        """
+        Push CMDB objects whose fields reference each other in dependency order, so every reference is sent as the
+        sys_id of the referenced object. See planner.SyncPlanner.
+
+        :param queryset: CMDBObject QuerySet or list
+        :param chunk_size: number of objects per batch request, SERVICE_NOW_BATCH_SIZE by default
+        :param concurrency: batch requests in flight, SERVICE_NOW_EXPORT_CONCURRENCY by default
+        :return: Dictionary with the counts of the planner
+        """
+        planner = SyncPlanner(self.access_token, client=self.client, batch_size=chunk_size, concurrency=concurrency)
+        return planner.run(queryset)
+
+    def _warm_token(self):
+        if hasattr(self.token_provider, 'refresh'):
+            self.token_provider.get()
+
+    def _plan_apush(self, queryset):
+        """
+        Load the objects and build their payloads, so no query runs on the event loop.
+
+        :return: tuple of the (object, endpoint, payload, values) to send and the unchanged objects
+        """
+        if hasattr(queryset, 'with_key_values'):
+            queryset = queryset.with_key_values()
+        plan = []
+        skipped = []
+        for cmdb_object in attach_references(attach_source_values(list(queryset))):
+            if cmdb_object.service_now_id:
+                payload, values = cmdb_object.delta_payload()
+                if payload is None:
+                    push_stats.record(sent=False)
+                    skipped.append(cmdb_object)
+                    continue
+            else:
+                payload = values = cmdb_object.push_values
+            plan.append((cmdb_object, cmdb_object.type.endpoint, payload, values))
+        self._warm_token()
+        return plan, skipped
+
+    async def _apush(self, client, cmdb_object, endpoint, payload, values):
+        if cmdb_object.service_now_id:
+            pushed = await cmdb_object._aput(self.access_token, client, endpoint, payload, values)
+            return 'updated' if pushed else 'failed'
+        return 'created' if await cmdb_object._apost(self.access_token, client, endpoint, values) else 'failed'
+
+    async def apush_many(self, queryset, concurrency=None):
+        """
+        Push many CMDB objects with up to `concurrency` requests in flight. Unchanged objects are skipped and the
+        push state is written back with one bulk update. The objects are loaded and written in a thread, so the event
+        loop only waits for ServiceNow.
+
+        :param queryset: CMDBObject QuerySet or list
+        :param concurrency: SERVICE_NOW_ASYNC_CONCURRENCY by default
+        :return: Dictionary with the created, updated, skipped and failed objects
+        """
+        plan, skipped = await run_sync(self._plan_apush, queryset)
+
+        result = {'created': [], 'updated': [], 'skipped': skipped, 'failed': []}
+        async with AsyncServiceNowClient(concurrency=concurrency) as client:
+            outcomes = await asyncio.gather(*[self._apush(client, *step) for step in plan], return_exceptions=True)
+
+        for (cmdb_object, _, _, _), outcome in zip(plan, outcomes):
+            if isinstance(outcome, Exception):
+                outcome = 'failed'
+            result[outcome].append(cmdb_object)
+
+        await run_sync(bulk_update, result['created'] + result['updated'],
+                       ['service_now_id', 'pushed_hash', 'pushed_values'])
+        return result
+
+    def _load_afetch(self, queryset):
+        if hasattr(queryset, 'select_related'):
+            queryset = queryset.select_related('type')
+        objects = [(cmdb_object, cmdb_object.type.endpoint) for cmdb_object in queryset if cmdb_object.service_now_id]
+        self._warm_token()
+        return objects
+
+    async def afetch_many(self, queryset, concurrency=None):
+        """
+        Fetch the ServiceNow record of many CMDB objects concurrently.
+
+        :param queryset: CMDBObject QuerySet or list
+        :param concurrency: SERVICE_NOW_ASYNC_CONCURRENCY by default
+        :return: Dictionary of CMDBObject pk -> record, or None when the record could not be fetched
+        """
+        objects = await run_sync(self._load_afetch, queryset)
+
+        async with AsyncServiceNowClient(concurrency=concurrency) as client:
+            texts = await asyncio.gather(*[o._aget(self.access_token, client, endpoint) for o, endpoint in objects],
+                                         return_exceptions=True)
+
+        records = dict()
+        for (cmdb_object, _), text in zip(objects, texts):
+            if isinstance(text, Exception) or not text:
+                records[cmdb_object.pk] = None
+            else:
+                records[cmdb_object.pk] = json.loads(text)['result']
+        return records
@@ -0,0 +1,270 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.dispatch import Signal
+from django.utils.module_loading import import_string
+
+from service_now_cmdb.delta import push_stats
+
+logger = logging.getLogger(__name__)
+
+# Sent after every HTTP request to ServiceNow and after every instrumented operation.
+# Receivers get the RequestEvent or OperationEvent as the ``event`` keyword argument.
+request_finished = Signal()
+operation_finished = Signal()
+
+RequestEvent = namedtuple('RequestEvent', ['method', 'endpoint', 'status_code', 'duration', 'payload_bytes',
+                                           'retries'])
+OperationEvent = namedtuple('OperationEvent', ['name', 'endpoint', 'duration', 'db_time', 'db_queries', 'http_time',
+                                               'http_requests', 'failed'])
+
+_callbacks = []
+_callbacks_lock = threading.Lock()
+_local = threading.local()
+
+
+def register(callback):
+    """
+    Call callback(event) for every RequestEvent and OperationEvent.
+
+    :param callback:
+    """
+    with _callbacks_lock:
+        if callback not in _callbacks:
+            _callbacks.append(callback)
+
+
+def unregister(callback):
+    with _callbacks_lock:
+        if callback in _callbacks:
+            _callbacks.remove(callback)
+
+
+def load_exporters():
+    """
+    Register the exporters listed in SERVICE_NOW_INSTRUMENTATION_EXPORTERS by dotted path.
+    """
+    for path in getattr(settings, 'SERVICE_NOW_INSTRUMENTATION_EXPORTERS', []):
+        register(import_string(path)())
+
+
+def _dispatch(signal, event):
+    # A failing exporter must not break the request or operation it reports on.
+    for callback in list(_callbacks):
+        try:
+            callback(event)
+        except Exception:
+            logger.exception("Instrumentation callback %r failed", callback)
+    for receiver, response in signal.send_robust(sender=None, event=event):
+        if isinstance(response, Exception):
+            logger.error("Instrumentation receiver %r failed: %s", receiver, response)
+
+
+def _operations():
+    if not hasattr(_local, 'operations'):
+        _local.operations = []
+    return _local.operations
+
+
+def record_request(method, endpoint, status_code, duration, payload_bytes, retries):
+    """
+    Called by the clients after each request, retries included.
+    """
+    for current in _operations():
+        current['http_time'] += duration
+        current['http_requests'] += 1
+    _dispatch(request_finished, RequestEvent(method, endpoint, status_code, duration, payload_bytes, retries))
+
+
+class _QueryTimer:
+    """
+    A database execute wrapper that counts queries and their time.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+            self.queries += 1
+
+
+def _logged_since(marker):
+    """
+    :param marker: last entry of connection.queries_log before the block, or None
+    :return: list of the entries logged after it. Only the last queries_limit queries are kept by Django.
+    """
+    queries = []
+    for query in reversed(connection.queries_log):
+        if query is marker:
+            break
+        queries.append(query)
+    return queries
+
+
+@contextmanager
+def _timed_queries():
+    timer = _QueryTimer()
+    if hasattr(connection, 'execute_wrapper'):
+        with connection.execute_wrapper(timer):
+            yield timer
+        return
+
+    # Database execute wrappers exist from Django 2.0 on, so read the queries logged by the debug cursor.
+    force_debug_cursor = connection.force_debug_cursor
+    connection.force_debug_cursor = True
+    marker = connection.queries_log[-1] if connection.queries_log else None
+    try:
+        yield timer
+    finally:
+        connection.force_debug_cursor = force_debug_cursor
+        queries = _logged_since(marker)
+        timer.queries = len(queries)
+        timer.time = sum(float(query['time']) for query in queries)
+
+
+@contextmanager
+def operation(name, endpoint=''):
+    """
+    Time a ServiceNow operation, splitting database and HTTP time, and emit an OperationEvent when it ends.
+
+    :param name: e.g. 'post', 'push_many'
+    :param endpoint: CMDBObjectType.endpoint
+    :return: Dictionary of the operation's counters; set its 'endpoint' when it is only known inside the block
+    """
+    current = {'endpoint': endpoint, 'http_time': 0.0, 'http_requests': 0}
+    _operations().append(current)
+    start = time.perf_counter()
+    failed = True
+    try:
+        with _timed_queries() as timer:
+            yield current
+        failed = False
+    finally:
+        _operations().remove(current)
+        _dispatch(operation_finished, OperationEvent(
+            name, current['endpoint'], time.perf_counter() - start, timer.time, timer.queries, current['http_time'],
+            current['http_requests'], failed
+        ))
+
+
+def common_endpoint(cmdb_objects):
+    """
+    :param cmdb_objects: iterable of CMDBObject
+    :return: the endpoint of their type, or '' when they are of several types
+    """
+    from service_now_cmdb.schema import registry
+
+    endpoints = {registry.get_for_type(type_id).endpoint for type_id in {o.type_id for o in cmdb_objects}}
+    return endpoints.pop() if len(endpoints) == 1 else ''
+
+
+class QueryReport:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.pushed = 0
+
+    @property
+    def queries_per_object(self):
+        return self.queries / self.pushed if self.pushed else float(self.queries)
+
+    def __str__(self):
+        return "{} queries in {:.3f}s for {} pushed objects ({:.1f} per object)".format(
+            self.queries, self.db_time, self.pushed, self.queries_per_object)
+
+
+@contextmanager
+def query_report():
+    """
+    Debug helper that reports the number of queries per pushed object in the block:
+
+        with query_report() as report:
+            handler.push_many(queryset)
+        print(report)
+
+    :return: QueryReport
+    """
+    report = QueryReport()
+    sent = push_stats.sent
+    with _timed_queries() as timer:
+        yield report
+    report.queries = timer.queries
+    report.db_time = timer.time
+    report.pushed = push_stats.sent - sent
+
+
+class StatsDExporter:
+    """
+    Sends timers and counters to StatsD. Requires the statsd package, configured with SERVICE_NOW_STATSD_HOST,
+    SERVICE_NOW_STATSD_PORT and SERVICE_NOW_STATSD_PREFIX.
+    """
+
+    def __init__(self, client=None):
+        if client is None:
+            import statsd
+            client = statsd.StatsClient(
+                getattr(settings, 'SERVICE_NOW_STATSD_HOST', 'localhost'),
+                getattr(settings, 'SERVICE_NOW_STATSD_PORT', 8125),
+                prefix=getattr(settings, 'SERVICE_NOW_STATSD_PREFIX', 'service_now_cmdb'),
+            )
+        self.client = client
+
+    def __call__(self, event):
+        if isinstance(event, RequestEvent):
+            prefix = "http.{}".format(event.endpoint or 'other')
+            self.client.timing("{}.time".format(prefix), event.duration * 1000)
+            self.client.incr("{}.status.{}".format(prefix, event.status_code))
+            self.client.incr("{}.bytes".format(prefix), event.payload_bytes)
+            if event.retries:
+                self.client.incr("{}.retries".format(prefix), event.retries)
+        else:
+            prefix = "operation.{}.{}".format(event.name, event.endpoint or 'other')
+            self.client.timing("{}.time".format(prefix), event.duration * 1000)
+            self.client.timing("{}.db_time".format(prefix), event.db_time * 1000)
+            self.client.timing("{}.http_time".format(prefix), event.http_time * 1000)
+            self.client.incr("{}.queries".format(prefix), event.db_queries)
+            if event.failed:
+                self.client.incr("{}.failed".format(prefix))
+
+
+class PrometheusExporter:
+    """
+    Records the events in prometheus_client metrics of the default registry.
+    """
+
+    def __init__(self):
+        from prometheus_client import Counter, Histogram
+
+        self.http_time = Histogram('servicenow_http_seconds', "ServiceNow request time", ['method', 'endpoint'])
+        self.http_status = Counter('servicenow_http_responses_total', "ServiceNow responses",
+                                   ['method', 'endpoint', 'status'])
+        self.http_bytes = Counter('servicenow_http_payload_bytes_total', "Bytes sent to ServiceNow", ['endpoint'])
+        self.http_retries = Counter('servicenow_http_retries_total', "Retried ServiceNow requests", ['endpoint'])
+        self.operation_time = Histogram('servicenow_operation_seconds', "ServiceNow operation time",
+                                        ['operation', 'endpoint', 'part'])
+        self.operation_queries = Counter('servicenow_operation_queries_total', "Database queries of operations",
+                                         ['operation', 'endpoint'])
+
+    def __call__(self, event):
+        if isinstance(event, RequestEvent):
+            self.http_time.labels(event.method, event.endpoint).observe(event.duration)
+            self.http_status.labels(event.method, event.endpoint, str(event.status_code)).inc()
+            self.http_bytes.labels(event.endpoint).inc(event.payload_bytes)
+            if event.retries:
+                self.http_retries.labels(event.endpoint).inc(event.retries)
+        else:
+            self.operation_time.labels(event.name, event.endpoint, 'total').observe(event.duration)
+            self.operation_time.labels(event.name, event.endpoint, 'db').observe(event.db_time)
+            self.operation_time.labels(event.name, event.endpoint, 'http').observe(event.http_time)
+            self.operation_queries.labels(event.name, event.endpoint).inc(event.db_queries)
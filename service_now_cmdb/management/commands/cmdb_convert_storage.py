@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from service_now_cmdb.models.cmdb import VALUE_STORAGE_ROWS, VALUE_STORAGE_JSON, DEFAULT_BULK_BATCH_SIZE
+from service_now_cmdb.storage import rows_to_attributes, attributes_to_rows
+
+
+class Command(BaseCommand):
+    help = "Copy the CMDB object values between the CMDBObjectValue rows and the CMDBObject.attributes column."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--to', required=True, choices=[VALUE_STORAGE_JSON, VALUE_STORAGE_ROWS], dest='storage')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BULK_BATCH_SIZE)
+        parser.add_argument('--delete-rows', action='store_true',
+                            help="With --to json, delete the CMDBObjectValue rows once copied.")
+
+    def handle(self, *args, **options):
+        if options['delete_rows'] and options['storage'] != VALUE_STORAGE_JSON:
+            raise CommandError("--delete-rows requires --to json.")
+
+        if options['storage'] == VALUE_STORAGE_JSON:
+            converted = rows_to_attributes(options['batch_size'], delete_rows=options['delete_rows'])
+            self.stdout.write("Converted {} objects. Set SERVICE_NOW_VALUE_STORAGE = 'json'.".format(converted))
+        else:
+            created, updated = attributes_to_rows(options['batch_size'])
+            self.stdout.write("Created {} and updated {} values. Set SERVICE_NOW_VALUE_STORAGE = 'rows'.".format(
+                created, updated))
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from service_now_cmdb.export import StreamingExporter
+from service_now_cmdb.models import CMDBObjectType
+from service_now_cmdb.tokens import get_token_provider
+
+
+class Command(BaseCommand):
+    help = "Push every object of a CMDB object type to ServiceNow with bounded memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', required=True, dest='cmdb_type', help="CMDBObjectType id or name.")
+        parser.add_argument('--user', required=True, help="User whose ServiceNow token is used for the pushes.")
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--concurrency', type=int, default=None)
+
+    def handle(self, *args, **options):
+        lookup = {'pk': options['cmdb_type']} if options['cmdb_type'].isdigit() else {'name': options['cmdb_type']}
+        try:
+            cmdb_type = CMDBObjectType.objects.get(**lookup)
+        except (CMDBObjectType.DoesNotExist, CMDBObjectType.MultipleObjectsReturned):
+            raise CommandError("Unknown or ambiguous CMDB object type '{}'.".format(options['cmdb_type']))
+
+        user = get_user_model().objects.get(username=options['user'])
+        exporter = StreamingExporter(cmdb_type, get_token_provider(user), batch_size=options['batch_size'],
+                                     concurrency=options['concurrency'])
+        stats = exporter.run()
+        self.stdout.write("Sent {sent} objects, {failed} failed.".format(**stats))
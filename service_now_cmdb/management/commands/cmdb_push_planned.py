@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from service_now_cmdb.helper import SNCMDBHandler
+from service_now_cmdb.models import CMDBObjectType, CMDBObject
+
+
+class Command(BaseCommand):
+    help = "Push CMDB objects in dependency order so their reference fields are sent as sys_ids."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help="User whose ServiceNow token is used for the pushes.")
+        parser.add_argument('--type', action='append', dest='cmdb_types', default=None,
+                            help="CMDBObjectType id or name, may be repeated. Every type by default.")
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--concurrency', type=int, default=None)
+
+    def handle(self, *args, **options):
+        queryset = CMDBObject.objects.all()
+        if options['cmdb_types']:
+            types = []
+            for name in options['cmdb_types']:
+                lookup = {'pk': name} if name.isdigit() else {'name': name}
+                try:
+                    types.append(CMDBObjectType.objects.get(**lookup))
+                except (CMDBObjectType.DoesNotExist, CMDBObjectType.MultipleObjectsReturned):
+                    raise CommandError("Unknown or ambiguous CMDB object type '{}'.".format(name))
+            queryset = queryset.filter(type__in=types)
+
+        user = get_user_model().objects.get(username=options['user'])
+        handler = SNCMDBHandler(user)
+        handler.get_credentials()
+        stats = handler.push_planned(queryset, chunk_size=options['batch_size'], concurrency=options['concurrency'])
+        self.stdout.write("Pushed {levels} levels: created {created}, updated {updated}, skipped {skipped}, failed "
+                          "{failed}, {deferred} updated again for reference cycles.".format(**stats))
@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from service_now_cmdb.models import CMDBObjectType
+from service_now_cmdb.reconcile import Reconciler
+from service_now_cmdb.tokens import get_token_provider
+
+
+class Command(BaseCommand):
+    help = "Compare the local CMDB objects with the ServiceNow tables and optionally push the differences."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', dest='cmdb_type', default=None,
+                            help="CMDBObjectType id or name. Every type is reconciled by default.")
+        parser.add_argument('--user', required=True, help="User whose ServiceNow token is used.")
+        parser.add_argument('--apply', action='store_true', help="Create and update the differing remote records.")
+        parser.add_argument('--delete-orphans', action='store_true',
+                            help="With --apply and --orphan-query, delete remote records that no local object "
+                                 "points to.")
+        parser.add_argument('--orphan-query', default='',
+                            help="Encoded query selecting the records owned by this application, e.g. "
+                                 "'discovery_source=MyApp'. Orphans are only looked for among them.")
+        parser.add_argument('--page-size', type=int, default=None)
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def get_types(self, cmdb_type):
+        if cmdb_type is None:
+            return list(CMDBObjectType.objects.order_by('name'))
+        lookup = {'pk': cmdb_type} if cmdb_type.isdigit() else {'name': cmdb_type}
+        try:
+            return [CMDBObjectType.objects.get(**lookup)]
+        except (CMDBObjectType.DoesNotExist, CMDBObjectType.MultipleObjectsReturned):
+            raise CommandError("Unknown or ambiguous CMDB object type '{}'.".format(cmdb_type))
+
+    def handle(self, *args, **options):
+        if options['delete_orphans'] and not options['apply']:
+            raise CommandError("--delete-orphans requires --apply.")
+        if options['delete_orphans'] and not options['orphan_query']:
+            raise CommandError("--delete-orphans requires --orphan-query, or records of other sources are deleted.")
+
+        user = get_user_model().objects.get(username=options['user'])
+        token_provider = get_token_provider(user)
+        for cmdb_type in self.get_types(options['cmdb_type']):
+            reconciler = Reconciler(cmdb_type, token_provider, page_size=options['page_size'],
+                                    batch_size=options['batch_size'], orphan_query=options['orphan_query'])
+            result = reconciler.diff()
+            self.stdout.write("{}: {} to create, {} to update, {} orphans.".format(
+                cmdb_type.name, len(result.creates), len(result.updates), result.orphan_count))
+
+            if options['verbosity'] > 1:
+                for pk, drifted in sorted(result.drift.items()):
+                    for name, (local, remote) in sorted(drifted.items()):
+                        self.stdout.write("  object {} {}: '{}' != '{}'".format(pk, name, local, remote))
+                for sys_id in result.orphans:
+                    self.stdout.write("  orphan {}".format(sys_id))
+
+            if options['apply']:
+                stats = reconciler.apply(result, delete_orphans=options['delete_orphans'])
+                self.stdout.write("  Sent {sent}, {failed} failed, {deleted} deleted.".format(**stats))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from service_now_cmdb.simulator import FakeServiceNow
+
+
+class Command(BaseCommand):
+    help = "Serve an in-memory ServiceNow instance for load and integration tests. Point SERVICE_NOW_BASE_URL at it."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, nargs='+', default=[0],
+                            help="Seconds added to every response, or a low and high bound to draw it from.")
+        parser.add_argument('--no-auth', action='store_true', help="Accept Table and Batch API calls without a token.")
+
+    def handle(self, *args, **options):
+        latency = options['latency'][0] if len(options['latency']) == 1 else tuple(options['latency'][:2])
+        instance = FakeServiceNow(host=options['host'], port=options['port'], latency=latency,
+                                  require_auth=not options['no_auth'])
+        self.stdout.write("Serving ServiceNow at {}".format(instance.base_url))
+        try:
+            instance.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            instance.server.server_close()
+        for (method, route, status), count in sorted(instance.calls.items()):
+            self.stdout.write("{} {} {}: {}".format(method, route, status, count))
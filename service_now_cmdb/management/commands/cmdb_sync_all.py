@@ -0,0 +1,77 @@
+import multiprocessing
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from service_now_cmdb.client import reset_client
+from service_now_cmdb.helper import SNCMDBHandler
+from service_now_cmdb.models import CMDBObjectType
+from service_now_cmdb.orchestrator import SyncOrchestrator
+from service_now_cmdb.tokens import reset_token_providers
+
+
+class Command(BaseCommand):
+    help = "Push every object of every CMDB object type, partitioned over threads and processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help="User whose ServiceNow token is used for the pushes.")
+        parser.add_argument('--run', default='default',
+                            help="Name of the run. Starting a run again resumes it from its checkpoints.")
+        parser.add_argument('--type', action='append', dest='cmdb_types', default=None,
+                            help="CMDBObjectType id or name, may be repeated. Every type by default.")
+        parser.add_argument('--restart', action='store_true', help="Drop the checkpoints of the run and start over.")
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument('--workers', type=int, default=None, help="Threads per process.")
+        parser.add_argument('--partition-size', type=int, default=None)
+        parser.add_argument('--chunk-size', type=int, default=None)
+
+    def get_types(self, names):
+        if names is None:
+            return None
+        types = []
+        for name in names:
+            lookup = {'pk': name} if name.isdigit() else {'name': name}
+            try:
+                types.append(CMDBObjectType.objects.get(**lookup))
+            except (CMDBObjectType.DoesNotExist, CMDBObjectType.MultipleObjectsReturned):
+                raise CommandError("Unknown or ambiguous CMDB object type '{}'.".format(name))
+        return types
+
+    def get_orchestrator(self, options, types=None):
+        user = get_user_model().objects.get(username=options['user'])
+        handler = SNCMDBHandler(user)
+        handler.get_credentials()
+        return SyncOrchestrator(handler, run_name=options['run'], types=types,
+                                partition_size=options['partition_size'], chunk_size=options['chunk_size'],
+                                workers=options['workers'])
+
+    def work(self, options):
+        # A forked child must not share the pooled HTTP session or the token providers, and their locks, of the parent.
+        reset_client()
+        reset_token_providers()
+        self.get_orchestrator(options).run_workers()
+
+    def handle(self, *args, **options):
+        orchestrator = self.get_orchestrator(options, self.get_types(options['cmdb_types']))
+        partitions = orchestrator.plan(restart=options['restart'])
+        self.stdout.write("Run '{}' has {} partitions.".format(options['run'], partitions))
+
+        if options['processes'] > 1:
+            # The children open their own database connections and HTTP sessions.
+            connections.close_all()
+            reset_client()
+            context = multiprocessing.get_context('fork')
+            processes = [context.Process(target=self.work, args=(options,)) for _ in range(options['processes'])]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+        else:
+            orchestrator.run_workers()
+
+        summary = orchestrator.summary()
+        self.stdout.write("{done}/{partitions} partitions done: sent {sent}, skipped {skipped}, failed {failed}.".format(
+            **summary))
+        for partition, error in summary['errors']:
+            self.stderr.write("  {}: {}".format(partition, error))
@@ -0,0 +1,33 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from service_now_cmdb.helper import SNCMDBHandler
+from service_now_cmdb.sync import OutboxWorker
+
+
+class Command(BaseCommand):
+    help = "Push the queued CMDB objects to ServiceNow."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help="User whose ServiceNow token is used for the pushes.")
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--concurrency', type=int, default=None)
+        parser.add_argument('--sleep', type=float, default=5.0, help="Seconds to wait when the outbox is empty.")
+        parser.add_argument('--once', action='store_true', help="Drain the outbox and exit.")
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.get(username=options['user'])
+        handler = SNCMDBHandler(user)
+        handler.get_credentials()
+        worker = OutboxWorker(handler, batch_size=options['batch_size'], concurrency=options['concurrency'])
+
+        while True:
+            pushed, failed = worker.run_once()
+            if pushed or failed:
+                self.stdout.write("Pushed {} objects, {} failed.".format(pushed, failed))
+                continue
+            if options['once']:
+                return
+            time.sleep(options['sleep'])
@@ -0,0 +1,109 @@
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import FieldDoesNotExist
+
+from service_now_cmdb.schema import registry
+
+SOURCE_SEPARATOR = '__'
+
+
+def resolve(instance, path):
+    """
+    Follow a source path such as 'interface__device__name' from a model instance. A callable at the end of the path,
+    e.g. a model method, is called without arguments.
+
+    :param instance:
+    :param path:
+    :return: String, '' when a step of the path is None
+    """
+    value = instance
+    for attribute in path.split(SOURCE_SEPARATOR):
+        value = getattr(value, attribute, None)
+        if value is None:
+            return ''
+    if callable(value):
+        value = value()
+    return '' if value is None else str(value)
+
+
+def _split(model, path):
+    """
+    :return: tuple of the relation prefix to select_related and whether the whole path is made of concrete fields
+    """
+    relations = []
+    opts = model._meta
+    parts = path.split(SOURCE_SEPARATOR)
+    for i, part in enumerate(parts):
+        try:
+            field = opts.get_field(part)
+        except FieldDoesNotExist:
+            return SOURCE_SEPARATOR.join(relations), False
+        if field.is_relation and i < len(parts) - 1:
+            if field.many_to_many or field.one_to_many:
+                return SOURCE_SEPARATOR.join(relations), False
+            relations.append(part)
+            opts = field.related_model._meta
+    return SOURCE_SEPARATOR.join(relations), True
+
+
+def source_queryset(schema, object_ids):
+    """
+    The mapped model rows of the given ids, loaded with select_related for the relations on the source paths and,
+    when every path is a concrete field, only() those columns.
+
+    :param schema: ObjectSchema
+    :param object_ids: ids of the mapped model
+    :return: QuerySet
+    """
+    model = ContentType.objects.get_for_id(schema.content_type_id).model_class()
+    queryset = model._default_manager.filter(pk__in=object_ids)
+    related = set()
+    concrete = True
+    for field in schema.sourced_fields:
+        prefix, is_concrete = _split(model, field.source)
+        if prefix:
+            related.add(prefix)
+        concrete = concrete and is_concrete
+    if related:
+        queryset = queryset.select_related(*related)
+    if concrete:
+        # A relation followed with select_related must not be deferred, so every step of the prefixes is loaded.
+        steps = {SOURCE_SEPARATOR.join(prefix.split(SOURCE_SEPARATOR)[:i + 1])
+                 for prefix in related for i in range(len(prefix.split(SOURCE_SEPARATOR)))}
+        queryset = queryset.only(*(steps | {field.source for field in schema.sourced_fields}))
+    return queryset
+
+
+def source_values(schema, object_ids):
+    """
+    Compute the values of the sourced fields of many mapped model rows.
+
+    :param schema: ObjectSchema
+    :param object_ids: ids of the mapped model
+    :return: Dictionary of mapped model id -> Dictionary of field name -> value
+    """
+    if not schema.sourced_fields or not object_ids:
+        return dict()
+    values = dict()
+    for instance in source_queryset(schema, object_ids):
+        values[instance.pk] = {field.name: resolve(instance, field.source) for field in schema.sourced_fields}
+    return values
+
+
+def attach_source_values(cmdb_objects):
+    """
+    Load the sourced values of many CMDB objects with one query per type, so key_value does not query per object.
+
+    :param cmdb_objects: list of CMDBObject
+    :return: the same list
+    """
+    by_type = dict()
+    for cmdb_object in cmdb_objects:
+        by_type.setdefault(cmdb_object.type_id, []).append(cmdb_object)
+    for type_id, objects in by_type.items():
+        schema = registry.get_for_type(type_id)
+        if not schema.sourced_fields:
+            continue
+        values = source_values(schema, [cmdb_object.object_id for cmdb_object in objects])
+        for cmdb_object in objects:
+            cmdb_object._source_values = values.get(cmdb_object.object_id, {})
+    return cmdb_objects
@@ -0,0 +1,14 @@
+from service_now_cmdb.signals import coalesce
+
+
+class CMDBSyncMiddleware:
+    """
+    Queue the CMDB pushes caused by a request once, when the request ends, instead of once per save.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with coalesce():
+            return self.get_response(request)
@@ -1,2 +1,4 @@
 from .token import ServiceNowToken
 from .cmdb import CMDBObjectType, CMDBObjectField, CMDBObject, CMDBObjectValue
+from .outbox import CMDBOutbox
+from .checkpoint import CMDBSyncCheckpoint
@@ -0,0 +1,29 @@
+from django.db import models
+from django.utils import timezone
+
+
+class CMDBSyncCheckpoint(models.Model):
+    """
+    One partition of a sync run: the objects of a type whose object_id lies in [start, end). The progress is saved
+    after every pushed chunk, so a partition that was interrupted resumes after last_object_id.
+    """
+    run = models.CharField(max_length=64)
+    type = models.ForeignKey('CMDBObjectType', on_delete=models.CASCADE)
+    start = models.PositiveIntegerField()
+    end = models.PositiveIntegerField()
+    last_object_id = models.PositiveIntegerField(null=True, blank=True)
+    done = models.BooleanField(default=False)
+    claimed_until = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    sent = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        default_permissions = []
+        unique_together = [('run', 'type', 'start')]
+        index_together = [('run', 'done', 'claimed_until')]
+
+    def __str__(self):
+        return "{}:{}:{}-{}".format(self.run, self.type_id, self.start, self.end)
@@ -1,12 +1,57 @@
 import json
 
-import requests
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from requests import TooManyRedirects, HTTPError, ConnectionError, Timeout
 
-from config import settings
+from service_now_cmdb.async_client import run_sync
+from service_now_cmdb.client import get_client
+from service_now_cmdb.delta import payload_hash, changed_fields, push_stats
+from service_now_cmdb.utility.bulk import chunks, bulk_update
+from service_now_cmdb.utility.fields import JSONTextField
+
+DEFAULT_BULK_BATCH_SIZE = 1000
+VALUE_STORAGE_ROWS = 'rows'
+VALUE_STORAGE_JSON = 'json'
+
+
+def json_storage():
+    """
+    :return: True when SERVICE_NOW_VALUE_STORAGE keeps the values in CMDBObject.attributes instead of CMDBObjectValue
+    """
+    return getattr(settings, 'SERVICE_NOW_VALUE_STORAGE', VALUE_STORAGE_ROWS) == VALUE_STORAGE_JSON
+
+
+def _stored(value):
+    """
+    :return: the value as it is stored, None as ''
+    """
+    return '' if value is None else str(value)
+
+
+def _unknown_field(name, type_id):
+    return ValueError("There is no field '{}' associated with the object type '{}'.".format(name, type_id))
+
+
+def _merge_attributes(attributes, values):
+    """
+    :param attributes: Dictionary updated in place
+    :param values: Dictionary of field name -> value
+    :return: tuple of the number of created and updated keys
+    """
+    created = updated = 0
+    for name, value in values.items():
+        if name not in attributes:
+            created += 1
+        elif attributes[name] != value:
+            updated += 1
+        else:
+            continue
+        attributes[name] = value
+    return created, updated
 
 
 class CMDBObjectType(models.Model):
@@ -16,6 +61,7 @@ class CMDBObjectType(models.Model):
     name = models.CharField(max_length=255, unique=False, blank=False)
     endpoint = models.CharField(max_length=255, unique=False, blank=False)
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    pull_watermark = models.CharField(max_length=19, blank=True, default='')
 
     def __str__(self):
         return "{}:{}".format(self.id, self.name)
@@ -28,17 +74,106 @@ class CMDBObjectField(models.Model):
     name = models.CharField(max_length=255, unique=False, blank=False)
     type = models.ForeignKey('CMDBObjectType', on_delete=models.CASCADE, blank=False)
     order = models.PositiveIntegerField(blank=True)
+    source = models.CharField(max_length=255, blank=True, default='',
+                              help_text="Attribute path on the mapped model, e.g. 'device__name'. The value is computed "
+                                        "from the model instead of being stored.")
+    reference_type = models.ForeignKey('CMDBObjectType', on_delete=models.SET_NULL, null=True, blank=True,
+                                       related_name='referencing_fields',
+                                       help_text="The values are ids of objects of this type's mapped model and are "
+                                                 "sent as the sys_id of their CMDB objects.")
+
+    class Meta:
+        unique_together = [('type', 'name')]
 
     def __str__(self):
         return "{}:{}:{}".format(self.id, self.name, self.type)
 
-    def clean(self):
-        if CMDBObjectField.objects.filter(name=self.name, type=self.type).exists():
-            raise ValidationError("There already exists a field '{}' associated with this object type '{}'.".format(self.name, self.type.name))
 
-    def save(self, *args, **kwargs):
-        self.clean()
-        super(CMDBObjectField, self).save(*args, **kwargs)
+class CMDBObjectQuerySet(models.QuerySet):
+
+    def with_key_values(self, fields=None):
+        """
+        Prefetch the values and their fields so that key_value, fields and get_field do not query per object.
+
+        :param fields: only prefetch the values of these field names
+        :return: QuerySet
+        """
+        if json_storage():
+            return self.select_related('type')
+        values = CMDBObjectValue.objects.select_related('field').order_by('field__order', 'field__name')
+        if fields is not None:
+            values = values.filter(field__name__in=fields)
+        return self.select_related('type').prefetch_related(
+            models.Prefetch('cmdbobjectvalue_set', queryset=values)
+        )
+
+    def touch(self, pks, batch_size=DEFAULT_BULK_BATCH_SIZE):
+        """
+        Mark objects whose values were written without saving the object as modified.
+
+        :param pks: CMDBObject ids
+        """
+        now = timezone.now()
+        for ids in chunks(pks, batch_size):
+            self.model.objects.filter(pk__in=ids).update(modified=now)
+
+    def bulk_set_attributes(self, items, batch_size=DEFAULT_BULK_BATCH_SIZE, changed=None):
+        """
+        The json storage variant of CMDBObjectValueQuerySet.bulk_set: the attributes of the objects are locked, merged
+        and written back with one bulk update per batch.
+
+        :param items: iterable of (CMDBObject, field name, value)
+        :param batch_size:
+        :param changed: optional set that receives the ids of the objects whose values were written
+        :return: tuple of the number of created and updated values
+        :raises ValueError: if a field name does not belong to the object's type
+        """
+        from service_now_cmdb.schema import registry
+
+        wanted = dict()
+        for cmdb_object, name, value in items:
+            wanted.setdefault(cmdb_object.pk, (cmdb_object.type_id, dict()))[1][name] = _stored(value)
+        if not wanted:
+            return 0, 0
+
+        field_names = dict()
+        for type_id, values in wanted.values():
+            if type_id not in field_names:
+                field_names[type_id] = set(registry.get_for_type(type_id).field_names)
+            for name in values:
+                if name not in field_names[type_id]:
+                    raise _unknown_field(name, type_id)
+
+        created = updated = 0
+        to_update = []
+        with transaction.atomic():
+            for ids in chunks(list(wanted), batch_size):
+                for cmdb_object in self.model.objects.select_for_update().filter(pk__in=ids).only('pk', 'attributes'):
+                    c, u = _merge_attributes(cmdb_object.attributes, wanted[cmdb_object.pk][1])
+                    created += c
+                    updated += u
+                    if c or u:
+                        cmdb_object.modified = timezone.now()
+                        to_update.append(cmdb_object)
+            bulk_update(to_update, ['attributes', 'modified'], batch_size=batch_size)
+        if changed is not None:
+            changed.update(cmdb_object.pk for cmdb_object in to_update)
+        return created, updated
+
+    def rename_attribute(self, type_id, name, new_name, batch_size=DEFAULT_BULK_BATCH_SIZE):
+        """
+        Move the attribute of a renamed field to its new name on every object of the type.
+
+        :return: number of objects updated
+        """
+        to_update = []
+        for cmdb_object in self.model.objects.filter(type_id=type_id).only('pk', 'attributes').iterator():
+            if name in cmdb_object.attributes:
+                cmdb_object.attributes[new_name] = cmdb_object.attributes.pop(name)
+                cmdb_object.modified = timezone.now()
+                to_update.append(cmdb_object)
+        bulk_update(to_update, ['attributes', 'modified'], batch_size=batch_size)
+        return len(to_update)
 
 
 class CMDBObject(models.Model):
@@ -46,8 +181,18 @@ class CMDBObject(models.Model):
     The object you want to model 1:1 to your ServiceNow CMDB object.
     """
     type = models.ForeignKey('CMDBObjectType', on_delete=models.CASCADE, blank=False)
-    service_now_id = models.CharField(max_length=255)
+    service_now_id = models.CharField(max_length=255, db_index=True)
     object_id = models.PositiveIntegerField()
+    pushed_hash = models.CharField(max_length=64, blank=True, default='')
+    pushed_values = models.TextField(blank=True, default='')
+    attributes = JSONTextField(blank=True, default=dict,
+                               help_text="Values of the fields when SERVICE_NOW_VALUE_STORAGE is 'json'.")
+    modified = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = CMDBObjectQuerySet.as_manager()
+
+    class Meta:
+        unique_together = [('type', 'object_id')]
 
     def __str__(self):
         return "{}:{}:{}".format(self.id, self.type.name, self.service_now_id)
@@ -55,15 +200,54 @@ class CMDBObject(models.Model):
     def save(self, *args, **kwargs):
         super(CMDBObject, self).save(*args, **kwargs)
 
+    def clean(self):
+        from service_now_cmdb.schema import registry
+
+        if self.attributes and self.type_id:
+            field_names = set(registry.get_for_type(self.type_id).field_names)
+            unknown = sorted(set(self.attributes) - field_names)
+            if unknown:
+                raise ValidationError({'attributes': "Unknown fields for this object type: {}.".format(
+                    ", ".join(unknown))})
+
+    def _ordered_attributes(self):
+        """
+        The attributes of the type's current fields, in field order.
+
+        :return: Dictionary
+        """
+        from service_now_cmdb.schema import registry
+
+        attributes = self.attributes or {}
+        return {name: attributes[name] for name in registry.get_for_type(self.type_id).field_names
+                if name in attributes}
+
+    @property
+    def _prefetched_values(self):
+        """
+        The values loaded by CMDBObjectQuerySet.with_key_values, or None when they were not prefetched.
+
+        :return: list or None
+        """
+        cache = getattr(self, '_prefetched_objects_cache', {})
+        # Django < 2.0 caches reverse foreign keys under the related query name, later versions under the accessor.
+        for name in ('cmdbobjectvalue_set', 'cmdbobjectvalue'):
+            if name in cache:
+                return list(cache[name])
+        return None
+
     @property
     def fields(self):
         """
 
-        :return: QuerySet
+        :return: QuerySet, or a list when the values were prefetched or are stored as json
         """
-        values = CMDBObjectValue.objects.filter(object=self).values_list('field_id')
-        field_names = CMDBObjectField.objects.filter(pk__in=values).values_list('name', flat=True)
-        return field_names
+        if json_storage():
+            return list(self._ordered_attributes())
+        values = self._prefetched_values
+        if values is not None:
+            return [i.field.name for i in values]
+        return CMDBObjectField.objects.filter(cmdbobjectvalue__object=self).values_list('name', flat=True)
 
     @property
     def key_value(self):
@@ -71,30 +255,88 @@ class CMDBObject(models.Model):
 
         :return: Dictionary
         """
-        values = CMDBObjectValue.objects.filter(object=self).values()
-        d = dict()
-        for i in values:
-            object_field = CMDBObjectField.objects.get(id=i['field_id'])
-            field_name = object_field.name
-            d[field_name] = i['value']
+        values = self._prefetched_values
+        if json_storage():
+            d = self._ordered_attributes()
+        elif values is not None:
+            d = {i.field.name: i.value for i in values}
+        else:
+            values = CMDBObjectValue.objects.filter(object=self).order_by('field__order', 'field__name')
+            d = dict(values.values_list('field__name', 'value'))
+        d.update(self.source_values)
         return d
 
+    @property
+    def source_values(self):
+        """
+        The values of the fields computed from the mapped model, see mappers.attach_source_values to load them for
+        many objects at once.
+
+        :return: Dictionary
+        """
+        if not hasattr(self, '_source_values'):
+            from service_now_cmdb.mappers import source_values
+            from service_now_cmdb.schema import registry
+
+            schema = registry.get_for_type(self.type_id)
+            self._source_values = source_values(schema, [self.object_id]).get(self.object_id, {})
+        return self._source_values
+
+    @property
+    def push_values(self):
+        """
+        key_value with the reference fields replaced by the sys_ids of the referenced objects, the values sent to
+        ServiceNow. See references.attach_references to resolve them for many objects at once.
+
+        :return: Dictionary
+        """
+        from service_now_cmdb.references import ReferenceMap
+        from service_now_cmdb.schema import registry
+
+        values = self.key_value
+        if self.type_id is None or not registry.get_for_type(self.type_id).reference_fields:
+            return values
+        if getattr(self, '_references', None) is None:
+            self._references = ReferenceMap()
+        return self._references.resolve(registry.get_for_type(self.type_id), values)
+
+    def delta_payload(self):
+        """
+        Compare the current values with the ones last pushed.
+
+        :return: tuple of the fields to send, or None when nothing changed, and the full current values
+        """
+        values = self.push_values
+        if self.pushed_hash and self.pushed_hash == payload_hash(values):
+            return None, values
+        if self.pushed_values:
+            return changed_fields(values, json.loads(self.pushed_values)), values
+        return values, values
+
+    def mark_pushed(self, values):
+        """
+        Remember the values ServiceNow now holds. The caller saves pushed_hash and pushed_values.
+
+        :param values: Dictionary
+        """
+        self.pushed_hash = payload_hash(values)
+        self.pushed_values = json.dumps(values, sort_keys=True)
+
     def post(self, access_token):
         """
 
-        :param access_token:
+        :param access_token: access token or TokenProvider
         :return:
         """
-        service_now_headers = {
-            'Authorization': 'Bearer {}'.format(access_token),
-            'Content-Type': "application/json"
-        }
+        client = get_client()
+        values = self.push_values
 
         try:
-            r = requests.post(
-                url="https://{}.service-now.com/api/now/table/{}".format(settings.SERVICE_NOW_DOMAIN, self.type.endpoint),
-                headers=service_now_headers,
-                data=json.dumps(self.key_value)
+            r = client.send(
+                'POST',
+                client.table_url(self.type.endpoint),
+                access_token,
+                data=json.dumps(values)
             )
         except (ConnectionError, Timeout, HTTPError, TooManyRedirects) as e:
             raise ValueError("Invalid Endpoint. Error: {}".format(e))
@@ -107,28 +349,32 @@ class CMDBObject(models.Model):
 
         resp = json.loads(r.text)
         self.service_now_id = resp['result']['sys_id']
+        self.mark_pushed(values)
+        push_stats.record(sent=True)
         return True
 
     def put(self, access_token):
         """
 
-        :param access_token:
+        :param access_token: access token or TokenProvider
         :return:
         """
 
         if not self.service_now_id:
             raise ValueError("There is no ServiceNow ID associated with this object. Try creating the object first.")
 
-        service_now_headers = {
-            'Authorization': 'Bearer {}'.format(access_token),
-            'Content-Type': "application/json"
-        }
+        client = get_client()
+        payload, values = self.delta_payload()
+        if payload is None:
+            push_stats.record(sent=False)
+            return True
 
         try:
-            r = requests.put(
-                url="https://{}.service-now.com/api/now/table/{}/{}".format(settings.SERVICE_NOW_DOMAIN, self.type.endpoint, str(self.service_now_id)),
-                headers=service_now_headers,
-                data=json.dumps(self.key_value)
+            r = client.send(
+                'PUT',
+                client.table_url(self.type.endpoint, str(self.service_now_id)),
+                access_token,
+                data=json.dumps(payload)
             )
         except (ConnectionError, Timeout, HTTPError, TooManyRedirects) as e:
             raise ValueError("Invalid Endpoint. Error: {}".format(e))
@@ -140,28 +386,131 @@ class CMDBObject(models.Model):
 
         resp = json.loads(r.text)
         self.service_now_id = resp['result']['sys_id']
+        self.mark_pushed(values)
+        push_stats.record(sent=True)
 
         return True
 
     def get(self, access_token):
         """
 
-        :param access_token:
+        :param access_token: access token or TokenProvider
         :return:
         """
 
         if not self.service_now_id:
             raise ValueError("There is no ServiceNow ID associated with this object. Try creating the object first.")
 
-        service_now_headers = {
-            'Authorization': 'Bearer {}'.format(access_token),
-            'Content-Type': "application/json"
-        }
+        client = get_client()
 
         try:
-            r = requests.get(
-                url="https://{}.service-now.com/api/now/table/{}/{}".format(settings.SERVICE_NOW_DOMAIN, self.type.endpoint, str(self.service_now_id)),
-                headers=service_now_headers
+            r = client.send(
+                'GET',
+                client.table_url(self.type.endpoint, str(self.service_now_id)),
+                access_token
+            )
+        except (ConnectionError, Timeout, HTTPError, TooManyRedirects) as e:
+            raise ValueError("Invalid Endpoint. Error: {}".format(e))
+
+        if r.status_code == 401:
+            raise ValueError("Bad Access Token")
+        if r.status_code != 200:
+            return False
+
+        return r.text
+
+    async def apost(self, access_token, client):
+        """
+        Async variant of post. The type and values are loaded in a thread, off the event loop.
+
+        :param access_token: access token or TokenProvider
+        :param client: AsyncServiceNowClient
+        :return:
+        """
+        endpoint, values = await run_sync(lambda: (self.type.endpoint, self.push_values))
+        return await self._apost(access_token, client, endpoint, values)
+
+    async def _apost(self, access_token, client, endpoint, values):
+        try:
+            r = await client.send(
+                'POST',
+                client.table_url(endpoint),
+                access_token,
+                data=json.dumps(values)
+            )
+        except (ConnectionError, Timeout, HTTPError, TooManyRedirects) as e:
+            raise ValueError("Invalid Endpoint. Error: {}".format(e))
+
+        if r.status_code == 401:
+            raise ValueError("Bad Access Token")
+        if r.status_code != 201:
+            return False
+
+        resp = json.loads(r.text)
+        self.service_now_id = resp['result']['sys_id']
+        self.mark_pushed(values)
+        push_stats.record(sent=True)
+        return True
+
+    async def aput(self, access_token, client):
+        """
+        Async variant of put. The type and values are loaded in a thread, off the event loop.
+
+        :param access_token: access token or TokenProvider
+        :param client: AsyncServiceNowClient
+        :return:
+        """
+        if not self.service_now_id:
+            raise ValueError("There is no ServiceNow ID associated with this object. Try creating the object first.")
+
+        endpoint, (payload, values) = await run_sync(lambda: (self.type.endpoint, self.delta_payload()))
+        if payload is None:
+            push_stats.record(sent=False)
+            return True
+        return await self._aput(access_token, client, endpoint, payload, values)
+
+    async def _aput(self, access_token, client, endpoint, payload, values):
+        try:
+            r = await client.send(
+                'PUT',
+                client.table_url(endpoint, str(self.service_now_id)),
+                access_token,
+                data=json.dumps(payload)
+            )
+        except (ConnectionError, Timeout, HTTPError, TooManyRedirects) as e:
+            raise ValueError("Invalid Endpoint. Error: {}".format(e))
+
+        if r.status_code == 401:
+            raise ValueError("Bad Access Token")
+        if r.status_code != 200:
+            return False
+
+        resp = json.loads(r.text)
+        self.service_now_id = resp['result']['sys_id']
+        self.mark_pushed(values)
+        push_stats.record(sent=True)
+        return True
+
+    async def aget(self, access_token, client):
+        """
+        Async variant of get. The type is loaded in a thread, off the event loop.
+
+        :param access_token: access token or TokenProvider
+        :param client: AsyncServiceNowClient
+        :return:
+        """
+        if not self.service_now_id:
+            raise ValueError("There is no ServiceNow ID associated with this object. Try creating the object first.")
+
+        endpoint = await run_sync(lambda: self.type.endpoint)
+        return await self._aget(access_token, client, endpoint)
+
+    async def _aget(self, access_token, client, endpoint):
+        try:
+            r = await client.send(
+                'GET',
+                client.table_url(endpoint, str(self.service_now_id)),
+                access_token
             )
         except (ConnectionError, Timeout, HTTPError, TooManyRedirects) as e:
             raise ValueError("Invalid Endpoint. Error: {}".format(e))
@@ -179,11 +528,20 @@ class CMDBObject(models.Model):
         :param name:
         :return:
         """
-        values = CMDBObjectValue.objects.filter(object=self)
-        for i in values:
-            if i.field.name == name:
-                return i
-        return None
+        if json_storage():
+            from service_now_cmdb.schema import registry
+
+            if name not in self.attributes:
+                return None
+            field_id = registry.get_for_type(self.type_id).field_ids.get(name)
+            return CMDBObjectValue(object=self, field_id=field_id, value=self.attributes[name])
+        values = self._prefetched_values
+        if values is not None:
+            for i in values:
+                if i.field.name == name:
+                    return i
+            return None
+        return CMDBObjectValue.objects.select_related('field').filter(object=self, field__name=name).first()
 
     def set_field(self, name, value):
         """
@@ -192,8 +550,104 @@ class CMDBObject(models.Model):
         :param value:
         :return:
         """
-        object_value = CMDBObjectValue.objects.create(object=self, field=name, value=value)
-        object_value.save()
+        self.set_fields({name: value})
+
+    def set_fields(self, values):
+        """
+        Create or update many values of this object at once.
+
+        :param values: Dictionary of field name -> value
+        :return: tuple of the number of created and updated values
+        """
+        if json_storage():
+            from service_now_cmdb.schema import registry
+
+            field_names = set(registry.get_for_type(self.type_id).field_names)
+            for name in values:
+                if name not in field_names:
+                    raise _unknown_field(name, self.type_id)
+            created, updated = _merge_attributes(self.attributes, {name: _stored(value) for name, value in values.items()})
+            if created or updated:
+                self.save(update_fields=['attributes', 'modified'])
+            return created, updated
+        return CMDBObjectValue.objects.bulk_set((self, name, value) for name, value in values.items())
+
+
+class CMDBObjectValueQuerySet(models.QuerySet):
+
+    def bulk_set(self, items, batch_size=DEFAULT_BULK_BATCH_SIZE, changed=None):
+        """
+        Create or update many values in the configured storage, see bulk_set_rows and
+        CMDBObjectQuerySet.bulk_set_attributes.
+
+        :param items: iterable of (CMDBObject, field name, value)
+        :param batch_size:
+        :param changed: optional set that receives the ids of the objects whose values were written
+        :return: tuple of the number of created and updated values
+        :raises ValueError: if a field name does not belong to the object's type
+        """
+        if json_storage():
+            return CMDBObject.objects.bulk_set_attributes(items, batch_size=batch_size, changed=changed)
+        return self.bulk_set_rows(items, batch_size=batch_size, changed=changed)
+
+    def bulk_set_rows(self, items, batch_size=DEFAULT_BULK_BATCH_SIZE, changed=None):
+        """
+        Create or update many values with bulk statements inside one transaction. Field names are resolved once per
+        object type and only values that differ from the stored ones are written.
+
+        :param items: iterable of (CMDBObject, field name, value)
+        :param batch_size:
+        :param changed: optional set that receives the ids of the objects whose values were written
+        :return: tuple of the number of created and updated values
+        :raises ValueError: if a field name does not belong to the object's type
+        """
+        wanted = dict()
+        for cmdb_object, name, value in items:
+            wanted[(cmdb_object, name)] = _stored(value)
+        if not wanted:
+            return 0, 0
+
+        from service_now_cmdb.schema import registry
+
+        field_ids = dict()
+        by_key = dict()
+        for (cmdb_object, name), value in wanted.items():
+            if cmdb_object.type_id not in field_ids:
+                field_ids[cmdb_object.type_id] = registry.get_for_type(cmdb_object.type_id).field_ids
+            field_id = field_ids[cmdb_object.type_id].get(name)
+            if field_id is None:
+                raise _unknown_field(name, cmdb_object.type_id)
+            by_key[(cmdb_object.pk, field_id)] = value
+
+        with transaction.atomic():
+            # The objects are locked before their values are read, so a concurrent writer of the same objects waits
+            # instead of inserting a value between the read and the write.
+            existing = dict()
+            object_ids = list({object_id for object_id, _ in by_key})
+            for ids in chunks(object_ids, batch_size):
+                list(CMDBObject.objects.select_for_update().filter(pk__in=ids).values_list('pk', flat=True))
+                for object_value in self.model.objects.filter(object_id__in=ids).only('pk', 'object_id', 'field_id',
+                                                                                       'value'):
+                    existing[(object_value.object_id, object_value.field_id)] = object_value
+
+            to_create = []
+            to_update = []
+            for (object_id, field_id), value in by_key.items():
+                object_value = existing.get((object_id, field_id))
+                if object_value is None:
+                    to_create.append(self.model(object_id=object_id, field_id=field_id, value=value))
+                elif object_value.value != value:
+                    object_value.value = value
+                    to_update.append(object_value)
+
+            self.model.objects.bulk_create(to_create, batch_size=batch_size)
+            bulk_update(to_update, ['value'], batch_size=batch_size)
+            written = {value.object_id for value in to_create + to_update}
+            CMDBObject.objects.touch(list(written), batch_size=batch_size)
+        if changed is not None:
+            changed.update(written)
+
+        return len(to_create), len(to_update)
 
 
 class CMDBObjectValue(models.Model):
@@ -204,11 +658,23 @@ class CMDBObjectValue(models.Model):
     field = models.ForeignKey('CMDBObjectField', on_delete=models.CASCADE, blank=False)
     value = models.CharField(max_length=255, unique=False)
 
+    objects = CMDBObjectValueQuerySet.as_manager()
+
+    class Meta:
+        unique_together = [('object', 'field')]
+
     def __str__(self):
-        return "{}:{}:{}".format(self.object.id, self.field, self.value)
+        return "{}:{}:{}".format(self.object_id, self.field, self.value)
 
     def save(self, *args, **kwargs):
         super(CMDBObjectValue, self).save(*args, **kwargs)
+        # The object's modified time is its API validator, see CMDBObjectReadMixin.validators.
+        CMDBObject.objects.touch([self.object_id])
+
+    def delete(self, *args, **kwargs):
+        result = super(CMDBObjectValue, self).delete(*args, **kwargs)
+        CMDBObject.objects.touch([self.object_id])
+        return result
 
     @property
     def object_field(self):
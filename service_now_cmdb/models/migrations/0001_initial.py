@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CMDBObject',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('service_now_id', models.CharField(max_length=255)),
+                ('object_id', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CMDBObjectField',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('order', models.PositiveIntegerField(blank=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CMDBObjectType',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('endpoint', models.CharField(max_length=255)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.ContentType')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CMDBObjectValue',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.CharField(max_length=255)),
+                ('field', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='service_now_cmdb.CMDBObjectField')),
+                ('object', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='service_now_cmdb.CMDBObject')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ServiceNowToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('scope', models.CharField(max_length=255)),
+                ('expires', models.DateTimeField(blank=True)),
+                ('access_token', models.CharField(max_length=255)),
+                ('refresh_token', models.CharField(max_length=255)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'default_permissions': [],
+            },
+        ),
+        migrations.AddField(
+            model_name='cmdbobjectfield',
+            name='type',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='service_now_cmdb.CMDBObjectType'),
+        ),
+        migrations.AddField(
+            model_name='cmdbobject',
+            name='type',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='service_now_cmdb.CMDBObjectType'),
+        ),
+    ]
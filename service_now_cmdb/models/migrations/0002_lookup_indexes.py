@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+
+
+def duplicates(model, *fields):
+    """
+    :return: list of dictionaries with the values of the fields that more than one row shares
+    """
+    return list(model.objects.values(*fields).annotate(rows=Count('pk')).filter(rows__gt=1).values(*fields))
+
+
+def dedupe(apps, schema_editor):
+    """
+    Merge the rows that the unique constraints below would reject. Duplicate fields and objects are merged into the
+    first row, moving their values along, and of duplicate values the newest row is kept.
+    """
+    CMDBObjectField = apps.get_model('service_now_cmdb', 'CMDBObjectField')
+    CMDBObject = apps.get_model('service_now_cmdb', 'CMDBObject')
+    CMDBObjectValue = apps.get_model('service_now_cmdb', 'CMDBObjectValue')
+
+    for key in duplicates(CMDBObjectField, 'type', 'name'):
+        rows = CMDBObjectField.objects.filter(**key)
+        keep = rows.aggregate(pk=Min('pk'))['pk']
+        CMDBObjectValue.objects.filter(field__in=rows.exclude(pk=keep)).update(field_id=keep)
+        rows.exclude(pk=keep).delete()
+
+    for key in duplicates(CMDBObject, 'type', 'object_id'):
+        rows = CMDBObject.objects.filter(**key)
+        # Keep the object that is linked to a ServiceNow record, if there is one.
+        keep = (rows.exclude(service_now_id='').order_by('pk').values_list('pk', flat=True).first() or
+                rows.aggregate(pk=Min('pk'))['pk'])
+        CMDBObjectValue.objects.filter(object__in=rows.exclude(pk=keep)).update(object_id=keep)
+        rows.exclude(pk=keep).delete()
+
+    for key in duplicates(CMDBObjectValue, 'object', 'field'):
+        rows = CMDBObjectValue.objects.filter(**key)
+        rows.exclude(pk=rows.aggregate(pk=Max('pk'))['pk']).delete()
+
+
+class Migration(migrations.Migration):
+    # The rows are merged in their own transaction: PostgreSQL cannot alter a table that has pending deferred
+    # foreign key checks from the same transaction.
+    atomic = False
+
+    dependencies = [
+        ('service_now_cmdb', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe, migrations.RunPython.noop, atomic=True),
+        migrations.AlterField(
+            model_name='cmdbobject',
+            name='service_now_id',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AlterUniqueTogether(
+            name='cmdbobject',
+            unique_together=set([('type', 'object_id')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='cmdbobjectfield',
+            unique_together=set([('type', 'name')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='cmdbobjectvalue',
+            unique_together=set([('object', 'field')]),
+        ),
+    ]
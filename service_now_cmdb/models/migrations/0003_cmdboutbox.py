@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_now_cmdb', '0002_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CMDBOutbox',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('enqueued', models.DateTimeField(default=django.utils.timezone.now)),
+                ('available', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('object', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='outbox', to='service_now_cmdb.CMDBObject')),
+            ],
+            options={
+                'default_permissions': [],
+            },
+        ),
+    ]
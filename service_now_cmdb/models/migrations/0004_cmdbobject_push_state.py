@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_now_cmdb', '0003_cmdboutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cmdbobject',
+            name='pushed_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='cmdbobject',
+            name='pushed_values',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
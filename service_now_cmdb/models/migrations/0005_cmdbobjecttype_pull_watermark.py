@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_now_cmdb', '0004_cmdbobject_push_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cmdbobjecttype',
+            name='pull_watermark',
+            field=models.CharField(blank=True, default='', max_length=19),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_now_cmdb', '0005_cmdbobjecttype_pull_watermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cmdbobjectfield',
+            name='source',
+            field=models.CharField(blank=True, default='', help_text="Attribute path on the mapped model, e.g. 'device__name'. The value is computed from the model instead of being stored.", max_length=255),
+        ),
+    ]
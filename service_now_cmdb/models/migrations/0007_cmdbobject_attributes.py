@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+import service_now_cmdb.utility.fields
+
+GIN_INDEX = 'service_now_cmdb_cmdbobject_attributes_gin'
+
+
+def create_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE INDEX {} ON service_now_cmdb_cmdbobject USING gin ((attributes::jsonb) jsonb_path_ops)".format(
+                GIN_INDEX)
+        )
+
+
+def drop_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS {}".format(GIN_INDEX))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_now_cmdb', '0006_cmdbobjectfield_source'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cmdbobject',
+            name='attributes',
+            field=service_now_cmdb.utility.fields.JSONTextField(blank=True, default=dict, help_text="Values of the fields when SERVICE_NOW_VALUE_STORAGE is 'json'."),
+        ),
+        migrations.RunPython(create_gin_index, drop_gin_index),
+    ]
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_now_cmdb', '0007_cmdbobject_attributes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CMDBSyncCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run', models.CharField(max_length=64)),
+                ('start', models.PositiveIntegerField()),
+                ('end', models.PositiveIntegerField()),
+                ('last_object_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('done', models.BooleanField(default=False)),
+                ('claimed_until', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('sent', models.PositiveIntegerField(default=0)),
+                ('skipped', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='service_now_cmdb.CMDBObjectType')),
+            ],
+            options={
+                'default_permissions': [],
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='cmdbsynccheckpoint',
+            unique_together=set([('run', 'type', 'start')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='cmdbsynccheckpoint',
+            index_together=set([('run', 'done', 'claimed_until')]),
+        ),
+    ]
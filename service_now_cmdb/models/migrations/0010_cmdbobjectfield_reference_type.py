@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_now_cmdb', '0009_cmdbobject_modified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cmdbobjectfield',
+            name='reference_type',
+            field=models.ForeignKey(blank=True, help_text="The values are ids of objects of this type's mapped model and are sent as the sys_id of their CMDB objects.", null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='referencing_fields', to='service_now_cmdb.CMDBObjectType'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service_now_cmdb', '0010_cmdbobjectfield_reference_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cmdboutbox',
+            name='remove',
+            field=models.BooleanField(default=False, help_text='Delete the ServiceNow record instead of pushing the object.'),
+        ),
+    ]
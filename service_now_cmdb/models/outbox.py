@@ -0,0 +1,79 @@
+from django.db import models, transaction
+from django.db.models import Case, When, F, Value
+from django.utils import timezone
+
+
+def keep_lease(now):
+    """
+    The new available time of a re-enqueued row: now, unless a worker holds the row, whose lease must not be cut
+    short or a second worker would push the same object at the same time.
+
+    :param now:
+    :return: Expression
+    """
+    return Case(When(available__gt=now, then=F('available')), default=Value(now),
+                output_field=models.DateTimeField())
+
+
+class CMDBOutbox(models.Model):
+    """
+    A pending push of a CMDB object to ServiceNow. There is at most one row per object, so repeated updates of the
+    same object before the worker picks it up collapse into a single push.
+
+    A row with remove set deletes the object's ServiceNow record instead, and then the object itself.
+    """
+    object = models.OneToOneField('CMDBObject', on_delete=models.CASCADE, related_name='outbox')
+    enqueued = models.DateTimeField(default=timezone.now)
+    available = models.DateTimeField(default=timezone.now, db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    remove = models.BooleanField(default=False, help_text="Delete the ServiceNow record instead of pushing the object.")
+
+    class Meta:
+        default_permissions = []
+
+    def __str__(self):
+        return "{}:{}".format(self.object_id, self.attempts)
+
+    @staticmethod
+    def enqueue(cmdb_object):
+        """
+        Queue a push of the object. Call this inside the transaction that saves the source model so the push is only
+        recorded when the save commits.
+
+        :param cmdb_object:
+        :return: CMDBOutbox
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            outbox, created = CMDBOutbox.objects.get_or_create(
+                object=cmdb_object,
+                defaults={'enqueued': now, 'available': now}
+            )
+            if not created:
+                CMDBOutbox.objects.filter(pk=outbox.pk).update(
+                    enqueued=now, available=keep_lease(now), attempts=0, last_error='', remove=False
+                )
+                outbox.refresh_from_db()
+        return outbox
+
+    @staticmethod
+    def enqueue_many(cmdb_objects, remove=False):
+        """
+        Queue a push of many objects with an update of the queued rows and a bulk insert of the rest.
+
+        :param cmdb_objects: list of CMDBObject
+        :param remove: queue the deletion of their ServiceNow records instead
+        :return: number of queued objects
+        """
+        now = timezone.now()
+        object_ids = {cmdb_object.pk for cmdb_object in cmdb_objects}
+        with transaction.atomic():
+            queued = CMDBOutbox.objects.filter(object_id__in=object_ids)
+            queued.update(enqueued=now, available=keep_lease(now), attempts=0, last_error='', remove=remove)
+            queued = set(queued.values_list('object_id', flat=True))
+            CMDBOutbox.objects.bulk_create(
+                [CMDBOutbox(object_id=object_id, enqueued=now, available=now, remove=remove)
+                 for object_id in object_ids if object_id not in queued]
+            )
+        return len(object_ids)
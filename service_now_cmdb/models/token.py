@@ -1,6 +1,5 @@
 import json
 import urllib
-import requests
 from django.contrib.auth.models import User
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
@@ -9,6 +8,8 @@ from django.conf import settings
 from requests import Timeout, HTTPError, TooManyRedirects
 from urllib.parse import quote_plus
 
+from service_now_cmdb.client import get_client
+
 
 class ServiceNowToken(models.Model):
     """
@@ -31,8 +32,8 @@ class ServiceNowToken(models.Model):
     @property
     def is_expired(self):
         if self.expires == "" or self.expires is None or timezone.now() > self.expires:
-            return False
-        return True
+            return True
+        return False
 
     def _update_token(self, data):
         """
@@ -56,7 +57,8 @@ class ServiceNowToken(models.Model):
         :return: False if the endpoint
         :raises ValueError: This can be caused by multiple errors.
         """
-        url = "https://{}.service-now.com/oauth_token.do".format(settings.SERVICE_NOW_DOMAIN)
+        client = get_client()
+        url = client.url("oauth_token.do")
 
         headers = {
             'Content-Type': 'application/x-www-form-urlencoded'
@@ -72,7 +74,7 @@ class ServiceNowToken(models.Model):
         payload = payload + "&client_secret={}".format(settings.SERVICE_NOW_CLIENT_SECRET)
 
         try:
-            r = requests.post(url=url, headers=headers, data=payload)
+            r = client.post(url=url, headers=headers, data=payload)
         except (ConnectionError, Timeout, HTTPError, TooManyRedirects) as e:
             raise ValueError("Invalid ServiceNow Endpoint. Check SERVICE_NOW_DOMAIN, SERVICE_NOW_CLIENT_ID, "
                              "or SERVICE_NOW_CLIENT_SECRET in the settings file.".format(e))
@@ -122,7 +124,8 @@ class ServiceNowToken(models.Model):
         :param password:
         :return:
         """
-        url = "https://{}.service-now.com/oauth_token.do".format(settings.SERVICE_NOW_DOMAIN)
+        client = get_client()
+        url = client.url("oauth_token.do")
 
         headers = {
             'Content-Type': 'application/x-www-form-urlencoded'
@@ -139,7 +142,7 @@ class ServiceNowToken(models.Model):
         payload = payload + "&client_secret={}".format(settings.SERVICE_NOW_CLIENT_SECRET)
 
         try:
-            r = requests.post(url=url, headers=headers, data=payload)
+            r = client.post(url=url, headers=headers, data=payload)
         except (ConnectionError, Timeout, HTTPError, TooManyRedirects) as e:
             raise ValueError("Invalid ServiceNow Endpoint. Check SERVICE_NOW_DOMAIN, SERVICE_NOW_CLIENT_ID, "
                              "or SERVICE_NOW_CLIENT_SECRET in the settings file.".format(e))
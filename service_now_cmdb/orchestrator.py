@@ -0,0 +1,183 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction, connection
+from django.db.models import Min, Max, Count, Sum, F
+from django.utils import timezone
+
+from service_now_cmdb.models import CMDBObjectType, CMDBObject, CMDBSyncCheckpoint
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SYNC_PARTITION_SIZE = 10000
+DEFAULT_SYNC_WORKERS = 4
+DEFAULT_SYNC_LEASE = 600
+DEFAULT_SYNC_MAX_ATTEMPTS = 3
+DEFAULT_SYNC_CHUNK_SIZE = 500
+
+
+class SyncOrchestrator:
+    """
+    Pushes every object of many CMDB object types in parallel.
+
+    plan() splits each type into object_id ranges of about partition_size objects and stores one CMDBSyncCheckpoint
+    per range. Workers claim partitions with SELECT ... FOR UPDATE SKIP LOCKED and a lease, like the outbox worker, so
+    threads of this process, other processes and other hosts can share a run. Each partition is pushed in chunks
+    through SNCMDBHandler.push_many and its checkpoint is saved after every chunk, so after a crash the run is resumed
+    by starting it again with the same name: the expired leases are claimed again and continue after
+    last_object_id.
+    """
+
+    def __init__(self, handler, run_name='default', types=None, partition_size=None, chunk_size=None, workers=None):
+        self.handler = handler
+        self.run_name = run_name
+        self.types = types
+        self.partition_size = partition_size or getattr(settings, 'SERVICE_NOW_SYNC_PARTITION_SIZE',
+                                                        DEFAULT_SYNC_PARTITION_SIZE)
+        self.chunk_size = chunk_size or getattr(settings, 'SERVICE_NOW_SYNC_CHUNK_SIZE', DEFAULT_SYNC_CHUNK_SIZE)
+        self.workers = workers or getattr(settings, 'SERVICE_NOW_SYNC_WORKERS', DEFAULT_SYNC_WORKERS)
+        self.lease = getattr(settings, 'SERVICE_NOW_SYNC_LEASE', DEFAULT_SYNC_LEASE)
+        self.max_attempts = getattr(settings, 'SERVICE_NOW_SYNC_MAX_ATTEMPTS', DEFAULT_SYNC_MAX_ATTEMPTS)
+
+    @property
+    def checkpoints(self):
+        return CMDBSyncCheckpoint.objects.filter(run=self.run_name)
+
+    def partitions(self, cmdb_type):
+        """
+        :param cmdb_type: CMDBObjectType
+        :return: list of (start, end) object_id ranges holding about partition_size objects each
+        """
+        bounds = CMDBObject.objects.filter(type=cmdb_type).aggregate(low=Min('object_id'), high=Max('object_id'),
+                                                                     count=Count('pk'))
+        if not bounds['count']:
+            return []
+        span = bounds['high'] - bounds['low'] + 1
+        width = max(1, -(-span * self.partition_size // bounds['count']))
+        return [(start, min(start + width, bounds['high'] + 1)) for start in range(bounds['low'], bounds['high'] + 1,
+                                                                                     width)]
+
+    def plan(self, restart=False):
+        """
+        Create the checkpoints of the run unless it already has some, which are then resumed.
+
+        :param restart: drop the existing checkpoints of the run first
+        :return: number of partitions of the run
+        """
+        with transaction.atomic():
+            if restart:
+                self.checkpoints.delete()
+            if not self.checkpoints.exists():
+                types = self.types if self.types is not None else CMDBObjectType.objects.order_by('pk')
+                CMDBSyncCheckpoint.objects.bulk_create([
+                    CMDBSyncCheckpoint(run=self.run_name, type=cmdb_type, start=start, end=end)
+                    for cmdb_type in types for start, end in self.partitions(cmdb_type)
+                ])
+        return self.checkpoints.count()
+
+    def claim(self):
+        """
+        :return: the next pending CMDBSyncCheckpoint, leased to the caller, or None
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            checkpoint = self.checkpoints.select_for_update(skip_locked=True).filter(
+                done=False, claimed_until__lte=now, attempts__lt=self.max_attempts
+            ).order_by('type_id', 'start').first()
+            if checkpoint is not None:
+                checkpoint.claimed_until = now + timezone.timedelta(seconds=self.lease)
+                checkpoint.save(update_fields=['claimed_until'])
+        return checkpoint
+
+    def sync_partition(self, checkpoint):
+        """
+        Push the objects of the partition after its last checkpoint, saving the progress after every chunk.
+
+        A chunk with failed objects ends the attempt: the checkpoint is kept before the first failed object, so the
+        next attempt pushes it again, and the partition stays pending until it succeeds or runs out of attempts.
+
+        :param checkpoint: claimed CMDBSyncCheckpoint
+        """
+        objects = CMDBObject.objects.filter(type_id=checkpoint.type_id, object_id__gte=checkpoint.start,
+                                            object_id__lt=checkpoint.end).with_key_values().order_by('object_id')
+        last_object_id = checkpoint.last_object_id
+        try:
+            while True:
+                page = objects if last_object_id is None else objects.filter(object_id__gt=last_object_id)
+                chunk = list(page[:self.chunk_size])
+                if not chunk:
+                    break
+                result = self.handler.push_many(chunk, chunk_size=self.chunk_size)
+                failed = {cmdb_object.pk for cmdb_object in result['failed']}
+                for cmdb_object in chunk:
+                    if cmdb_object.pk in failed:
+                        break
+                    last_object_id = cmdb_object.object_id
+                CMDBSyncCheckpoint.objects.filter(pk=checkpoint.pk).update(
+                    last_object_id=last_object_id,
+                    sent=F('sent') + len(result['created']) + len(result['updated']),
+                    skipped=F('skipped') + len(result['skipped']),
+                    failed=F('failed') + len(result['failed']),
+                    claimed_until=timezone.now() + timezone.timedelta(seconds=self.lease),
+                )
+                if failed:
+                    raise ValueError("{} objects failed to push".format(len(failed)))
+            CMDBSyncCheckpoint.objects.filter(pk=checkpoint.pk).update(done=True, last_error='')
+        except Exception as e:
+            logger.warning("Sync of partition %s failed: %s", checkpoint, e)
+            CMDBSyncCheckpoint.objects.filter(pk=checkpoint.pk).update(
+                attempts=F('attempts') + 1, claimed_until=timezone.now(), last_error=str(e)
+            )
+
+    def work(self):
+        """
+        Claim and sync partitions until none is left.
+
+        :return: number of partitions processed
+        """
+        processed = 0
+        try:
+            while True:
+                checkpoint = self.claim()
+                if checkpoint is None:
+                    return processed
+                self.sync_partition(checkpoint)
+                processed += 1
+        finally:
+            # Every thread has its own database connection, which must not outlive it.
+            connection.close()
+
+    def summary(self):
+        """
+        :return: Dictionary with the partitions, their progress and the errors of the failed ones
+        """
+        totals = self.checkpoints.aggregate(partitions=Count('pk'), sent=Sum('sent'), skipped=Sum('skipped'),
+                                            failed=Sum('failed'))
+        summary = {key: value or 0 for key, value in totals.items()}
+        summary['done'] = self.checkpoints.filter(done=True).count()
+        summary['errors'] = [
+            (str(checkpoint), checkpoint.last_error)
+            for checkpoint in self.checkpoints.filter(done=False).exclude(last_error='').order_by('type_id', 'start')
+        ]
+        return summary
+
+    def run_workers(self):
+        """
+        Sync the pending partitions of a planned run with `workers` threads.
+
+        :return: number of partitions processed
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return sum(executor.map(lambda _: self.work(), range(self.workers)))
+
+    def execute(self, restart=False):
+        """
+        Plan the run and sync it with `workers` threads.
+
+        :param restart: start over instead of resuming the run
+        :return: Dictionary, see summary
+        """
+        self.plan(restart=restart)
+        self.run_workers()
+        return self.summary()
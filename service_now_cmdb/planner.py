@@ -0,0 +1,208 @@
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+
+from service_now_cmdb import instrumentation
+from service_now_cmdb.client import get_client, DEFAULT_BATCH_SIZE
+from service_now_cmdb.delta import push_stats
+from service_now_cmdb.export import DEFAULT_EXPORT_CONCURRENCY
+from service_now_cmdb.mappers import attach_source_values
+from service_now_cmdb.references import ReferenceMap, reference_keys, attach_references
+from service_now_cmdb.schema import registry
+from service_now_cmdb.utility.bulk import chunks, bulk_update
+
+logger = logging.getLogger(__name__)
+
+
+def type_order(schemas):
+    """
+    Order object types so that referenced types come before the types referencing them. Types left in a reference
+    cycle follow in id order.
+
+    :param schemas: iterable of ObjectSchema
+    :return: list of ObjectSchema
+    """
+    schemas = sorted(schemas, key=lambda schema: schema.type_id)
+    type_ids = {schema.type_id for schema in schemas}
+    depends = {
+        schema.type_id: {field.reference_type_id for field in schema.reference_fields
+                         if field.reference_type_id in type_ids and field.reference_type_id != schema.type_id}
+        for schema in schemas
+    }
+    ordered = []
+    done = set()
+    while len(ordered) < len(schemas):
+        ready = [schema for schema in schemas if schema.type_id not in done and depends[schema.type_id] <= done]
+        if not ready:
+            ready = [schema for schema in schemas if schema.type_id not in done]
+        ordered.extend(ready)
+        done.update(schema.type_id for schema in ready)
+    return ordered
+
+
+class SyncPlanner:
+    """
+    Pushes CMDB objects that reference each other so that references are sent as sys_ids in the first request.
+
+    The objects to create are ordered topologically: an object is pushed one level after the last object it references
+    that has no sys_id yet. Each level is sent as Batch API requests with up to `concurrency` in flight, and the
+    returned sys_ids go into an in-memory ReferenceMap before the next level is built. Only objects in a reference
+    cycle, or referencing themselves, need a second request; they are updated with the missing sys_ids at the end.
+    """
+
+    def __init__(self, access_token, client=None, batch_size=None, concurrency=None):
+        self.access_token = access_token
+        self.client = client or get_client()
+        self.batch_size = batch_size or getattr(settings, 'SERVICE_NOW_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+        self.concurrency = concurrency or getattr(settings, 'SERVICE_NOW_EXPORT_CONCURRENCY',
+                                                  DEFAULT_EXPORT_CONCURRENCY)
+        self.references = ReferenceMap()
+        self.creating = set()
+        self.deferred = []
+
+    @staticmethod
+    def key(cmdb_object):
+        return cmdb_object.type_id, cmdb_object.object_id
+
+    def load(self, queryset):
+        """
+        :param queryset: CMDBObject QuerySet or list
+        :return: list of CMDBObject with their sourced values and references attached
+        """
+        if hasattr(queryset, 'with_key_values'):
+            queryset = queryset.with_key_values()
+        cmdb_objects = attach_source_values(list(queryset))
+        for cmdb_object in cmdb_objects:
+            self.references.add(cmdb_object.type_id, cmdb_object.object_id, cmdb_object.service_now_id)
+        return attach_references(cmdb_objects, self.references)
+
+    def levels(self, cmdb_objects):
+        """
+        :param cmdb_objects: list of CMDBObject with their sourced values attached
+        :return: list of lists of CMDBObject, each ordered by type order and pk. Objects in a reference cycle, or
+                 waiting on one, make up the last level.
+        """
+        rank = {schema.type_id: index for index, schema in enumerate(type_order(registry.all()))}
+        self.creating = {self.key(cmdb_object) for cmdb_object in cmdb_objects if not cmdb_object.service_now_id}
+
+        waiting = dict()
+        dependents = dict()
+        for cmdb_object in cmdb_objects:
+            key = self.key(cmdb_object)
+            depends = {dependency for dependency in reference_keys(registry.get_for_type(cmdb_object.type_id),
+                                                                   cmdb_object.key_value).values()
+                       if dependency in self.creating and dependency != key}
+            waiting[key] = len(depends)
+            for dependency in depends:
+                dependents.setdefault(dependency, []).append(cmdb_object)
+
+        levels = []
+        level = [cmdb_object for cmdb_object in cmdb_objects if not waiting[self.key(cmdb_object)]]
+        placed = 0
+        while level:
+            levels.append(sorted(level, key=lambda o: (rank.get(o.type_id, 0), o.pk)))
+            placed += len(level)
+            following = []
+            for cmdb_object in level:
+                for dependent in dependents.get(self.key(cmdb_object), []):
+                    waiting[self.key(dependent)] -= 1
+                    if not waiting[self.key(dependent)]:
+                        following.append(dependent)
+            level = following
+
+        if placed < len(cmdb_objects):
+            cyclic = [cmdb_object for cmdb_object in cmdb_objects if waiting[self.key(cmdb_object)] > 0]
+            levels.append(sorted(cyclic, key=lambda o: (rank.get(o.type_id, 0), o.pk)))
+        return levels
+
+    def request(self, cmdb_object):
+        """
+        :return: tuple of the Batch API sub request and the values it sends, or None when nothing changed
+        """
+        endpoint = registry.get_for_type(cmdb_object.type_id).endpoint
+        if cmdb_object.service_now_id:
+            payload, values = cmdb_object.delta_payload()
+            if payload is None:
+                return None
+            path = "api/now/table/{}/{}".format(endpoint, cmdb_object.service_now_id)
+            return self.client.batch_request(cmdb_object.pk, 'PUT', path, payload), values
+        values = cmdb_object.push_values
+        path = "api/now/table/{}".format(endpoint)
+        return self.client.batch_request(cmdb_object.pk, 'POST', path, values), values
+
+    def _send(self, rest_requests):
+        try:
+            return self.client.batch(self.access_token, rest_requests)
+        finally:
+            # The token provider may have queried the database from this worker thread.
+            connection.close()
+
+    def push_level(self, level):
+        """
+        Send the objects of one level in parallel Batch API requests and record their sys_ids.
+
+        :param level: list of CMDBObject
+        :return: Counter of created, updated, skipped and failed objects
+        """
+        stats = Counter()
+        pending = []
+        for cmdb_object in level:
+            schema = registry.get_for_type(cmdb_object.type_id)
+            if any(key in self.creating for key in self.references.unresolved(schema, cmdb_object.key_value)):
+                self.deferred.append(cmdb_object)
+            request = self.request(cmdb_object)
+            if request is None:
+                push_stats.record(sent=False)
+                stats['skipped'] += 1
+                continue
+            pending.append((cmdb_object,) + request)
+
+        batches = [[rest_request for _, rest_request, _ in batch] for batch in chunks(pending, self.batch_size)]
+        responses = dict()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = [(executor.submit(self._send, rest_requests), rest_requests) for rest_requests in batches]
+            for future, rest_requests in futures:
+                # A failed batch leaves its objects without a response, so they are counted as failed while the
+                # sys_ids of the other batches are still stored.
+                try:
+                    responses.update(future.result())
+                except Exception as e:
+                    logger.warning("Planned push batch of %s objects failed: %s", len(rest_requests), e)
+
+        pushed = []
+        for cmdb_object, _, values in pending:
+            status_code, body = responses.get(str(cmdb_object.pk), (None, None))
+            if status_code not in (200, 201) or not body:
+                stats['failed'] += 1
+                continue
+            stats['updated' if cmdb_object.service_now_id else 'created'] += 1
+            cmdb_object.service_now_id = body['result']['sys_id']
+            cmdb_object.mark_pushed(values)
+            self.references.add(cmdb_object.type_id, cmdb_object.object_id, cmdb_object.service_now_id)
+            push_stats.record(sent=True)
+            pushed.append(cmdb_object)
+        bulk_update(pushed, ['service_now_id', 'pushed_hash', 'pushed_values'], batch_size=self.batch_size)
+        return stats
+
+    def run(self, queryset):
+        """
+        :param queryset: CMDBObject QuerySet or list
+        :return: Dictionary with the number of levels, of created, updated, skipped and failed objects, and of the
+                 objects updated again once the sys_ids of their cycle were known
+        """
+        with instrumentation.operation('push_planned') as current:
+            cmdb_objects = self.load(queryset)
+            current['endpoint'] = instrumentation.common_endpoint(cmdb_objects)
+            levels = self.levels(cmdb_objects)
+            stats = Counter({'created': 0, 'updated': 0, 'skipped': 0, 'failed': 0})
+            for level in levels:
+                stats.update(self.push_level(level))
+
+            deferred = [cmdb_object for cmdb_object in self.deferred if cmdb_object.service_now_id]
+            self.deferred = []
+            fixups = self.push_level(deferred)
+            stats['failed'] += fixups['failed']
+            return dict(stats, levels=len(levels), deferred=fixups['updated'])
@@ -0,0 +1,138 @@
+import json
+import time
+
+from django.conf import settings
+from requests import TooManyRedirects, HTTPError, ConnectionError, Timeout
+
+from service_now_cmdb.client import get_client
+from service_now_cmdb.models import CMDBObjectType, CMDBObject, CMDBObjectValue
+from service_now_cmdb.schema import registry
+
+DEFAULT_PULL_PAGE_SIZE = 1000
+DEFAULT_PULL_OVERLAP = 60
+SYS_UPDATED_ON_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class TablePuller:
+    """
+    Pulls the records of one CMDB object type from the ServiceNow Table API into the local values.
+
+    Pages are read with keyset pagination on sys_id, only the type's fields are requested and, unless a full pull is
+    asked for, only records updated since the stored sys_updated_on watermark. Each page is applied with one bulk_set.
+
+    The new watermark is the start of the run minus an overlap, not the newest sys_updated_on seen: a record updated
+    during the pull may sit on a page that was already read, and must be pulled again next time.
+    """
+
+    def __init__(self, cmdb_type, access_token, client=None, page_size=None):
+        self.schema = registry.get_for_type(cmdb_type)
+        self.access_token = access_token
+        self.client = client or get_client()
+        self.page_size = page_size or getattr(settings, 'SERVICE_NOW_PULL_PAGE_SIZE', DEFAULT_PULL_PAGE_SIZE)
+        self.overlap = getattr(settings, 'SERVICE_NOW_PULL_OVERLAP', DEFAULT_PULL_OVERLAP)
+
+    def query(self, watermark, last_sys_id, condition=''):
+        """
+        :param watermark: sys_updated_on lower bound, or '' for every record
+        :param last_sys_id: sys_id of the last record of the previous page
+        :param condition: encoded query the records must also match
+        :return: String usable as sysparm_query
+        """
+        conditions = []
+        if condition:
+            conditions.append(condition)
+        if watermark:
+            conditions.append("sys_updated_on>={}".format(watermark))
+        if last_sys_id:
+            conditions.append("sys_id>{}".format(last_sys_id))
+        conditions.append("ORDERBYsys_id")
+        return "^".join(conditions)
+
+    def fetch_page(self, watermark, last_sys_id, fields=None, condition=''):
+        """
+        :return: list of records
+        :raises ValueError:
+        """
+        if fields is None:
+            fields = self.schema.field_names
+        params = {
+            'sysparm_query': self.query(watermark, last_sys_id, condition),
+            'sysparm_fields': ",".join(['sys_id', 'sys_updated_on'] + list(fields)),
+            'sysparm_limit': self.page_size,
+            'sysparm_exclude_reference_link': 'true',
+        }
+        try:
+            r = self.client.send(
+                'GET',
+                self.client.table_url(self.schema.endpoint),
+                self.access_token,
+                params=params
+            )
+        except (ConnectionError, Timeout, HTTPError, TooManyRedirects) as e:
+            raise ValueError("Invalid Endpoint. Error: {}".format(e))
+
+        if r.status_code == 401:
+            raise ValueError("Bad Access Token")
+        if r.status_code != 200:
+            raise ValueError("Pulling '{}' failed with status {}".format(self.schema.endpoint, r.status_code))
+        return json.loads(r.text)['result']
+
+    def pages(self, watermark='', fields=None, condition=''):
+        """
+        :param watermark: sys_updated_on lower bound, or '' for every record
+        :param fields: field names to request, the type's fields by default
+        :param condition: encoded query the records must also match
+        :return: Generator of lists of records
+        """
+        last_sys_id = ''
+        while True:
+            records = self.fetch_page(watermark, last_sys_id, fields, condition)
+            # A short page does not mean the end: ACLs can filter rows out of a page after the limit was applied.
+            if not records:
+                return
+            yield records
+            last_sys_id = records[-1]['sys_id']
+
+    def apply(self, records):
+        """
+        Write the records into the values of the local objects with the same sys_id.
+
+        :param records: list of records
+        :return: tuple of the number of created and updated values
+        """
+        objects = {
+            cmdb_object.service_now_id: cmdb_object for cmdb_object in
+            CMDBObject.objects.filter(type_id=self.schema.type_id,
+                                      service_now_id__in=[record['sys_id'] for record in records])
+        }
+        items = []
+        for record in records:
+            cmdb_object = objects.get(record['sys_id'])
+            if cmdb_object is None:
+                continue
+            for name in self.schema.field_names:
+                if name in record:
+                    value = record[name]
+                    items.append((cmdb_object, name, '' if value is None else value))
+        return CMDBObjectValue.objects.bulk_set(items)
+
+    def run(self, full=False):
+        """
+        :param full: ignore the watermark and pull every record
+        :return: Dictionary with the number of records seen and values created and updated
+        """
+        watermark = '' if full else CMDBObjectType.objects.values_list('pull_watermark', flat=True).get(
+            pk=self.schema.type_id)
+        # sys_updated_on is in UTC. The overlap also covers clock skew between this host and the instance.
+        started = time.strftime(SYS_UPDATED_ON_FORMAT, time.gmtime(time.time() - self.overlap))
+        stats = {'records': 0, 'created': 0, 'updated': 0}
+        for records in self.pages(watermark):
+            created, updated = self.apply(records)
+            stats['records'] += len(records)
+            stats['created'] += created
+            stats['updated'] += updated
+
+        # The pages are ordered by sys_id, so the watermark can only move once every page was applied.
+        if started > watermark:
+            CMDBObjectType.objects.filter(pk=self.schema.type_id).update(pull_watermark=started)
+        return stats
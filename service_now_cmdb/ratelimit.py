@@ -0,0 +1,195 @@
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_RETRY_BACKOFF = 1.0
+DEFAULT_RETRY_MAX_BACKOFF = 60.0
+RETRY_STATUS_CODES = (429, 503)
+INSTANCE_KEY = '*'
+
+TABLE_PATH = re.compile(r'/api/now/(?:v\d+/)?table/([^/?]+)')
+
+
+class TokenBucket:
+    """
+    Allows `rate` requests per second on average with bursts of up to `burst` requests.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Take a token, going into debt if none is left.
+
+        :return: seconds the caller has to wait before sending
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class ThrottleStats:
+    """
+    Thread safe counters of the time spent waiting on the rate limiter and on 429/503 responses.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.limited = 0
+            self.limited_wait = 0.0
+            self.retries = 0
+            self.retry_wait = 0.0
+
+    def record_limited(self, wait):
+        with self._lock:
+            self.limited += 1
+            self.limited_wait += wait
+
+    def record_retry(self, wait):
+        with self._lock:
+            self.retries += 1
+            self.retry_wait += wait
+
+    def as_dict(self):
+        return {
+            'limited': self.limited,
+            'limited_wait': self.limited_wait,
+            'retries': self.retries,
+            'retry_wait': self.retry_wait,
+        }
+
+
+throttle_stats = ThrottleStats()
+
+
+def endpoint_from_url(url):
+    """
+    :param url:
+    :return: the Table API table of the url, 'batch' for the Batch API or '' for anything else
+    """
+    match = TABLE_PATH.search(url)
+    if match:
+        return match.group(1)
+    if '/api/now/v1/batch' in url:
+        return 'batch'
+    return ''
+
+
+class RateLimiter:
+    """
+    Token buckets for the whole instance and per endpoint, configured with SERVICE_NOW_RATE_LIMITS:
+
+        SERVICE_NOW_RATE_LIMITS = {
+            '*': {'rate': 20, 'burst': 40},               # every request to the instance
+            'cmdb_ci_ip_network': {'rate': 5},           # requests to one table
+        }
+
+    Without the setting requests are not limited.
+    """
+
+    def __init__(self, limits=None):
+        if limits is None:
+            limits = getattr(settings, 'SERVICE_NOW_RATE_LIMITS', None) or {}
+        self.buckets = {key: TokenBucket(conf['rate'], conf.get('burst')) for key, conf in limits.items()}
+
+    def reserve(self, endpoint):
+        """
+        :param endpoint: table name as returned by endpoint_from_url
+        :return: seconds the caller has to wait before sending
+        """
+        wait = 0.0
+        for key in (INSTANCE_KEY, endpoint):
+            bucket = self.buckets.get(key)
+            if bucket is not None:
+                wait = max(wait, bucket.reserve())
+        if wait:
+            throttle_stats.record_limited(wait)
+        return wait
+
+
+class RetryPolicy:
+    """
+    Decides whether and how long to wait before retrying a throttled request. Retry-After is honored, otherwise the
+    delay grows exponentially with full jitter.
+    """
+
+    def __init__(self, max_retries=None, backoff=None, max_backoff=None):
+        self.max_retries = max_retries if max_retries is not None else getattr(
+            settings, 'SERVICE_NOW_MAX_RETRIES', DEFAULT_MAX_RETRIES)
+        self.backoff = backoff or getattr(settings, 'SERVICE_NOW_RETRY_BACKOFF', DEFAULT_RETRY_BACKOFF)
+        self.max_backoff = max_backoff or getattr(settings, 'SERVICE_NOW_RETRY_MAX_BACKOFF', DEFAULT_RETRY_MAX_BACKOFF)
+
+    @staticmethod
+    def retry_after(response):
+        """
+        :param response:
+        :return: seconds from the Retry-After header, or None
+        """
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            return max((parsedate_to_datetime(value) - timezone.now()).total_seconds(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+    def delay(self, response, attempt):
+        """
+        :param response:
+        :param attempt: number of retries already made
+        :return: seconds to wait before the next attempt, or None if the response should be returned as is
+        """
+        if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+            return None
+        retry_after = self.retry_after(response)
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        return random.uniform(0, min(self.backoff * (2 ** attempt), self.max_backoff))
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """
+    Return the per process RateLimiter shared by the sync and async clients.
+
+    :return: RateLimiter
+    """
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter()
+    return _limiter
+
+
+def reset_rate_limiter():
+    global _limiter
+    with _limiter_lock:
+        _limiter = None
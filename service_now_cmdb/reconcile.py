@@ -0,0 +1,132 @@
+from collections import namedtuple
+
+from service_now_cmdb import instrumentation
+from service_now_cmdb.export import StreamingExporter, ExportPayload
+from service_now_cmdb.mappers import source_values
+from service_now_cmdb.pull import TablePuller
+from service_now_cmdb.references import resolve_many
+from service_now_cmdb.utility.bulk import chunks
+
+ReconcileResult = namedtuple('ReconcileResult', ['creates', 'updates', 'drift', 'orphans', 'orphan_count'])
+
+
+class Reconciler:
+    """
+    Compares the local objects of one CMDB object type with the records of its ServiceNow table.
+
+    The local objects and their values, sourced fields included, are loaded once into a dictionary keyed by
+    service_now_id. The remote table is then read page by page with only the type's fields and each record is looked up
+    in that dictionary, so the remote side is never held in memory as a whole. The result lists:
+
+    - creates: local objects without a service_now_id, or whose sys_id no longer exists remotely
+    - updates: local objects with at least one field whose remote value differs
+    - drift: local object pk -> Dictionary of field name -> (local value, remote value)
+    - orphans: sys_ids of remote records matching orphan_query that no local object points to
+    - orphan_count: number of remote records that no local object points to
+
+    The table usually also holds records of other discovery sources, so the orphans are only looked for among the
+    records matching orphan_query, e.g. 'discovery_source=MyApp'. Without it the unmatched records are only counted,
+    as the table can be much larger than the local objects, and none can be deleted.
+    """
+
+    def __init__(self, cmdb_type, access_token, client=None, page_size=None, batch_size=None, orphan_query=''):
+        self.exporter = StreamingExporter(cmdb_type, access_token, client=client, batch_size=batch_size)
+        self.puller = TablePuller(cmdb_type, access_token, client=self.exporter.client, page_size=page_size)
+        self.schema = self.exporter.schema
+        self.orphan_query = orphan_query
+
+    def local(self):
+        """
+        :return: tuple of a Dictionary of service_now_id -> ExportPayload and a list of ExportPayload without one
+        """
+        linked = dict()
+        unlinked = []
+        for chunk in chunks(self.exporter.grouped(), self.exporter.batch_size):
+            sources = source_values(self.schema, [row[1] for row in chunk])
+            for row in chunk:
+                row[4].update(sources.get(row[1], {}))
+            resolved = resolve_many(self.schema, [row[4] for row in chunk])
+            for (pk, object_id, service_now_id, _, _), values in zip(chunk, resolved):
+                if not values:
+                    continue
+                if service_now_id:
+                    linked[service_now_id] = ExportPayload(pk, service_now_id, values)
+                else:
+                    unlinked.append(ExportPayload(pk, None, values))
+        return linked, unlinked
+
+    @staticmethod
+    def drifted_fields(values, record):
+        """
+        :param values: local Dictionary of field name -> value
+        :param record: remote record
+        :return: Dictionary of field name -> (local value, remote value) for the fields that differ
+        """
+        drifted = dict()
+        for name, value in values.items():
+            remote = record.get(name)
+            remote = '' if remote is None else str(remote)
+            if remote != value:
+                drifted[name] = (value, remote)
+        return drifted
+
+    def diff(self):
+        """
+        :return: ReconcileResult
+        """
+        with instrumentation.operation('reconcile', self.schema.endpoint):
+            linked, creates = self.local()
+            sys_ids = set(linked)
+            updates, drift, orphans, orphan_count = [], dict(), [], 0
+            for records in self.puller.pages(fields=self.schema.field_names):
+                for record in records:
+                    payload = linked.pop(record['sys_id'], None)
+                    if payload is None:
+                        orphan_count += 1
+                        continue
+                    drifted = self.drifted_fields(payload.values, record)
+                    if drifted:
+                        updates.append(payload)
+                        drift[payload.object_id] = drifted
+
+            # Whatever is left points to records that were deleted remotely.
+            creates.extend(ExportPayload(payload.object_id, None, payload.values) for payload in linked.values())
+
+            if self.orphan_query:
+                for records in self.puller.pages(fields=[], condition=self.orphan_query):
+                    orphans.extend(record['sys_id'] for record in records if record['sys_id'] not in sys_ids)
+                orphan_count = len(orphans)
+            result = ReconcileResult(creates, updates, drift, orphans, orphan_count)
+        return result
+
+    def delete_orphans(self, sys_ids):
+        """
+        :param sys_ids: remote records to delete
+        :return: number of deleted records
+        """
+        client = self.exporter.client
+        deleted = 0
+        for batch in chunks(sys_ids, self.exporter.batch_size):
+            responses = client.batch(self.exporter.access_token, [
+                client.batch_request(sys_id, 'DELETE', "api/now/table/{}/{}".format(self.schema.endpoint, sys_id))
+                for sys_id in batch
+            ])
+            deleted += sum(1 for status_code, _ in responses.values() if status_code in (200, 204))
+        return deleted
+
+    def apply(self, result, delete_orphans=False):
+        """
+        Push the local values of the objects to create and update through the Batch API, storing the new sys_ids with
+        bulk updates, and optionally delete the orphans.
+
+        :param result: ReconcileResult
+        :param delete_orphans: also delete the remote records no local object points to
+        :return: Dictionary with the number of sent, failed and deleted records
+        :raises ValueError: if orphans are to be deleted without an orphan_query
+        """
+        if delete_orphans and not self.orphan_query:
+            raise ValueError("Orphans can only be deleted within an orphan_query.")
+        with instrumentation.operation('reconcile_apply', self.schema.endpoint):
+            stats = self.exporter.run(iter(result.creates + result.updates))
+            stats['deleted'] = self.delete_orphans(result.orphans) if delete_orphans else 0
+        return stats
@@ -0,0 +1,131 @@
+from service_now_cmdb.models import CMDBObject
+from service_now_cmdb.schema import registry
+from service_now_cmdb.utility.bulk import chunks
+
+DEFAULT_REFERENCE_QUERY_SIZE = 1000
+
+
+def reference_key(field, value):
+    """
+    :param field: SchemaField with a reference_type_id
+    :param value: stored value of the field
+    :return: (type id, mapped model id) of the referenced object, or None when the value is empty or not an id, e.g.
+             a sys_id pulled from ServiceNow
+    """
+    value = '' if value is None else str(value).strip()
+    if not value.isdigit():
+        return None
+    return field.reference_type_id, int(value)
+
+
+def reference_keys(schema, values):
+    """
+    :param schema: ObjectSchema
+    :param values: Dictionary of field name -> value
+    :return: Dictionary of field name -> (type id, mapped model id) of the objects the values reference
+    """
+    keys = dict()
+    for field in schema.reference_fields:
+        key = reference_key(field, values.get(field.name))
+        if key is not None:
+            keys[field.name] = key
+    return keys
+
+
+class ReferenceMap:
+    """
+    In memory map of (type id, mapped model id) -> service_now_id used to send reference fields as sys_ids.
+
+    Unknown keys are loaded with one query per type and batch of ids. Objects that have no sys_id yet are remembered as
+    unresolved so they are not queried again; add() records the sys_id once they are pushed.
+    """
+
+    def __init__(self):
+        self.sys_ids = dict()
+
+    def add(self, type_id, object_id, service_now_id):
+        self.sys_ids[(type_id, object_id)] = service_now_id or ''
+
+    def load(self, keys):
+        """
+        :param keys: iterable of (type id, mapped model id)
+        """
+        by_type = dict()
+        for type_id, object_id in keys:
+            if (type_id, object_id) not in self.sys_ids:
+                by_type.setdefault(type_id, set()).add(object_id)
+        for type_id, object_ids in by_type.items():
+            for ids in chunks(sorted(object_ids), DEFAULT_REFERENCE_QUERY_SIZE):
+                for object_id in ids:
+                    self.sys_ids[(type_id, object_id)] = ''
+                self.sys_ids.update(
+                    ((type_id, object_id), service_now_id) for object_id, service_now_id in
+                    CMDBObject.objects.filter(type_id=type_id, object_id__in=ids).values_list(
+                        'object_id', 'service_now_id')
+                )
+
+    def get(self, key):
+        """
+        :param key: (type id, mapped model id)
+        :return: the sys_id of the referenced object, '' while it is not pushed or does not exist
+        """
+        if key not in self.sys_ids:
+            self.load([key])
+        return self.sys_ids[key]
+
+    def resolve(self, schema, values):
+        """
+        :param schema: ObjectSchema
+        :param values: Dictionary of field name -> value
+        :return: a copy of the values with the reference fields replaced by sys_ids. Reference fields whose object
+                 has no sys_id yet are left out, so they neither clear nor corrupt the remote value.
+        """
+        resolved = dict(values)
+        for name, key in reference_keys(schema, values).items():
+            sys_id = self.get(key)
+            if sys_id:
+                resolved[name] = sys_id
+            else:
+                del resolved[name]
+        return resolved
+
+    def unresolved(self, schema, values):
+        """
+        :return: list of the (type id, mapped model id) referenced by the values that have no sys_id yet
+        """
+        return [key for key in reference_keys(schema, values).values() if not self.get(key)]
+
+
+def attach_references(cmdb_objects, references=None):
+    """
+    Load the sys_ids referenced by many CMDB objects with one query per type, so push_values does not query per
+    object. Sourced values must be attached first.
+
+    :param cmdb_objects: list of CMDBObject
+    :param references: ReferenceMap to share, a new one by default
+    :return: the same list
+    """
+    references = references if references is not None else ReferenceMap()
+    keys = []
+    for cmdb_object in cmdb_objects:
+        schema = registry.get_for_type(cmdb_object.type_id)
+        if schema.reference_fields:
+            keys.extend(reference_keys(schema, cmdb_object.key_value).values())
+        cmdb_object._references = references
+    references.load(keys)
+    return cmdb_objects
+
+
+def resolve_many(schema, values_list):
+    """
+    Resolve the reference fields of many value dictionaries of one type with one query per referenced type.
+
+    :param schema: ObjectSchema
+    :param values_list: list of Dictionaries of field name -> value
+    :return: list of resolved Dictionaries
+    """
+    if not schema.reference_fields:
+        return values_list
+    references = ReferenceMap()
+    references.load(key for values in values_list for key in reference_keys(schema, values).values())
+    return [references.resolve(schema, values) for values in values_list]
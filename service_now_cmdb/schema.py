@@ -0,0 +1,206 @@
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from service_now_cmdb.models import CMDBObjectType, CMDBObjectField
+
+SCHEMA_VERSION_KEY = 'service_now_cmdb:schema_version'
+DEFAULT_CHECK_INTERVAL = 1.0
+
+SchemaField = namedtuple('SchemaField', ['id', 'name', 'order', 'source', 'reference_type_id'])
+
+
+class ObjectSchema(namedtuple('ObjectSchema', ['type_id', 'name', 'endpoint', 'content_type_id', 'fields'])):
+    """
+    An immutable snapshot of a CMDBObjectType and its ordered fields.
+    """
+
+    @property
+    def field_names(self):
+        return [field.name for field in self.fields]
+
+    @property
+    def sourced_fields(self):
+        """
+        :return: the fields computed from an attribute of the mapped model
+        """
+        return [field for field in self.fields if field.source]
+
+    @property
+    def reference_fields(self):
+        """
+        :return: the fields holding the mapped model id of an object of another, or the same, type
+        """
+        return [field for field in self.fields if field.reference_type_id]
+
+    @property
+    def field_ids(self):
+        """
+        :return: Dictionary of field name -> field id
+        """
+        return {field.name: field.id for field in self.fields}
+
+
+class SchemaRegistry:
+    """
+    In memory cache of the CMDB object types and their fields, keyed by type id and by content type.
+
+    The rows change almost never, so the whole schema is loaded with two queries and kept until a CMDBObjectType
+    or CMDBObjectField is saved or deleted. When SERVICE_NOW_SCHEMA_CACHE names a Django cache, invalidations bump a
+    shared version so every worker reloads.
+
+    A thread that changes the schema inside a transaction reads its own copy, with the uncommitted rows, until the
+    transaction ends; the shared schema is only invalidated once it commits.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._schema = None
+        self._version = None
+        self._checked = 0
+
+    @property
+    def _shared_cache(self):
+        alias = getattr(settings, 'SERVICE_NOW_SCHEMA_CACHE', None)
+        if alias:
+            return caches[alias]
+        return None
+
+    def _shared_version(self):
+        cache = self._shared_cache
+        if cache is None:
+            return None
+        return cache.get_or_set(SCHEMA_VERSION_KEY, 1)
+
+    def _check_shared_version(self):
+        interval = getattr(settings, 'SERVICE_NOW_SCHEMA_CACHE_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL)
+        now = time.monotonic()
+        if self._shared_cache is None or now - self._checked < interval:
+            return
+        self._checked = now
+        if self._shared_version() != self._version:
+            self._schema = None
+
+    def _load(self):
+        fields = dict()
+        rows = CMDBObjectField.objects.order_by('type_id', 'order', 'name').values_list(
+            'pk', 'type_id', 'name', 'order', 'source', 'reference_type_id')
+        for pk, type_id, name, order, source, reference_type_id in rows:
+            fields.setdefault(type_id, []).append(SchemaField(pk, name, order, source, reference_type_id))
+
+        by_type = dict()
+        by_content_type = dict()
+        for pk, name, endpoint, content_type_id in CMDBObjectType.objects.order_by('pk').values_list(
+                'pk', 'name', 'endpoint', 'content_type_id'):
+            schema = ObjectSchema(pk, name, endpoint, content_type_id, tuple(fields.get(pk, [])))
+            by_type[pk] = schema
+            by_content_type.setdefault(content_type_id, schema)
+        return by_type, by_content_type
+
+    def _transaction_schema(self):
+        """
+        :return: this thread's schema while its transaction has schema changes, otherwise None
+        """
+        if not getattr(self._local, 'changed', False):
+            return None
+        if not transaction.get_connection().in_atomic_block:
+            # Committed, and then invalidated for everyone, or rolled back.
+            self._local.changed = False
+            self._local.schema = None
+            return None
+        if self._local.schema is None:
+            self._local.schema = self._load()
+        return self._local.schema
+
+    def _ensure_loaded(self):
+        """
+        :return: tuple of the type id and content type id lookups
+        """
+        schema = self._transaction_schema()
+        if schema is not None:
+            return schema
+        self._check_shared_version()
+        schema = self._schema
+        if schema is None:
+            with self._lock:
+                schema = self._schema
+                if schema is None:
+                    schema = self._load()
+                    self._version = self._shared_version()
+                    self._schema = schema
+        return schema
+
+    def get_for_type(self, cmdb_type):
+        """
+        :param cmdb_type: CMDBObjectType or its id
+        :return: ObjectSchema
+        :raises CMDBObjectType.DoesNotExist:
+        """
+        by_type, _ = self._ensure_loaded()
+        type_id = getattr(cmdb_type, 'pk', cmdb_type)
+        try:
+            return by_type[type_id]
+        except KeyError:
+            raise CMDBObjectType.DoesNotExist("There is no CMDB object type with id '{}'.".format(type_id))
+
+    def get_for_model(self, model):
+        """
+        :param model: model class or instance mapped by a CMDBObjectType
+        :return: ObjectSchema
+        :raises CMDBObjectType.DoesNotExist:
+        """
+        _, by_content_type = self._ensure_loaded()
+        content_type = ContentType.objects.get_for_model(model)
+        try:
+            return by_content_type[content_type.pk]
+        except KeyError:
+            raise CMDBObjectType.DoesNotExist("There is no CMDB object type for '{}'.".format(content_type))
+
+    def all(self):
+        """
+        :return: list of every ObjectSchema
+        """
+        by_type, _ = self._ensure_loaded()
+        return list(by_type.values())
+
+    def invalidate_in_transaction(self):
+        """
+        Make this thread reload the schema, with the uncommitted changes of its transaction, until the transaction
+        ends. Outside of a transaction nothing is left to do: invalidate runs right away.
+        """
+        if transaction.get_connection().in_atomic_block:
+            self._local.changed = True
+            self._local.schema = None
+
+    def invalidate(self, shared=True):
+        """
+        Drop the cached schema in this process and, if a shared cache is configured, in every other worker.
+        """
+        self._schema = None
+        cache = self._shared_cache
+        if shared and cache is not None:
+            try:
+                cache.incr(SCHEMA_VERSION_KEY)
+            except ValueError:
+                cache.set(SCHEMA_VERSION_KEY, 1)
+
+
+registry = SchemaRegistry()
+
+
+@receiver(post_save, sender=CMDBObjectType)
+@receiver(post_delete, sender=CMDBObjectType)
+@receiver(post_save, sender=CMDBObjectField)
+@receiver(post_delete, sender=CMDBObjectField)
+def invalidate_schema(sender, **kwargs):
+    registry.invalidate_in_transaction()
+    # The shared schema after the commit, so no worker can reload and keep the schema as it was before the change.
+    transaction.on_commit(registry.invalidate)
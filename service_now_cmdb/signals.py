@@ -0,0 +1,155 @@
+import threading
+from contextlib import contextmanager
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from service_now_cmdb.models import CMDBObjectType, CMDBObject, CMDBOutbox
+from service_now_cmdb.schema import registry
+
+_state = threading.local()
+
+
+def _pending():
+    if not hasattr(_state, 'saved'):
+        _state.saved = dict()
+        _state.deleted = dict()
+        _state.depth = 0
+    return _state
+
+
+def _forget_rolled_back(state):
+    """
+    Drop the changes of a transaction that rolled back. Its flush callback was discarded with it, so the changes would
+    otherwise be flushed by the next unrelated commit of this thread.
+    """
+    if state.depth or not (state.saved or state.deleted):
+        return
+    if not any(hook[1] is flush for hook in transaction.get_connection().run_on_commit):
+        state.saved, state.deleted = dict(), dict()
+
+
+def _schedule():
+    state = _pending()
+    if state.depth == 0:
+        # Every save registers a callback, the first one to run flushes everything and the others find nothing left.
+        transaction.on_commit(flush)
+
+
+def model_saved(sender, instance, raw=False, **kwargs):
+    """
+    post_save receiver that queues a push of every model mapped by a CMDBObjectType.
+    """
+    if raw or sender._meta.app_label == CMDBObject._meta.app_label:
+        return
+    try:
+        schema = registry.get_for_model(sender)
+    except CMDBObjectType.DoesNotExist:
+        return
+    state = _pending()
+    _forget_rolled_back(state)
+    state.saved.setdefault(schema.type_id, set()).add(instance.pk)
+    state.deleted.get(schema.type_id, set()).discard(instance.pk)
+    _schedule()
+
+
+def model_deleted(sender, instance, **kwargs):
+    """
+    post_delete receiver that removes the CMDB object of a deleted mapped model, and its ServiceNow record.
+    """
+    if sender._meta.app_label == CMDBObject._meta.app_label:
+        return
+    try:
+        schema = registry.get_for_model(sender)
+    except CMDBObjectType.DoesNotExist:
+        return
+    state = _pending()
+    _forget_rolled_back(state)
+    state.deleted.setdefault(schema.type_id, set()).add(instance.pk)
+    state.saved.get(schema.type_id, set()).discard(instance.pk)
+    _schedule()
+
+
+def _existing(type_id, object_ids):
+    """
+    :return: the ids of the mapped model instances that exist
+    """
+    model = ContentType.objects.get_for_id(registry.get_for_type(type_id).content_type_id).model_class()
+    if model is None:
+        return set()
+    return set(model._base_manager.filter(pk__in=object_ids).values_list('pk', flat=True))
+
+
+def flush():
+    """
+    Apply the saves and deletes collected so far: create the missing CMDB objects and queue one push per saved
+    instance. The CMDB objects of deleted instances are removed, and those linked to a ServiceNow record are queued
+    for the deletion of that record first, so the record is not orphaned.
+
+    Whether an instance was saved or deleted is checked against its table, which also settles the changes of a
+    savepoint that rolled back.
+    """
+    state = _pending()
+    saved, deleted = state.saved, state.deleted
+    state.saved, state.deleted = dict(), dict()
+
+    with transaction.atomic():
+        for type_id in set(saved) | set(deleted):
+            object_ids = saved.get(type_id, set()) | deleted.get(type_id, set())
+            if not object_ids:
+                continue
+            existing = _existing(type_id, object_ids)
+
+            gone = CMDBObject.objects.filter(type_id=type_id, object_id__in=object_ids - existing)
+            gone.filter(service_now_id='').delete()
+            CMDBOutbox.enqueue_many(list(gone.exclude(service_now_id='').only('pk')), remove=True)
+
+            if not existing:
+                continue
+            created = existing - set(CMDBObject.objects.filter(type_id=type_id, object_id__in=existing).values_list(
+                'object_id', flat=True))
+            CMDBObject.objects.bulk_create(
+                [CMDBObject(type_id=type_id, object_id=object_id) for object_id in created]
+            )
+            CMDBOutbox.enqueue_many(
+                list(CMDBObject.objects.filter(type_id=type_id, object_id__in=existing).only('pk'))
+            )
+
+
+@contextmanager
+def coalesce():
+    """
+    Collect the saves made inside the block and queue them once when it ends, after the surrounding transaction
+    commits. Nested blocks flush with the outermost one.
+    """
+    state = _pending()
+    state.depth += 1
+    try:
+        yield
+    finally:
+        state.depth -= 1
+        if state.depth == 0 and (state.saved or state.deleted):
+            transaction.on_commit(flush)
+
+
+def connect():
+    post_save.connect(model_saved, dispatch_uid='service_now_cmdb.model_saved')
+    post_delete.connect(model_deleted, dispatch_uid='service_now_cmdb.model_deleted')
+
+
+def disconnect():
+    post_save.disconnect(dispatch_uid='service_now_cmdb.model_saved')
+    post_delete.disconnect(dispatch_uid='service_now_cmdb.model_deleted')
+
+
+@receiver(setting_changed)
+def toggle_on_setting_changed(setting, value, **kwargs):
+    if setting != 'SERVICE_NOW_AUTO_SYNC':
+        return
+    if value:
+        connect()
+    else:
+        disconnect()
@@ -0,0 +1,355 @@
+import base64
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, Counter, namedtuple
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit, parse_qs
+
+DEFAULT_TOKEN_LIFETIME = 1800
+DEFAULT_MAX_LIMIT = 10000
+
+CONDITION = re.compile(r'^(?P<field>\w+?)(?P<operator>>=|<=|!=|>|<|=|STARTSWITH|IN)(?P<value>.*)$')
+TABLE_PATH = re.compile(r'^/api/now/(?:v\d+/)?table/(?P<table>\w+)(?:/(?P<sys_id>\w+))?/?$')
+
+Fault = namedtuple('Fault', ['status', 'path', 'retry_after'])
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def timestamp():
+    """
+    :return: the current UTC time in the sys_updated_on format
+    """
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+
+
+def matches(record, condition):
+    """
+    :param record: Dictionary
+    :param condition: one encoded query condition, e.g. sys_id>abc
+    :return: Boolean
+    :raises ValueError: when the condition is not supported
+    """
+    match = CONDITION.match(condition)
+    if not match:
+        raise ValueError("Unsupported query condition '{}'".format(condition))
+    actual = str(record.get(match.group('field')) or '')
+    operator, value = match.group('operator'), match.group('value')
+    if operator == 'IN':
+        return actual in value.split(',')
+    if operator == 'STARTSWITH':
+        return actual.startswith(value)
+    return {
+        '=': actual == value,
+        '!=': actual != value,
+        '>': actual > value,
+        '>=': actual >= value,
+        '<': actual < value,
+        '<=': actual <= value,
+    }[operator]
+
+
+class FakeServiceNow:
+    """
+    An in-memory ServiceNow instance served over HTTP on a free local port, for integration and load tests.
+
+    It answers the Table API (list with sysparm_query, sysparm_fields, sysparm_limit and sysparm_offset; get, create,
+    update and delete by sys_id), the Batch API and the OAuth token endpoint with the password and refresh_token
+    grants. Every response can be delayed by a fixed or random latency, and 401, 429 or 5xx responses can be injected.
+
+    Usage:
+        with FakeServiceNow(latency=(0.01, 0.05)) as instance:
+            client = ServiceNowClient(base_url=instance.base_url)
+            ...
+
+    or point every client at it with SERVICE_NOW_BASE_URL=instance.base_url.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0, users=None, require_auth=True, token_lifetime=None,
+                 max_limit=None):
+        """
+        :param latency: seconds added to every response, or a (low, high) range to draw it from
+        :param users: Dictionary of username -> password accepted by the password grant, any user when None
+        :param require_auth: answer Table and Batch API calls without a known, unexpired access token with 401
+        :param token_lifetime: expires_in of the issued access tokens
+        :param max_limit: the largest page the Table API returns
+        """
+        self.latency = latency
+        self.users = users
+        self.require_auth = require_auth
+        self.token_lifetime = token_lifetime or DEFAULT_TOKEN_LIFETIME
+        self.max_limit = max_limit or DEFAULT_MAX_LIMIT
+        self.tables = dict()
+        self.access_tokens = dict()
+        self.refresh_tokens = set()
+        self.faults = []
+        # (method, path without the sys_id, status code) -> number of requests
+        self.calls = Counter()
+        self.lock = threading.Lock()
+
+        self.server = ThreadingHTTPServer((host, port), FakeServiceNowHandler)
+        self.server.instance = self
+        self.base_url = "http://{}:{}".format(host, self.server.server_port)
+        self.thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    # Test controls
+
+    def table(self, name):
+        """
+        :return: OrderedDict of sys_id -> record
+        """
+        with self.lock:
+            return self.tables.setdefault(name, OrderedDict())
+
+    def insert(self, table, **fields):
+        """
+        Add a record as if it had been created in ServiceNow.
+
+        :return: the stored record
+        """
+        with self.lock:
+            return self._create(table, fields)
+
+    def issue_token(self):
+        """
+        :return: Dictionary shaped like the oauth_token.do response
+        """
+        access_token, refresh_token = uuid.uuid4().hex, uuid.uuid4().hex
+        with self.lock:
+            self.access_tokens[access_token] = time.time() + self.token_lifetime
+            self.refresh_tokens.add(refresh_token)
+        return {
+            'access_token': access_token,
+            'refresh_token': refresh_token,
+            'scope': 'useraccount',
+            'token_type': 'Bearer',
+            'expires_in': self.token_lifetime,
+        }
+
+    def expire_tokens(self):
+        """
+        Invalidate every issued access token; the refresh tokens stay valid.
+        """
+        with self.lock:
+            self.access_tokens.clear()
+
+    def inject(self, status, count=1, path=None, retry_after=None):
+        """
+        Answer the next count requests with status instead of handling them.
+
+        :param status: e.g. 401, 429 or 503
+        :param path: only requests whose path starts with it, e.g. /api/now/v1/batch
+        :param retry_after: value of the Retry-After header
+        """
+        with self.lock:
+            self.faults.extend([Fault(status, path, retry_after)] * count)
+
+    # Request handling
+
+    def delay(self):
+        latency = self.latency
+        if isinstance(latency, (tuple, list)):
+            latency = random.uniform(*latency)
+        if latency:
+            time.sleep(latency)
+
+    def _fault(self, path):
+        with self.lock:
+            for index, fault in enumerate(self.faults):
+                if fault.path is None or path.startswith(fault.path):
+                    return self.faults.pop(index)
+        return None
+
+    def _authorized(self, authorization):
+        if not self.require_auth:
+            return True
+        if not authorization or not authorization.startswith('Bearer '):
+            return False
+        with self.lock:
+            expires = self.access_tokens.get(authorization[len('Bearer '):])
+        return expires is not None and expires > time.time()
+
+    def handle(self, method, url, headers, body):
+        """
+        :param method:
+        :param url: path and query string
+        :param headers: request headers
+        :param body: raw request body
+        :return: tuple of the status code, the response body as a Dictionary or None and a Dictionary of headers
+        """
+        path = urlsplit(url).path
+        self.delay()
+
+        fault = self._fault(path)
+        if fault is not None:
+            self.count(method, path, fault.status)
+            extra = {'Retry-After': str(fault.retry_after)} if fault.retry_after is not None else {}
+            return fault.status, self.error("Injected fault", fault.status), extra
+
+        if path == '/oauth_token.do' and method == 'POST':
+            status, result = self.oauth(parse_qs(body.decode('utf-8')))
+        elif not self._authorized(headers.get('Authorization')):
+            status, result = 401, self.error("User Not Authenticated", 401)
+        elif path.startswith('/api/now/v1/batch') and method == 'POST':
+            status, result = self.batch(json.loads(body.decode('utf-8') or '{}'))
+        else:
+            status, result = self.table_api(method, url, body)
+        self.count(method, path, status)
+        return status, result, {}
+
+    def count(self, method, path, status):
+        match = TABLE_PATH.match(path)
+        route = "/api/now/table/{}".format(match.group('table')) if match else path
+        with self.lock:
+            self.calls[(method, route, status)] += 1
+
+    @staticmethod
+    def error(message, status):
+        return {'error': {'message': message, 'detail': "Status {}".format(status)}, 'status': 'failure'}
+
+    def oauth(self, form):
+        grant_type = form.get('grant_type', [''])[0]
+        if grant_type == 'password':
+            username, password = form.get('username', [''])[0], form.get('password', [''])[0]
+            if self.users is not None and self.users.get(username) != password:
+                return 401, {'error_description': 'access_denied', 'error': 'server_error'}
+            return 200, self.issue_token()
+        if grant_type == 'refresh_token':
+            refresh_token = form.get('refresh_token', [''])[0]
+            with self.lock:
+                known = refresh_token in self.refresh_tokens
+            if not known:
+                return 401, {'error_description': 'access_denied', 'error': 'server_error'}
+            return 200, self.issue_token()
+        return 400, {'error_description': 'unsupported grant_type', 'error': 'invalid_request'}
+
+    def batch(self, payload):
+        serviced = []
+        for rest_request in payload.get('rest_requests', []):
+            body = base64.b64decode(rest_request['body']) if rest_request.get('body') else b''
+            status, result = self.table_api(rest_request['method'], rest_request['url'], body)
+            serviced.append({
+                'id': rest_request['id'],
+                'status_code': status,
+                'status_text': 'OK' if status < 400 else 'Error',
+                'headers': [{'name': 'Content-Type', 'value': 'application/json'}],
+                'body': base64.b64encode(json.dumps(result).encode('utf-8')).decode('ascii') if result else '',
+                'execution_time': 0,
+            })
+        return 200, {'batch_request_id': payload.get('batch_request_id'), 'serviced_requests': serviced,
+                     'unserviced_requests': []}
+
+    def table_api(self, method, url, body):
+        """
+        :return: tuple of the status code and the response body as a Dictionary or None
+        """
+        parts = urlsplit(url)
+        match = TABLE_PATH.match(parts.path)
+        if not match:
+            return 400, self.error("Invalid path {}".format(parts.path), 400)
+        params = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        table, sys_id = match.group('table'), match.group('sys_id')
+
+        try:
+            with self.lock:
+                records = self.tables.setdefault(table, OrderedDict())
+                if method == 'GET' and sys_id is None:
+                    return 200, {'result': [self.fields(record, params) for record in self.query(records, params)]}
+                if method == 'POST' and sys_id is None:
+                    record = self._create(table, json.loads(body.decode('utf-8') or '{}'))
+                    return 201, {'result': self.fields(record, params)}
+                if sys_id is None:
+                    return 405, self.error("Method not supported", 405)
+                if sys_id not in records:
+                    return 404, self.error("No Record found", 404)
+                if method == 'GET':
+                    return 200, {'result': self.fields(records[sys_id], params)}
+                if method in ('PUT', 'PATCH'):
+                    records[sys_id].update(json.loads(body.decode('utf-8') or '{}'))
+                    records[sys_id].update(sys_id=sys_id, sys_updated_on=timestamp())
+                    return 200, {'result': self.fields(records[sys_id], params)}
+                if method == 'DELETE':
+                    del records[sys_id]
+                    return 204, None
+        except ValueError as e:
+            return 400, self.error(str(e), 400)
+        return 405, self.error("Method not supported", 405)
+
+    def _create(self, table, fields):
+        now = timestamp()
+        record = dict(fields, sys_id=uuid.uuid4().hex, sys_created_on=now, sys_updated_on=now)
+        self.tables.setdefault(table, OrderedDict())[record['sys_id']] = record
+        return record
+
+    def query(self, records, params):
+        """
+        Apply sysparm_query, sysparm_offset and sysparm_limit. Conditions are joined with ^ and support =, !=, >, >=,
+        <, <=, STARTSWITH, IN, ORDERBY and ORDERBYDESC.
+
+        :return: list of records
+        """
+        results = list(records.values())
+        ordering = []
+        for condition in filter(None, params.get('sysparm_query', '').split('^')):
+            if condition.startswith('ORDERBYDESC'):
+                ordering.append((condition[len('ORDERBYDESC'):], True))
+            elif condition.startswith('ORDERBY'):
+                ordering.append((condition[len('ORDERBY'):], False))
+            else:
+                results = [record for record in results if matches(record, condition)]
+        for field, descending in reversed(ordering):
+            results.sort(key=lambda record: str(record.get(field) or ''), reverse=descending)
+        offset = int(params.get('sysparm_offset') or 0)
+        limit = min(int(params.get('sysparm_limit') or self.max_limit), self.max_limit)
+        return results[offset:offset + limit]
+
+    @staticmethod
+    def fields(record, params):
+        if not params.get('sysparm_fields'):
+            return dict(record)
+        return {name: record.get(name, '') for name in params['sysparm_fields'].split(',')}
+
+
+class FakeServiceNowHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) if length else b''
+        status, result, headers = self.server.instance.handle(self.command, self.path, self.headers, body)
+        data = json.dumps(result).encode('utf-8') if result is not None else b''
+        self.send_response(status)
+        if data:
+            self.send_header('Content-Type', 'application/json')
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+    def log_message(self, *args):
+        pass
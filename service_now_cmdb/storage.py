@@ -0,0 +1,48 @@
+from django.db import transaction
+
+from service_now_cmdb.models import CMDBObject, CMDBObjectValue
+from service_now_cmdb.models.cmdb import DEFAULT_BULK_BATCH_SIZE
+from service_now_cmdb.utility.bulk import chunks, bulk_update
+
+
+def rows_to_attributes(batch_size=DEFAULT_BULK_BATCH_SIZE, delete_rows=False):
+    """
+    Copy the CMDBObjectValue rows into CMDBObject.attributes, one batch of objects per transaction. Run it before
+    switching SERVICE_NOW_VALUE_STORAGE to 'json'.
+
+    :param batch_size: objects per batch
+    :param delete_rows: delete the copied rows
+    :return: number of objects converted
+    """
+    converted = 0
+    for ids in chunks(CMDBObject.objects.order_by('pk').values_list('pk', flat=True).iterator(), batch_size):
+        attributes = {pk: dict() for pk in ids}
+        rows = CMDBObjectValue.objects.filter(object_id__in=ids).values_list('object_id', 'field__name', 'value')
+        for object_id, name, value in rows:
+            attributes[object_id][name] = value
+        with transaction.atomic():
+            bulk_update([CMDBObject(pk=pk, attributes=values) for pk, values in attributes.items()], ['attributes'],
+                        batch_size=batch_size)
+            if delete_rows:
+                CMDBObjectValue.objects.filter(object_id__in=ids).delete()
+        converted += len(ids)
+    return converted
+
+
+def attributes_to_rows(batch_size=DEFAULT_BULK_BATCH_SIZE):
+    """
+    Write CMDBObject.attributes back into CMDBObjectValue rows, to return to the 'rows' storage.
+
+    :param batch_size: objects per batch
+    :return: tuple of the number of created and updated values
+    """
+    created = updated = 0
+    objects = CMDBObject.objects.order_by('pk').only('pk', 'type_id', 'attributes').iterator()
+    for batch in chunks(objects, batch_size):
+        c, u = CMDBObjectValue.objects.bulk_set_rows(
+            ((cmdb_object, name, value) for cmdb_object in batch for name, value in cmdb_object.attributes.items()),
+            batch_size=batch_size
+        )
+        created += c
+        updated += u
+    return created, updated
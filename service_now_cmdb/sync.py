@@ -0,0 +1,119 @@
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction, connection
+from django.utils import timezone
+from requests import RequestException
+
+from service_now_cmdb.models import CMDBObject, CMDBOutbox
+from service_now_cmdb.utility.bulk import chunks
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTBOX_BATCH_SIZE = 500
+DEFAULT_OUTBOX_CONCURRENCY = 4
+DEFAULT_OUTBOX_LEASE = 300
+DEFAULT_OUTBOX_BACKOFF = 30
+DEFAULT_OUTBOX_MAX_BACKOFF = 3600
+
+
+class OutboxWorker:
+    """
+    Drains CMDBOutbox in batches and pushes the objects with SNCMDBHandler.push_many, or deletes their records with
+    SNCMDBHandler.delete_many.
+
+    Rows are claimed by moving their available time past a lease, so several workers can run at once and a crashed
+    worker's rows become available again once the lease runs out. Failed pushes are retried with exponential backoff.
+    """
+
+    def __init__(self, handler, batch_size=None, concurrency=None):
+        self.handler = handler
+        self.batch_size = batch_size or getattr(settings, 'SERVICE_NOW_OUTBOX_BATCH_SIZE', DEFAULT_OUTBOX_BATCH_SIZE)
+        self.concurrency = concurrency or getattr(settings, 'SERVICE_NOW_OUTBOX_CONCURRENCY',
+                                                  DEFAULT_OUTBOX_CONCURRENCY)
+        self.lease = getattr(settings, 'SERVICE_NOW_OUTBOX_LEASE', DEFAULT_OUTBOX_LEASE)
+        self.backoff = getattr(settings, 'SERVICE_NOW_OUTBOX_BACKOFF', DEFAULT_OUTBOX_BACKOFF)
+        self.max_backoff = getattr(settings, 'SERVICE_NOW_OUTBOX_MAX_BACKOFF', DEFAULT_OUTBOX_MAX_BACKOFF)
+
+    def claim(self):
+        """
+        :return: list of claimed CMDBOutbox rows
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            rows = list(
+                CMDBOutbox.objects.select_for_update(skip_locked=True)
+                .filter(available__lte=now)
+                .order_by('available')[:self.batch_size]
+            )
+            if rows:
+                CMDBOutbox.objects.filter(pk__in=[row.pk for row in rows]).update(
+                    available=now + timezone.timedelta(seconds=self.lease)
+                )
+        return rows
+
+    def retry_delay(self, attempts):
+        """
+        Exponential backoff with full jitter.
+
+        :param attempts: number of failed attempts so far
+        :return: seconds
+        """
+        return random.uniform(0, min(self.backoff * (2 ** attempts), self.max_backoff))
+
+    def _push(self, rows):
+        try:
+            errors = dict()
+            pushes = [row.object_id for row in rows if not row.remove]
+            if pushes:
+                result = self.handler.push_many(CMDBObject.objects.filter(pk__in=pushes))
+                errors.update((cmdb_object.pk, 'ServiceNow rejected the object.') for cmdb_object in result['failed'])
+            removals = [row.object_id for row in rows if row.remove]
+            if removals:
+                result = self.handler.delete_many(CMDBObject.objects.filter(pk__in=removals))
+                errors.update((cmdb_object.pk, 'ServiceNow did not delete the record.')
+                              for cmdb_object in result['failed'])
+        except (ValueError, RequestException) as e:
+            logger.warning("Outbox push failed: %s", e)
+            errors = {row.object_id: str(e) for row in rows}
+        finally:
+            connection.close()
+        return errors
+
+    def _finish(self, rows, errors):
+        now = timezone.now()
+        done = [row for row in rows if row.object_id not in errors]
+        with transaction.atomic():
+            for row in rows:
+                current = CMDBOutbox.objects.filter(pk=row.pk, enqueued=row.enqueued)
+                if row.object_id not in errors:
+                    updated = current.delete()[0]
+                else:
+                    updated = current.update(
+                        attempts=row.attempts + 1,
+                        available=now + timezone.timedelta(seconds=self.retry_delay(row.attempts)),
+                        last_error=errors[row.object_id],
+                    )
+                if not updated:
+                    # Re-enqueued while the push was in flight: release the lease so it is pushed again right away.
+                    CMDBOutbox.objects.filter(pk=row.pk).update(available=now)
+        return len(done), len(rows) - len(done)
+
+    def run_once(self):
+        """
+        Claim and push one batch.
+
+        :return: tuple of the number of pushed and failed objects
+        """
+        rows = self.claim()
+        if not rows:
+            return 0, 0
+
+        size = max(1, -(-len(rows) // self.concurrency))
+        errors = dict()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for partial in executor.map(self._push, chunks(rows, size)):
+                errors.update(partial)
+        return self._finish(rows, errors)
@@ -0,0 +1,84 @@
+import json
+
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.models import User
+from django.test import RequestFactory
+
+from service_now_cmdb.api.views import CMDBObjectUpsertView
+from service_now_cmdb.models import CMDBObjectType, CMDBObjectField, CMDBObject, CMDBObjectValue, CMDBOutbox
+from service_now_cmdb.tests.base_test import BaseTest
+from service_now_cmdb.tests.models.factories import CMDBCompleteType
+
+
+class TestUpsertAPI(BaseTest):
+    def setUp(self):
+        self.cmdb_type = CMDBCompleteType()
+        self.factory = RequestFactory()
+        self.user = User(username='collector', is_superuser=True)
+
+    def tearDown(self):
+        User.objects.all().delete()
+        CMDBOutbox.objects.all().delete()
+        CMDBObjectType.objects.all().delete()
+        CMDBObjectField.objects.all().delete()
+        CMDBObject.objects.all().delete()
+        CMDBObjectValue.objects.all().delete()
+
+    def post(self, body, content_type='application/json', path='/api/objects/bulk/', user=None, session=None):
+        request = self.factory.post(path, body, content_type=content_type)
+        request.user = user or self.user
+        if session is not None:
+            request.session = session
+        response = CMDBObjectUpsertView.as_view()(request)
+        return response.status_code, json.loads(response.content.decode('utf-8'))
+
+    def test_requires_permission(self):
+        status, _ = self.post('[]', user=User.objects.create(username='reader'))
+        self.assertEqual(status, 403)
+
+    def test_session_requires_csrf_token(self):
+        status, _ = self.post('[]', session={SESSION_KEY: '1'})
+        self.assertEqual(status, 403)
+
+    def test_unsupported_content_type(self):
+        status, _ = self.post('[]', content_type='text/plain')
+        self.assertEqual(status, 415)
+
+    def test_values_are_checked(self):
+        records = [{'type': self.cmdb_type.pk, 'object_id': 700 + i, 'fields': {'subnet': value}}
+                   for i, value in enumerate([10, {'a': 1}, ['a'], 'x' * 256, None])]
+        status, result = self.post(json.dumps(records))
+        self.assertEqual(status, 200)
+        self.assertEqual([error['index'] for error in result['errors']], [1, 2, 3])
+        self.assertEqual(CMDBObject.objects.get(type=self.cmdb_type, object_id=700).key_value, {'subnet': '10'})
+
+    def test_json_array(self):
+        records = [{'type': self.cmdb_type.pk, 'object_id': i, 'fields': {'subnet': '10.0.0.{}'.format(i)}}
+                   for i in range(500, 503)]
+        status, result = self.post(json.dumps(records))
+        self.assertEqual(status, 200)
+        self.assertEqual((result['objects_created'], result['created'], result['updated']), (3, 3, 0))
+        self.assertEqual(CMDBObject.objects.get(type=self.cmdb_type, object_id=501).key_value,
+                         {'subnet': '10.0.0.501'})
+
+        records[0]['fields']['subnet'] = '10.1.0.0'
+        _, result = self.post(json.dumps(records))
+        self.assertEqual((result['objects_created'], result['created'], result['updated']), (0, 0, 1))
+
+    def test_ndjson_reports_invalid_records(self):
+        body = "\n".join([
+            json.dumps({'type': self.cmdb_type.name, 'object_id': 600, 'fields': {'subnet': '10.0.0.0'}}),
+            "not json",
+            json.dumps({'type': self.cmdb_type.pk, 'object_id': 601, 'fields': {'missing': '1'}}),
+            json.dumps({'type': 'unknown', 'object_id': 602}),
+        ])
+        status, result = self.post(body, content_type='application/x-ndjson', path='/api/objects/bulk/?queue=1')
+        self.assertEqual(status, 200)
+        self.assertEqual(result['received'], 4)
+        self.assertEqual([error['index'] for error in result['errors']], [1, 2, 3])
+        self.assertEqual(result['queued'], 1)
+        self.assertTrue(CMDBOutbox.objects.filter(object__object_id=600).exists())
+
+    def test_invalid_body(self):
+        status, result = self.post('{"type": 1}')
+        self.assertEqual(status, 400)
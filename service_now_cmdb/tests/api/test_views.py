@@ -0,0 +1,97 @@
+import json
+from urllib.parse import urlparse, parse_qs
+
+from django.contrib.auth.models import User, AnonymousUser
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from service_now_cmdb.api.views import CMDBObjectListView, CMDBObjectDetailView
+from service_now_cmdb.models import CMDBObjectType, CMDBObjectField, CMDBObject, CMDBObjectValue
+from service_now_cmdb.tests.base_test import BaseTest
+from service_now_cmdb.tests.models.factories import CMDBCompleteType
+
+
+class TestReadAPI(BaseTest):
+    def setUp(self):
+        self.cmdb_type = CMDBCompleteType()
+        self.field = CMDBObjectField.objects.get(type=self.cmdb_type)
+        for i in range(100, 105):
+            cmdb_object = CMDBObject.objects.create(type=self.cmdb_type, object_id=i)
+            CMDBObjectValue.objects.create(object=cmdb_object, field=self.field, value=str(i))
+        self.factory = RequestFactory()
+        self.user = User(username='api')
+
+    def tearDown(self):
+        CMDBObjectType.objects.all().delete()
+        CMDBObjectField.objects.all().delete()
+        CMDBObject.objects.all().delete()
+        CMDBObjectValue.objects.all().delete()
+
+    def get(self, view, path, data=None, user=None, **kwargs):
+        request = self.factory.get(path, data or {}, **kwargs.pop('headers', {}))
+        request.user = user or self.user
+        return view.as_view()(request, **kwargs)
+
+    @staticmethod
+    def content(response):
+        return json.loads(b''.join(response.streaming_content).decode('utf-8'))
+
+    def test_requires_authentication(self):
+        response = self.get(CMDBObjectListView, '/api/objects/', user=AnonymousUser())
+        self.assertEqual(response.status_code, 403)
+
+    def test_cursor_pagination(self):
+        seen = []
+        data = {'type': self.cmdb_type.pk, 'limit': 2}
+        while True:
+            page = self.content(self.get(CMDBObjectListView, '/api/objects/', data))
+            seen.extend(result['id'] for result in page['results'])
+            if page['next'] is None:
+                break
+            data['cursor'] = parse_qs(urlparse(page['next']).query)['cursor'][0]
+        self.assertEqual(seen, list(CMDBObject.objects.filter(type=self.cmdb_type).order_by('pk').values_list(
+            'pk', flat=True)))
+
+    def test_constant_queries_per_page(self):
+        # Load the schema registry first.
+        self.content(self.get(CMDBObjectListView, '/api/objects/', {'limit': 1}))
+        counts = []
+        for limit in (2, 5):
+            with CaptureQueriesContext(connection) as queries:
+                self.content(self.get(CMDBObjectListView, '/api/objects/', {'limit': limit}))
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_field_selection(self):
+        page = self.content(self.get(CMDBObjectListView, '/api/objects/', {'fields': 'missing'}))
+        self.assertEqual({json.dumps(result['values']) for result in page['results']}, {'{}'})
+
+    def test_not_modified(self):
+        cmdb_object = CMDBObject.objects.filter(object_id=100).get()
+        response = self.get(CMDBObjectDetailView, '/api/objects/{}/'.format(cmdb_object.pk), pk=cmdb_object.pk)
+        self.assertEqual(json.loads(response.content.decode('utf-8'))['values'], {'subnet': '100'})
+
+        headers = {'HTTP_IF_NONE_MATCH': response['ETag']}
+        response = self.get(CMDBObjectDetailView, '/api/objects/{}/'.format(cmdb_object.pk), pk=cmdb_object.pk,
+                            headers=headers)
+        self.assertEqual(response.status_code, 304)
+
+        cmdb_object.set_field('subnet', '10.0.0.0')
+        response = self.get(CMDBObjectDetailView, '/api/objects/{}/'.format(cmdb_object.pk), pk=cmdb_object.pk,
+                            headers=headers)
+        self.assertEqual(response.status_code, 200)
+
+    def test_value_writes_change_the_etag(self):
+        cmdb_object = CMDBObject.objects.filter(object_id=100).get()
+        path = '/api/objects/{}/'.format(cmdb_object.pk)
+        etags = [self.get(CMDBObjectDetailView, path, pk=cmdb_object.pk)['ETag']]
+
+        value = CMDBObjectValue.objects.get(object=cmdb_object)
+        value.value = '10.0.0.0'
+        value.save()
+        etags.append(self.get(CMDBObjectDetailView, path, pk=cmdb_object.pk)['ETag'])
+
+        value.delete()
+        etags.append(self.get(CMDBObjectDetailView, path, pk=cmdb_object.pk)['ETag'])
+        self.assertEqual(len(set(etags)), 3)
@@ -0,0 +1,31 @@
+import itertools
+
+from service_now_cmdb.models import CMDBObject, CMDBObjectValue
+from service_now_cmdb.schema import registry
+
+counter = itertools.count()
+
+
+def snapshot(cmdb_type):
+    """
+    A new value for every field of every object of the type.
+    """
+    run = next(counter)
+    names = registry.get_for_type(cmdb_type).field_names
+    return [(cmdb_object, name, "{}-{}".format(name, run))
+            for cmdb_object in CMDBObject.objects.filter(type=cmdb_type) for name in names]
+
+
+def test_bulk_set(dataset, measure):
+    items = []
+
+    def setup():
+        items[:] = snapshot(dataset[0])
+
+    measure(lambda: CMDBObjectValue.objects.bulk_set(items), setup=setup)
+
+
+def test_bulk_set_unchanged(dataset, measure):
+    items = snapshot(dataset[0])
+    CMDBObjectValue.objects.bulk_set(items)
+    measure(CMDBObjectValue.objects.bulk_set, items)
@@ -0,0 +1,17 @@
+from service_now_cmdb.models import CMDBObject
+from service_now_cmdb.pull import TablePuller
+from service_now_cmdb.schema import registry
+from service_now_cmdb.utility.bulk import bulk_update
+
+
+def test_table_pull(dataset, servicenow, stub_client, measure):
+    cmdb_type = dataset[0]
+    names = registry.get_for_type(cmdb_type).field_names
+    cmdb_objects = list(CMDBObject.objects.filter(type=cmdb_type))
+    for cmdb_object in cmdb_objects:
+        record = servicenow.insert(cmdb_type.endpoint, **{name: "pulled-{}".format(name) for name in names})
+        cmdb_object.service_now_id = record['sys_id']
+    bulk_update(cmdb_objects, ['service_now_id'])
+
+    puller = TablePuller(cmdb_type, "token", client=stub_client, page_size=100)
+    measure(puller.run, True)
@@ -0,0 +1,25 @@
+from unittest.mock import patch
+
+from service_now_cmdb.export import StreamingExporter
+from service_now_cmdb.helper import SNCMDBHandler
+from service_now_cmdb.models import CMDBObject
+
+
+def reset(cmdb_type):
+    CMDBObject.objects.filter(type=cmdb_type).update(service_now_id='', pushed_hash='', pushed_values='')
+
+
+def test_push_many(dataset, stub_client, measure):
+    with patch('service_now_cmdb.helper.get_client', return_value=stub_client), \
+            patch('service_now_cmdb.helper.settings'):
+        handler = SNCMDBHandler(user=None)
+    handler.token_provider = "token"
+    cmdb_type = dataset[0]
+    measure(lambda: handler.push_many(CMDBObject.objects.filter(type=cmdb_type), chunk_size=100),
+            setup=lambda: reset(cmdb_type))
+
+
+def test_streaming_export(dataset, stub_client, measure):
+    cmdb_type = dataset[0]
+    exporter = StreamingExporter(cmdb_type, "token", client=stub_client, batch_size=100)
+    measure(exporter.run, setup=lambda: reset(cmdb_type))
@@ -0,0 +1,17 @@
+from service_now_cmdb.models import CMDBObject
+
+
+def serialize_one_by_one(cmdb_type):
+    return [cmdb_object.key_value for cmdb_object in CMDBObject.objects.filter(type=cmdb_type)]
+
+
+def serialize_prefetched(cmdb_type):
+    return [cmdb_object.key_value for cmdb_object in CMDBObject.objects.with_key_values().filter(type=cmdb_type)]
+
+
+def test_key_value(dataset, measure):
+    measure(serialize_one_by_one, dataset[0])
+
+
+def test_key_value_prefetched(dataset, measure):
+    measure(serialize_prefetched, dataset[0])
@@ -0,0 +1,90 @@
+"""
+Benchmarks for the serialization, value ingestion, push and pull paths. They need pytest-django and pytest-benchmark:
+
+    pytest service_now_cmdb/tests/benchmarks/bench_*.py --benchmark-autosave
+    pytest-benchmark compare
+
+The dataset size is set with BENCH_TYPES, BENCH_FIELDS and BENCH_OBJECTS. The push and pull benchmarks talk to a
+FakeServiceNow whose response time in seconds is set with BENCH_LATENCY. Query counts and peak memory are stored in the
+extra_info of every saved result so they can be compared across commits with the timings.
+"""
+import os
+import tracemalloc
+
+import pytest
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from service_now_cmdb.client import ServiceNowClient
+from service_now_cmdb.models import CMDBObject, CMDBObjectValue
+from service_now_cmdb.schema import registry
+from service_now_cmdb.simulator import FakeServiceNow
+from service_now_cmdb.tests.models.factories import CMDBObjectTypeFactory, CMDBObjectFieldFactory
+
+TYPES = int(os.environ.get('BENCH_TYPES', 2))
+FIELDS = int(os.environ.get('BENCH_FIELDS', 20))
+OBJECTS = int(os.environ.get('BENCH_OBJECTS', 500))
+LATENCY = float(os.environ.get('BENCH_LATENCY', 0))
+
+
+@pytest.fixture
+def dataset(db):
+    """
+    TYPES types with FIELDS fields and OBJECTS objects each, every object holding a value for every field.
+
+    :return: list of CMDBObjectType
+    """
+    content_type = ContentType.objects.get_for_model(User)
+    types = []
+    for t in range(TYPES):
+        cmdb_type = CMDBObjectTypeFactory(name="type{}".format(t), endpoint="cmdb_ci_bench{}".format(t),
+                                          content_type=content_type)
+        fields = [CMDBObjectFieldFactory(type=cmdb_type, name="field{}".format(f), order=f) for f in range(FIELDS)]
+        CMDBObject.objects.bulk_create([CMDBObject(type=cmdb_type, object_id=o) for o in range(OBJECTS)])
+        objects = list(CMDBObject.objects.filter(type=cmdb_type).order_by('pk'))
+        CMDBObjectValue.objects.bulk_create(
+            [CMDBObjectValue(object=o, field=f, value="{}-{}".format(o.pk, f.name)) for o in objects for f in fields],
+            batch_size=5000
+        )
+        types.append(cmdb_type)
+    registry.invalidate()
+    return types
+
+
+@pytest.fixture
+def servicenow():
+    with FakeServiceNow(latency=LATENCY, require_auth=False) as instance:
+        yield instance
+
+
+@pytest.fixture
+def stub_client(servicenow):
+    client = ServiceNowClient(base_url=servicenow.base_url)
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def measure(benchmark):
+    """
+    Benchmark a function and record its query count and peak traced memory of one extra run in extra_info.
+    """
+    def run(func, *args, setup=None, rounds=5):
+        if setup:
+            setup()
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as queries:
+            func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        benchmark.extra_info['queries'] = len(queries)
+        benchmark.extra_info['peak_memory_kib'] = peak // 1024
+
+        def bench_setup():
+            if setup:
+                setup()
+            return args, {}
+        return benchmark.pedantic(func, setup=bench_setup, rounds=rounds)
+    return run
@@ -2,6 +2,7 @@ from datetime import datetime
 
 import factory
 from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
 from django.utils.timezone import now
 from factory import SubFactory
 from factory.fuzzy import FuzzyDateTime
@@ -58,6 +59,7 @@ class CMDBObjectTypeFactory(factory.django.DjangoModelFactory):
     # endpoint = factory.Iterator(['https://companyname.service-now.com/api/now/table/cmdb_ci_ip_network', 'https://companyname.service-now.com/api/now/table/CIDR'])
     name = "IPAddress"
     endpoint = "https://companyname.service-now.com/api/now/table/cmdb_ci_ip_network"
+    content_type = factory.LazyFunction(lambda: ContentType.objects.get_for_model(get_user_model()))
 
 
 class CMDBObjectFieldFactory(factory.django.DjangoModelFactory):
@@ -66,6 +68,7 @@ class CMDBObjectFieldFactory(factory.django.DjangoModelFactory):
 
     type = None
     name = "subnet"
+    order = 0
 
 
 class CMDBObjectFactory(factory.django.DjangoModelFactory):
@@ -73,6 +76,7 @@ class CMDBObjectFactory(factory.django.DjangoModelFactory):
         model = CMDBObject
 
     type = None
+    object_id = factory.Sequence(lambda n: n + 1)
 
 
 class CMDBCompleteType(CMDBObjectTypeFactory):
@@ -1,4 +1,9 @@
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction, connection
+from django.test import override_settings
+
 from service_now_cmdb.models.cmdb import CMDBObjectType, CMDBObjectField, CMDBObject, CMDBObjectValue
+from service_now_cmdb.storage import rows_to_attributes, attributes_to_rows
 from service_now_cmdb.tests.models.base_model_test import BaseModelTest
 from service_now_cmdb.tests.models.factories import CMDBCompleteType
 
@@ -27,6 +32,21 @@ class TestCMDBObject(BaseModelTest):
 
         self.assertEqual(self.cmdb_object.key_value, expected_dict)
 
+    def test_key_value_prefetched(self):
+        cmdb_object = CMDBObject.objects.with_key_values().get(pk=self.cmdb_object.pk)
+        self.assertEqual(cmdb_object.key_value, {'subnet': '55.55.55.122'})
+        self.assertEqual(cmdb_object.fields, ['subnet'])
+        self.assertEqual(cmdb_object.get_field('subnet'), self.cmdb_value)
+        self.assertIsNone(cmdb_object.get_field('missing'))
+
+    def test_duplicate_field(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CMDBObjectField.objects.create(name='subnet', type=self.cmdb_type, order=1)
+
+    def test_duplicate_value(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CMDBObjectValue.objects.create(object=self.cmdb_object, field=self.cmdb_object_field, value='1')
+
     def test_object_post(self):
         pass
 
@@ -37,10 +57,29 @@ class TestCMDBObject(BaseModelTest):
         pass
 
     def test_object_get_field(self):
-        pass
+        self.assertEqual(self.cmdb_object.get_field('subnet'), self.cmdb_value)
+        self.assertIsNone(self.cmdb_object.get_field('missing'))
 
     def test_object_set_field(self):
-        pass
+        self.cmdb_object.set_field('subnet', '10.0.0.0')
+        self.assertEqual(self.cmdb_object.key_value, {'subnet': '10.0.0.0'})
+        self.assertEqual(CMDBObjectValue.objects.filter(object=self.cmdb_object).count(), 1)
+
+    def test_object_set_fields(self):
+        CMDBObjectField.objects.create(name='mask', type=self.cmdb_type, order=2)
+        created, updated = self.cmdb_object.set_fields({'subnet': '55.55.55.122', 'mask': '24'})
+        self.assertEqual((created, updated), (1, 0))
+        created, updated = self.cmdb_object.set_fields({'subnet': '10.0.0.0', 'mask': '24'})
+        self.assertEqual((created, updated), (0, 1))
+        self.assertEqual(self.cmdb_object.key_value, {'subnet': '10.0.0.0', 'mask': '24'})
+
+    def test_object_set_none(self):
+        self.cmdb_object.set_fields({'subnet': None})
+        self.assertEqual(self.cmdb_object.key_value, {'subnet': ''})
+
+    def test_object_set_unknown_field(self):
+        with self.assertRaises(ValueError):
+            self.cmdb_object.set_fields({'missing': '1'})
 
     def test_object_value_object_field(self):
         pass
@@ -48,3 +87,63 @@ class TestCMDBObject(BaseModelTest):
     def test_object_relation(self):
         pass
 
+
+
+class TestCMDBObjectJSONStorage(BaseModelTest):
+    def setUp(self):
+        self.settings = override_settings(SERVICE_NOW_VALUE_STORAGE='json')
+        self.cmdb_type = CMDBCompleteType()
+        self.cmdb_object = CMDBObject.objects.get(type=self.cmdb_type)
+        rows_to_attributes(delete_rows=True)
+        self.settings.enable()
+        self.cmdb_object.refresh_from_db()
+
+    def tearDown(self):
+        self.settings.disable()
+        CMDBObjectType.objects.all().delete()
+        CMDBObjectField.objects.all().delete()
+        CMDBObject.objects.all().delete()
+        CMDBObjectValue.objects.all().delete()
+
+    def test_rows_converted(self):
+        self.assertEqual(self.cmdb_object.attributes, {'subnet': '55.55.55.122'})
+        self.assertFalse(CMDBObjectValue.objects.exists())
+
+    def test_key_value(self):
+        cmdb_object = CMDBObject.objects.with_key_values().get(pk=self.cmdb_object.pk)
+        self.assertEqual(cmdb_object.key_value, {'subnet': '55.55.55.122'})
+        self.assertEqual(cmdb_object.fields, ['subnet'])
+        self.assertEqual(cmdb_object.get_field('subnet').value, '55.55.55.122')
+        self.assertIsNone(cmdb_object.get_field('missing'))
+
+    def test_set_fields(self):
+        CMDBObjectField.objects.create(name='mask', type=self.cmdb_type, order=2)
+        self.assertEqual(self.cmdb_object.set_fields({'subnet': '10.0.0.0', 'mask': 24}), (1, 1))
+        self.assertEqual(CMDBObject.objects.get(pk=self.cmdb_object.pk).key_value, {'subnet': '10.0.0.0', 'mask': '24'})
+        with self.assertRaises(ValueError):
+            self.cmdb_object.set_fields({'missing': '1'})
+
+    def test_bulk_set(self):
+        self.assertEqual(CMDBObjectValue.objects.bulk_set([(self.cmdb_object, 'subnet', '10.0.0.0')]), (0, 1))
+        self.assertEqual(CMDBObject.objects.get(pk=self.cmdb_object.pk).attributes, {'subnet': '10.0.0.0'})
+        self.assertFalse(CMDBObjectValue.objects.exists())
+
+    def test_has_values_lookup(self):
+        self.assertTrue(CMDBObject.objects.filter(attributes__has_values={'subnet': '55.55.55.122'}).exists())
+        self.assertFalse(CMDBObject.objects.filter(attributes__has_values={'subnet': '10.0.0.0'}).exists())
+
+    def test_has_values_lookup_unquotes_on_mysql(self):
+        query = CMDBObject.objects.filter(attributes__has_values={'subnet': '55.55.55.122'}).query
+        lookup = query.where.children[0]
+        sql, params = lookup.as_mysql(query.get_compiler(using='default'), connection)
+        self.assertTrue(sql.startswith('JSON_UNQUOTE(JSON_EXTRACT('))
+        self.assertEqual(params, ['$."subnet"', '55.55.55.122'])
+
+    def test_clean(self):
+        self.cmdb_object.attributes['missing'] = '1'
+        with self.assertRaises(ValidationError):
+            self.cmdb_object.clean()
+
+    def test_back_to_rows(self):
+        self.assertEqual(attributes_to_rows(), (1, 0))
+        self.assertEqual(CMDBObjectValue.objects.get(object=self.cmdb_object).value, '55.55.55.122')
@@ -20,19 +20,19 @@ class TestServiceNowToken(BaseModelTest):
         self.assertEqual(self.token.__str__(), self.token.access_token[-6:])
 
     def test_is_expired(self):
-        self.assertEqual(self.token.is_expired, False)
+        self.assertEqual(self.token.is_expired, True)
 
     def test_is_not_expired(self):
         token = NotExpiredServiceNowTokenFactory.build()
-        self.assertEqual(token.is_expired, True)
+        self.assertEqual(token.is_expired, False)
 
     def test_empty_token(self):
         token = ServiceNowTokenFactory.build(expires="")
-        self.assertEqual(token.is_expired, False)
+        self.assertEqual(token.is_expired, True)
 
     @override_settings(SERVICE_NOW_DOMAIN="Test", SERVICE_NOW_CLIENT_ID="Test", SERVICE_NOW_CLIENT_SECRET="test")
     @patch('service_now_cmdb.models.token.ServiceNowToken._update_token')
-    @patch('requests.post')
+    @patch('service_now_cmdb.client.ServiceNowClient.post')
     def test_successful_get_new_token(self, post, update_token_method):
         type(post.return_value).status_code = PropertyMock(return_value=200)
         type(post.return_value).text = PropertyMock(return_value=self.successful_response)
@@ -40,14 +40,14 @@ class TestServiceNowToken(BaseModelTest):
         self.assertEqual(self.token.get_new_token(), True)
 
     @override_settings(SERVICE_NOW_DOMAIN="Test", SERVICE_NOW_CLIENT_ID="Test", SERVICE_NOW_CLIENT_SECRET="test")
-    @patch('requests.post')
+    @patch('service_now_cmdb.client.ServiceNowClient.post')
     def test_status_code_error_get_new_token(self, post):
         type(post.return_value).status_code = PropertyMock(return_value=401)
         with self.assertRaises(ValueError):
             self.token.get_new_token()
 
     @override_settings(SERVICE_NOW_DOMAIN="Test", SERVICE_NOW_CLIENT_ID="Test", SERVICE_NOW_CLIENT_SECRET="test")
-    @patch('requests.post')
+    @patch('service_now_cmdb.client.ServiceNowClient.post')
     def test_request_error_get_new_token(self, post):
         post.side_effect = HTTPError
         with self.assertRaises(ValueError):
@@ -79,7 +79,7 @@ class TestServiceNowToken(BaseModelTest):
         pass
 
     @override_settings(SERVICE_NOW_DOMAIN="Test", SERVICE_NOW_CLIENT_ID="Test", SERVICE_NOW_CLIENT_SECRET="test")
-    @patch('requests.post')
+    @patch('service_now_cmdb.client.ServiceNowClient.post')
     def test_successful_get_credentials(self, post):
         type(post.return_value).status_code = PropertyMock(return_value=200)
         type(post.return_value).text = PropertyMock(return_value=self.successful_response)
@@ -87,7 +87,7 @@ class TestServiceNowToken(BaseModelTest):
         self.assertEqual(text, json.loads(self.successful_response))
 
     @override_settings(SERVICE_NOW_DOMAIN="Test", SERVICE_NOW_CLIENT_ID="Test", SERVICE_NOW_CLIENT_SECRET="test")
-    @patch('requests.post')
+    @patch('service_now_cmdb.client.ServiceNowClient.post')
     def test_error_get_credentials(self, post):
         type(post.return_value).status_code = PropertyMock(return_value=401)
         type(post.return_value).text = PropertyMock(return_value=self.error_response)
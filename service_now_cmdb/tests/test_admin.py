@@ -0,0 +1,48 @@
+from django.contrib.admin.sites import AdminSite
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from service_now_cmdb.admin import CMDBObjectValueInline, CMDBObjectValueAdmin
+from service_now_cmdb.models import CMDBObjectType, CMDBObjectField, CMDBObject, CMDBObjectValue
+from service_now_cmdb.tests.base_test import BaseTest
+from service_now_cmdb.tests.models.factories import CMDBCompleteType
+from service_now_cmdb.utility.pagination import EstimatedCountPaginator
+
+
+class TestAdmin(BaseTest):
+    def setUp(self):
+        self.cmdb_type = CMDBCompleteType()
+        self.cmdb_object = CMDBObject.objects.get(type=self.cmdb_type)
+        CMDBObjectField.objects.create(name='mask', type=self.cmdb_type, order=2)
+        self.request = RequestFactory().get('/')
+        self.request.user = User(username='admin', is_superuser=True)
+
+    def tearDown(self):
+        CMDBObjectType.objects.all().delete()
+        CMDBObjectField.objects.all().delete()
+        CMDBObject.objects.all().delete()
+        CMDBObjectValue.objects.all().delete()
+
+    def test_inline_field_choices_are_limited_and_shared(self):
+        inline = CMDBObjectValueInline(CMDBObject, AdminSite())
+        formset = inline.get_formset(self.request, self.cmdb_object)(instance=self.cmdb_object)
+        # Loading the values is the formset's one query; the field choices must not add any.
+        forms = formset.forms
+        with CaptureQueriesContext(connection) as queries:
+            choices = [list(form.fields['field'].choices) for form in forms]
+        self.assertEqual(len(queries), 0)
+        self.assertEqual([label for _, label in choices[0][1:]], [str(field) for field in
+                                                                  CMDBObjectField.objects.filter(type=self.cmdb_type)])
+
+    def test_value_changelist_queryset(self):
+        model_admin = CMDBObjectValueAdmin(CMDBObjectValue, AdminSite())
+        values = model_admin.get_queryset(self.request).select_related(*model_admin.list_select_related)
+        with CaptureQueriesContext(connection) as queries:
+            [str(value) for value in values]
+        self.assertEqual(len(queries), 1)
+
+    def test_paginator_counts_exactly_on_small_tables(self):
+        paginator = EstimatedCountPaginator(CMDBObjectValue.objects.order_by('pk'), 10)
+        self.assertEqual(paginator.count, CMDBObjectValue.objects.count())
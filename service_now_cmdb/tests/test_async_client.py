@@ -0,0 +1,107 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import skipIf
+from unittest.mock import patch, PropertyMock, MagicMock
+
+from requests import ConnectionError as RequestsConnectionError
+
+from service_now_cmdb import async_client
+from service_now_cmdb.models import CMDBObject
+from service_now_cmdb.tests.base_test import BaseTest
+from service_now_cmdb.tests.models.factories import CMDBObjectTypeFactory
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def _respond(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        record = json.loads(self.rfile.read(length).decode('utf-8'))
+        record['sys_id'] = 'abc123'
+        self._respond(201, {'result': record})
+
+    def do_GET(self):
+        if self.headers.get('Authorization') != 'Bearer token':
+            self._respond(401, {'error': 'unauthorized'})
+            return
+        self._respond(200, {'result': {'sys_id': self.path.rsplit('/', 1)[-1]}})
+
+    def log_message(self, *args):
+        pass
+
+
+@skipIf(async_client.httpx is None, "httpx is not installed")
+class TestAsyncServiceNowClient(BaseTest):
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), StubHandler)
+        self.base_url = "http://127.0.0.1:{}".format(self.server.server_port)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.cmdb_object = CMDBObject(type=CMDBObjectTypeFactory.build(endpoint='cmdb_ci'), object_id=1)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def client(self):
+        return async_client.AsyncServiceNowClient(domain="test", concurrency=2, base_url=self.base_url)
+
+    @patch('service_now_cmdb.models.cmdb.CMDBObject.key_value', new_callable=PropertyMock)
+    def test_apost(self, key_value):
+        key_value.return_value = {'subnet': '10.0.0.0'}
+
+        async def run():
+            async with self.client() as client:
+                return await self.cmdb_object.apost("token", client)
+
+        self.assertTrue(asyncio.run(run()))
+        self.assertEqual(self.cmdb_object.service_now_id, 'abc123')
+
+    def test_aget(self):
+        self.cmdb_object.service_now_id = 'abc123'
+
+        async def run():
+            async with self.client() as client:
+                return await asyncio.gather(*[self.cmdb_object.aget("token", client) for _ in range(5)])
+
+        texts = asyncio.run(run())
+        self.assertEqual([json.loads(t)['result']['sys_id'] for t in texts], ['abc123'] * 5)
+
+    def test_aget_bad_token(self):
+        self.cmdb_object.service_now_id = 'abc123'
+
+        async def run():
+            async with self.client() as client:
+                return await self.cmdb_object.aget("expired", client)
+
+        with self.assertRaises(ValueError):
+            asyncio.run(run())
+
+    def test_aget_refreshes_token_provider(self):
+        self.cmdb_object.service_now_id = 'abc123'
+        provider = MagicMock()
+        provider.peek.return_value = None
+        provider.get.return_value = "expired"
+        provider.refresh.return_value = "token"
+
+        async def run():
+            async with self.client() as client:
+                return await self.cmdb_object.aget(provider, client)
+
+        self.assertEqual(json.loads(asyncio.run(run()))['result']['sys_id'], 'abc123')
+        provider.refresh.assert_called_once_with("expired")
+
+    def test_connection_error(self):
+        async def run():
+            async with async_client.AsyncServiceNowClient(domain="test", base_url="http://127.0.0.1:1") as client:
+                return await client.get(client.url('api/now/table/cmdb_ci'))
+
+        with self.assertRaises(RequestsConnectionError):
+            asyncio.run(run())
@@ -0,0 +1,114 @@
+import base64
+import json
+from email.message import Message
+from unittest.mock import patch, MagicMock, PropertyMock
+from urllib.request import Request
+
+from django.test import override_settings
+
+from service_now_cmdb.client import ServiceNowClient, get_client, reset_client
+from service_now_cmdb.tests.base_test import BaseTest
+
+
+class TestServiceNowClient(BaseTest):
+    def setUp(self):
+        self.settings = override_settings(SERVICE_NOW_DOMAIN="test", SERVICE_NOW_POOL_SIZE=4,
+                                          SERVICE_NOW_CONNECT_TIMEOUT=2, SERVICE_NOW_READ_TIMEOUT=9)
+        self.settings.enable()
+
+    def tearDown(self):
+        reset_client()
+        self.settings.disable()
+
+    def test_settings(self):
+        client = ServiceNowClient()
+        self.assertEqual(client.base_url, "https://test.service-now.com")
+        self.assertEqual(client.timeout, (2, 9))
+        self.assertEqual(client.adapter._pool_maxsize, 4)
+
+    def test_table_url(self):
+        client = ServiceNowClient()
+        self.assertEqual(client.table_url("cmdb_ci"), "https://test.service-now.com/api/now/table/cmdb_ci")
+        self.assertEqual(client.table_url("cmdb_ci", "abc"), "https://test.service-now.com/api/now/table/cmdb_ci/abc")
+
+    def test_headers(self):
+        self.assertEqual(ServiceNowClient.headers("token")['Authorization'], "Bearer token")
+        self.assertNotIn('Authorization', ServiceNowClient.headers())
+
+    def test_get_client_is_shared(self):
+        self.assertIs(get_client(), get_client())
+        first = get_client()
+        reset_client()
+        self.assertIsNot(first, get_client())
+
+    def test_get_client_follows_settings(self):
+        self.assertEqual(get_client().base_url, "https://test.service-now.com")
+        with override_settings(SERVICE_NOW_DOMAIN="other"):
+            self.assertEqual(get_client().base_url, "https://other.service-now.com")
+
+    def test_session_does_not_keep_cookies(self):
+        client = ServiceNowClient()
+        headers = Message()
+        headers['Set-Cookie'] = 'JSESSIONID=abc; Path=/'
+        response = MagicMock()
+        response.info.return_value = headers
+        client.session.cookies.extract_cookies(response, Request("https://test.service-now.com/"))
+        self.assertEqual(len(client.session.cookies), 0)
+
+    def test_request_uses_timeout(self):
+        client = ServiceNowClient()
+        with patch.object(client.session, 'request') as request:
+            client.get("https://test.service-now.com/")
+            request.assert_called_once_with('GET', "https://test.service-now.com/", timeout=(2, 9))
+
+    def test_pool_stats(self):
+        client = ServiceNowClient()
+        pool = MagicMock(num_requests=5, num_connections=2)
+        with patch.object(client.adapter.poolmanager, 'pools', {'key': pool}):
+            self.assertEqual(client.stats, {'hits': 3, 'misses': 2, 'requests': 5})
+
+    def test_batch_request(self):
+        rest_request = ServiceNowClient.batch_request(7, 'POST', 'api/now/table/cmdb_ci', {'name': 'a'})
+        self.assertEqual(rest_request['id'], '7')
+        self.assertEqual(rest_request['url'], '/api/now/table/cmdb_ci')
+        self.assertEqual(json.loads(base64.b64decode(rest_request['body']).decode('utf-8')), {'name': 'a'})
+
+    def test_batch(self):
+        client = ServiceNowClient()
+        body = base64.b64encode(b'{"result": {"sys_id": "abc"}}').decode('ascii')
+        response = json.dumps({
+            'serviced_requests': [{'id': '7', 'status_code': 201, 'body': body}],
+            'unserviced_requests': ['8'],
+        })
+        with patch.object(ServiceNowClient, 'request') as request:
+            type(request.return_value).status_code = PropertyMock(return_value=200)
+            type(request.return_value).text = PropertyMock(return_value=response)
+            results = client.batch("token", [])
+        self.assertEqual(results['7'], (201, {'result': {'sys_id': 'abc'}}))
+        self.assertEqual(results['8'], (None, None))
+
+    def test_batch_bad_token(self):
+        client = ServiceNowClient()
+        with patch.object(ServiceNowClient, 'request') as request:
+            type(request.return_value).status_code = PropertyMock(return_value=401)
+            with self.assertRaises(ValueError):
+                client.batch("token", [])
+
+    def test_send_retries_once_with_refreshed_token(self):
+        client = ServiceNowClient()
+        provider = MagicMock()
+        provider.get.return_value = "old"
+        provider.refresh.return_value = "new"
+        with patch.object(ServiceNowClient, 'request') as request:
+            request.side_effect = [MagicMock(status_code=401), MagicMock(status_code=200)]
+            r = client.send('GET', "https://test.service-now.com/", provider)
+        self.assertEqual(r.status_code, 200)
+        provider.refresh.assert_called_once_with(stale="old")
+        self.assertEqual(request.call_args[1]['headers']['Authorization'], "Bearer new")
+
+    def test_send_with_plain_token_does_not_retry(self):
+        client = ServiceNowClient()
+        with patch.object(ServiceNowClient, 'request') as request:
+            request.return_value = MagicMock(status_code=401)
+            self.assertEqual(client.send('GET', "https://test.service-now.com/", "token").status_code, 401)
+            self.assertEqual(request.call_count, 1)
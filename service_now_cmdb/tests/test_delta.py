@@ -0,0 +1,42 @@
+from unittest.mock import patch, PropertyMock
+
+from service_now_cmdb.delta import payload_hash, changed_fields, PushStats
+from service_now_cmdb.models import CMDBObject
+from service_now_cmdb.tests.base_test import BaseTest
+
+
+class TestDelta(BaseTest):
+    def test_payload_hash_is_order_independent(self):
+        self.assertEqual(payload_hash({'a': '1', 'b': '2'}), payload_hash({'b': '2', 'a': '1'}))
+        self.assertNotEqual(payload_hash({'a': '1'}), payload_hash({'a': '2'}))
+
+    def test_changed_fields(self):
+        self.assertEqual(changed_fields({'a': '1', 'b': '3', 'c': '4'}, {'a': '1', 'b': '2'}), {'b': '3', 'c': '4'})
+
+    def test_changed_fields_clears_removed_fields(self):
+        self.assertEqual(changed_fields({'a': '1'}, {'a': '1', 'b': '2', 'c': ''}), {'b': ''})
+
+    def test_push_stats(self):
+        stats = PushStats()
+        stats.record(sent=True)
+        stats.record(sent=False)
+        stats.record(sent=False)
+        self.assertEqual(stats.as_dict(), {'sent': 1, 'skipped': 2})
+        stats.reset()
+        self.assertEqual(stats.as_dict(), {'sent': 0, 'skipped': 0})
+
+    @patch('service_now_cmdb.models.cmdb.CMDBObject.key_value', new_callable=PropertyMock)
+    def test_delta_payload(self, key_value):
+        cmdb_object = CMDBObject()
+        key_value.return_value = {'subnet': '10.0.0.0', 'mask': '24'}
+        self.assertEqual(cmdb_object.delta_payload()[0], {'subnet': '10.0.0.0', 'mask': '24'})
+
+        cmdb_object.mark_pushed(key_value.return_value)
+        self.assertIsNone(cmdb_object.delta_payload()[0])
+
+        key_value.return_value = {'subnet': '10.0.0.0', 'mask': '16'}
+        self.assertEqual(cmdb_object.delta_payload()[0], {'mask': '16'})
+
+        cmdb_object.mark_pushed(key_value.return_value)
+        key_value.return_value = {'subnet': '10.0.0.0'}
+        self.assertEqual(cmdb_object.delta_payload()[0], {'mask': ''})
@@ -0,0 +1,50 @@
+from unittest.mock import MagicMock
+
+from requests import ConnectionError
+
+from service_now_cmdb.export import StreamingExporter
+from service_now_cmdb.models import CMDBObjectType, CMDBObjectField, CMDBObject, CMDBObjectValue
+from service_now_cmdb.tests.base_test import BaseTest
+from service_now_cmdb.tests.models.factories import CMDBCompleteType
+
+
+class TestStreamingExporter(BaseTest):
+    def setUp(self):
+        self.cmdb_type = CMDBCompleteType()
+        self.cmdb_object = CMDBObject.objects.get(type=self.cmdb_type)
+        self.client = MagicMock()
+        self.exporter = StreamingExporter(self.cmdb_type, "token", client=self.client, batch_size=10, concurrency=1)
+
+    def tearDown(self):
+        CMDBObjectType.objects.all().delete()
+        CMDBObjectField.objects.all().delete()
+        CMDBObject.objects.all().delete()
+        CMDBObjectValue.objects.all().delete()
+
+    def test_payloads(self):
+        payloads = list(self.exporter.payloads())
+        self.assertEqual(len(payloads), 1)
+        self.assertEqual(payloads[0].object_id, self.cmdb_object.pk)
+        self.assertEqual(payloads[0].values, {'subnet': '55.55.55.122'})
+
+    def test_run_stores_sys_id_and_skips_unchanged(self):
+        self.client.batch.return_value = {str(self.cmdb_object.pk): (201, {'result': {'sys_id': 'abc'}})}
+        self.assertEqual(self.exporter.run(), {'sent': 1, 'failed': 0})
+        self.assertEqual(CMDBObject.objects.get(pk=self.cmdb_object.pk).service_now_id, 'abc')
+
+        self.assertEqual(list(self.exporter.payloads()), [])
+
+    def test_failed_batch_does_not_drop_the_others(self):
+        second = CMDBObject.objects.create(type=self.cmdb_type, object_id=self.cmdb_object.object_id + 1)
+        second.set_fields({'subnet': '10.0.0.0'})
+        exporter = StreamingExporter(self.cmdb_type, "token", client=self.client, batch_size=1, concurrency=2)
+
+        def batch(access_token, rest_requests):
+            if rest_requests[0] == str(self.cmdb_object.pk):
+                raise ConnectionError("Connection reset")
+            return {str(second.pk): (201, {'result': {'sys_id': 'def'}})}
+
+        self.client.batch.side_effect = batch
+        self.client.batch_request.side_effect = lambda request_id, *args: str(request_id)
+        self.assertEqual(exporter.run(), {'sent': 1, 'failed': 1})
+        self.assertEqual(CMDBObject.objects.get(pk=second.pk).service_now_id, 'def')
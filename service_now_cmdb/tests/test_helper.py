@@ -0,0 +1,120 @@
+import asyncio
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.test import override_settings
+from requests import ConnectionError
+
+from service_now_cmdb import async_client, instrumentation
+from service_now_cmdb.client import ServiceNowClient
+from service_now_cmdb.helper import SNCMDBHandler
+from service_now_cmdb.models import CMDBObjectType, CMDBObjectField, CMDBObject, CMDBObjectValue
+from service_now_cmdb.schema import registry
+from service_now_cmdb.simulator import FakeServiceNow
+from service_now_cmdb.tests.base_test import BaseTest
+from service_now_cmdb.tests.models.factories import CMDBObjectTypeFactory, CMDBObjectFieldFactory
+
+
+class TestPushMany(BaseTest):
+    def setUp(self):
+        self.cmdb_type = CMDBObjectTypeFactory(name="IP Network", endpoint="cmdb_ci_ip_network",
+                                               content_type=ContentType.objects.get_for_model(User))
+        CMDBObjectFieldFactory(type=self.cmdb_type, name="name", order=0)
+        registry.invalidate()
+
+        self.instance = FakeServiceNow(require_auth=False)
+        self.instance.start()
+        self.client = ServiceNowClient(base_url=self.instance.base_url)
+        with patch('service_now_cmdb.helper.get_client', return_value=self.client), \
+                patch('service_now_cmdb.helper.settings'):
+            self.handler = SNCMDBHandler(user=None)
+        self.handler.token_provider = "token"
+
+    def tearDown(self):
+        self.client.close()
+        self.instance.stop()
+        CMDBObjectType.objects.all().delete()
+        CMDBObjectField.objects.all().delete()
+        CMDBObject.objects.all().delete()
+        CMDBObjectValue.objects.all().delete()
+
+    def create(self, object_id, name):
+        cmdb_object = CMDBObject.objects.create(type=self.cmdb_type, object_id=object_id)
+        cmdb_object.set_fields({'name': name})
+        return cmdb_object
+
+    def test_created_sys_ids_survive_a_failed_chunk(self):
+        first = self.create(1, "a")
+        second = self.create(2, "b")
+        batch = self.client.batch
+        calls = []
+
+        def fail_second_batch(*args):
+            calls.append(args)
+            if len(calls) > 1:
+                raise ConnectionError()
+            return batch(*args)
+
+        with patch.object(self.client, 'batch', side_effect=fail_second_batch):
+            result = self.handler.push_many(CMDBObject.objects.order_by('object_id'), chunk_size=1)
+
+        self.assertEqual([o.pk for o in result['created']], [first.pk])
+        self.assertEqual([o.pk for o in result['failed']], [second.pk])
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertIn(first.service_now_id, self.instance.table('cmdb_ci_ip_network'))
+        self.assertFalse(second.service_now_id)
+
+    def test_operation_is_tagged_with_the_endpoint(self):
+        self.create(1, "a")
+        events = []
+        instrumentation.register(events.append)
+        try:
+            self.handler.push_many(CMDBObject.objects.all())
+        finally:
+            instrumentation.unregister(events.append)
+        operation = [event for event in events if isinstance(event, instrumentation.OperationEvent)][0]
+        self.assertEqual((operation.name, operation.endpoint), ('push_many', 'cmdb_ci_ip_network'))
+
+    def test_create_with_a_token_and_no_provider(self):
+        user = User.objects.create(username="cmdb")
+        instance = FakeServiceNow()
+        instance.start()
+        try:
+            self.handler.token_provider = None
+            self.handler.token = instance.issue_token()['access_token']
+            with override_settings(SERVICE_NOW_BASE_URL=instance.base_url):
+                cmdb_object = self.handler.create_cmdb_object(user)
+            self.assertIn(cmdb_object.service_now_id, instance.table('cmdb_ci_ip_network'))
+        finally:
+            instance.stop()
+            User.objects.all().delete()
+
+    def test_delete_many(self):
+        linked = self.create(1, "a")
+        unlinked = self.create(2, "b")
+        self.handler.push_many(CMDBObject.objects.filter(pk=linked.pk))
+        linked.refresh_from_db()
+
+        result = self.handler.delete_many(CMDBObject.objects.all())
+        self.assertEqual(len(result['deleted']), 2)
+        self.assertNotIn(linked.service_now_id, self.instance.table('cmdb_ci_ip_network'))
+        self.assertFalse(CMDBObject.objects.filter(pk__in=[linked.pk, unlinked.pk]).exists())
+
+    @skipIf(async_client.httpx is None, "httpx is not installed")
+    def test_apush_many(self):
+        first = self.create(1, "a")
+        self.create(2, "b")
+        with override_settings(SERVICE_NOW_BASE_URL=self.instance.base_url):
+            result = asyncio.run(self.handler.apush_many(CMDBObject.objects.all()))
+            self.assertEqual(len(result['created']), 2)
+            first.refresh_from_db()
+            self.assertIn(first.service_now_id, self.instance.table('cmdb_ci_ip_network'))
+
+            result = asyncio.run(self.handler.apush_many(CMDBObject.objects.all()))
+            self.assertEqual((len(result['created']), len(result['skipped'])), (0, 2))
+
+            records = asyncio.run(self.handler.afetch_many(CMDBObject.objects.all()))
+            self.assertEqual(records[first.pk]['name'], "a")
@@ -0,0 +1,99 @@
+from unittest.mock import MagicMock, patch
+
+from service_now_cmdb import instrumentation
+from service_now_cmdb.client import ServiceNowClient
+from service_now_cmdb.delta import push_stats
+from service_now_cmdb.models import CMDBObjectType
+from service_now_cmdb.ratelimit import RetryPolicy
+from service_now_cmdb.tests.base_test import BaseTest
+
+
+class TestInstrumentation(BaseTest):
+    def setUp(self):
+        self.events = []
+        instrumentation.register(self.events.append)
+
+    def tearDown(self):
+        instrumentation.unregister(self.events.append)
+
+    @patch('service_now_cmdb.client.time.sleep')
+    def test_request_event(self, sleep):
+        client = ServiceNowClient(domain="test")
+        client.retry_policy = RetryPolicy(max_retries=3, backoff=1, max_backoff=1)
+        throttled = MagicMock(status_code=429, headers={'Retry-After': '1'})
+        ok = MagicMock(status_code=201, headers={})
+        with patch.object(client.session, 'request', side_effect=[throttled, ok]):
+            client.post(client.table_url('cmdb_ci'), data='{"name": "a"}')
+
+        self.assertEqual(len(self.events), 1)
+        event = self.events[0]
+        self.assertIsInstance(event, instrumentation.RequestEvent)
+        self.assertEqual(event.method, 'POST')
+        self.assertEqual(event.endpoint, 'cmdb_ci')
+        self.assertEqual(event.status_code, 201)
+        self.assertEqual(event.payload_bytes, 13)
+        self.assertEqual(event.retries, 1)
+
+    def test_operation_event(self):
+        with instrumentation.operation('push_many') as current:
+            instrumentation.record_request('POST', 'batch', 200, 0.5, 10, 0)
+            list(CMDBObjectType.objects.all())
+            current['endpoint'] = 'cmdb_ci'
+
+        request_event, operation_event = self.events
+        self.assertIsInstance(operation_event, instrumentation.OperationEvent)
+        self.assertEqual(operation_event.name, 'push_many')
+        self.assertEqual(operation_event.http_requests, 1)
+        self.assertEqual(operation_event.http_time, 0.5)
+        self.assertEqual(operation_event.endpoint, 'cmdb_ci')
+        self.assertEqual(operation_event.db_queries, 1)
+        self.assertFalse(operation_event.failed)
+
+    def test_failing_callback_is_logged(self):
+        def fail(event):
+            raise RuntimeError()
+
+        instrumentation.register(fail)
+        try:
+            with self.assertLogs('service_now_cmdb.instrumentation', 'ERROR'):
+                instrumentation.record_request('GET', 'cmdb_ci', 200, 0.1, 0, 0)
+        finally:
+            instrumentation.unregister(fail)
+        self.assertEqual(len(self.events), 1)
+
+    def test_failed_operation(self):
+        with self.assertRaises(ValueError):
+            with instrumentation.operation('post', 'cmdb_ci'):
+                raise ValueError("Bad Access Token")
+        self.assertTrue(self.events[0].failed)
+
+    def test_signal(self):
+        received = []
+
+        def receiver(sender, event, **kwargs):
+            received.append(event)
+
+        instrumentation.request_finished.connect(receiver)
+        try:
+            instrumentation.record_request('GET', 'cmdb_ci', 200, 0.1, 0, 0)
+        finally:
+            instrumentation.request_finished.disconnect(receiver)
+        self.assertEqual(received, self.events)
+
+    def test_query_report(self):
+        with instrumentation.query_report() as report:
+            list(CMDBObjectType.objects.all())
+            list(CMDBObjectType.objects.all())
+            push_stats.record(sent=True)
+            push_stats.record(sent=True)
+        self.assertEqual(report.pushed, 2)
+        self.assertEqual(report.queries, 2)
+        self.assertIn("2 pushed objects", str(report))
+
+    def test_statsd_exporter(self):
+        client = MagicMock()
+        exporter = instrumentation.StatsDExporter(client)
+        exporter(instrumentation.RequestEvent('PUT', 'cmdb_ci', 200, 0.25, 100, 2))
+        client.timing.assert_called_once_with('http.cmdb_ci.time', 250)
+        client.incr.assert_any_call('http.cmdb_ci.status.200')
+        client.incr.assert_any_call('http.cmdb_ci.retries', 2)
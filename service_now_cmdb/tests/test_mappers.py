@@ -0,0 +1,45 @@
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+
+from service_now_cmdb.mappers import resolve, source_values, attach_source_values, source_queryset
+from service_now_cmdb.models import CMDBObjectType, CMDBObjectField, CMDBObject
+from service_now_cmdb.schema import registry
+from service_now_cmdb.tests.base_test import BaseTest
+
+
+class TestMappers(BaseTest):
+    def setUp(self):
+        self.user = User.objects.create(username='mapper', first_name='Jeff', email='jeff@example.com')
+        self.cmdb_type = CMDBObjectType.objects.create(name='user', endpoint='sys_user',
+                                                       content_type=ContentType.objects.get_for_model(User))
+        CMDBObjectField.objects.create(name='user_name', type=self.cmdb_type, order=1, source='username')
+        CMDBObjectField.objects.create(name='full_name', type=self.cmdb_type, order=2, source='get_full_name')
+        CMDBObjectField.objects.create(name='location', type=self.cmdb_type, order=3)
+        self.cmdb_object = CMDBObject.objects.create(type=self.cmdb_type, object_id=self.user.pk)
+        self.cmdb_object.set_field('location', 'HQ')
+
+    def tearDown(self):
+        CMDBObjectType.objects.all().delete()
+        self.user.delete()
+
+    def test_resolve(self):
+        self.assertEqual(resolve(self.user, 'username'), 'mapper')
+        self.assertEqual(resolve(self.user, 'get_full_name'), 'Jeff')
+        self.assertEqual(resolve(self.user, 'missing__path'), '')
+
+    def test_method_sources_load_every_column(self):
+        schema = registry.get_for_type(self.cmdb_type)
+        self.assertFalse(source_queryset(schema, [self.user.pk]).query.deferred_loading[0])
+
+    def test_source_values(self):
+        schema = registry.get_for_type(self.cmdb_type)
+        self.assertEqual(source_values(schema, [self.user.pk]),
+                         {self.user.pk: {'user_name': 'mapper', 'full_name': 'Jeff'}})
+
+    def test_key_value_merges_stored_and_sourced_values(self):
+        cmdb_object = CMDBObject.objects.get(pk=self.cmdb_object.pk)
+        self.assertEqual(cmdb_object.key_value, {'user_name': 'mapper', 'full_name': 'Jeff', 'location': 'HQ'})
+
+    def test_attach_source_values(self):
+        objects = attach_source_values(list(CMDBObject.objects.with_key_values().filter(pk=self.cmdb_object.pk)))
+        self.assertEqual(objects[0].source_values, {'user_name': 'mapper', 'full_name': 'Jeff'})
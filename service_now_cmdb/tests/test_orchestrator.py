@@ -0,0 +1,73 @@
+from unittest.mock import MagicMock
+
+from service_now_cmdb.models import CMDBObjectType, CMDBObjectField, CMDBObject, CMDBObjectValue, CMDBSyncCheckpoint
+from service_now_cmdb.orchestrator import SyncOrchestrator
+from service_now_cmdb.tests.base_test import BaseTest
+from service_now_cmdb.tests.models.factories import CMDBCompleteType
+
+
+class TestSyncOrchestrator(BaseTest):
+    def setUp(self):
+        self.cmdb_type = CMDBCompleteType()
+        CMDBObject.objects.bulk_create([CMDBObject(type=self.cmdb_type, object_id=i) for i in range(100, 110)])
+        self.handler = MagicMock()
+        self.handler.push_many.side_effect = lambda chunk, chunk_size: {
+            'created': chunk, 'updated': [], 'skipped': [], 'failed': []}
+        self.orchestrator = SyncOrchestrator(self.handler, run_name='test', partition_size=5, chunk_size=2,
+                                             workers=1)
+
+    def tearDown(self):
+        CMDBSyncCheckpoint.objects.all().delete()
+        CMDBObjectType.objects.all().delete()
+        CMDBObjectField.objects.all().delete()
+        CMDBObject.objects.all().delete()
+        CMDBObjectValue.objects.all().delete()
+
+    def test_partitions_cover_every_object(self):
+        partitions = self.orchestrator.partitions(self.cmdb_type)
+        self.assertGreater(len(partitions), 1)
+        for object_id in CMDBObject.objects.filter(type=self.cmdb_type).values_list('object_id', flat=True):
+            self.assertEqual(sum(1 for start, end in partitions if start <= object_id < end), 1)
+
+    def test_execute(self):
+        summary = self.orchestrator.execute()
+        self.assertEqual(summary['sent'], CMDBObject.objects.count())
+        self.assertEqual(summary['done'], summary['partitions'])
+        self.assertEqual(summary['errors'], [])
+
+    def test_resume_after_checkpoint(self):
+        self.orchestrator.plan()
+        checkpoint = self.orchestrator.checkpoints.order_by('start').last()
+        CMDBSyncCheckpoint.objects.filter(pk=checkpoint.pk).update(last_object_id=checkpoint.end - 2)
+        self.orchestrator.checkpoints.exclude(pk=checkpoint.pk).update(done=True)
+
+        self.orchestrator.execute()
+        pushed = [cmdb_object.object_id for call in self.handler.push_many.call_args_list for cmdb_object in call[0][0]]
+        self.assertEqual(pushed, [checkpoint.end - 1])
+
+    def test_failure_is_recorded(self):
+        self.handler.push_many.side_effect = ValueError("Bad Access Token")
+        summary = self.orchestrator.execute()
+        self.assertEqual(summary['done'], 0)
+        self.assertEqual(summary['errors'][0][1], "Bad Access Token")
+        self.assertEqual(set(self.orchestrator.checkpoints.values_list('attempts', flat=True)),
+                         {self.orchestrator.max_attempts})
+
+    def test_failed_objects_keep_the_partition_pending(self):
+        self.orchestrator.max_attempts = 1
+        failing = CMDBObject.objects.get(object_id=103)
+        self.handler.push_many.side_effect = lambda chunk, chunk_size: {
+            'created': [o for o in chunk if o.pk != failing.pk], 'updated': [], 'skipped': [],
+            'failed': [o for o in chunk if o.pk == failing.pk]}
+        summary = self.orchestrator.execute()
+        self.assertEqual(summary['done'], summary['partitions'] - 1)
+        checkpoint = self.orchestrator.checkpoints.get(done=False)
+        self.assertEqual(checkpoint.last_object_id, 102)
+        self.assertEqual(checkpoint.last_error, "1 objects failed to push")
+
+    def test_unexpected_error_releases_the_lease(self):
+        self.handler.push_many.side_effect = KeyError('result')
+        summary = self.orchestrator.execute()
+        self.assertEqual(summary['done'], 0)
+        self.assertEqual(set(self.orchestrator.checkpoints.values_list('attempts', flat=True)),
+                         {self.orchestrator.max_attempts})
@@ -0,0 +1,98 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from requests import ConnectionError
+
+from service_now_cmdb.client import ServiceNowClient
+from service_now_cmdb.models import CMDBObjectType, CMDBObjectField, CMDBObject, CMDBObjectValue
+from service_now_cmdb.planner import SyncPlanner, type_order
+from service_now_cmdb.schema import registry
+from service_now_cmdb.simulator import FakeServiceNow
+from service_now_cmdb.tests.base_test import BaseTest
+from service_now_cmdb.tests.models.factories import CMDBObjectTypeFactory, CMDBObjectFieldFactory
+
+
+class TestSyncPlanner(BaseTest):
+    def setUp(self):
+        content_type = ContentType.objects.get_for_model(User)
+        self.network = CMDBObjectTypeFactory(name="IP Network", endpoint="cmdb_ci_ip_network",
+                                             content_type=content_type)
+        self.address = CMDBObjectTypeFactory(name="IP Address", endpoint="cmdb_ci_ip_address",
+                                             content_type=content_type)
+        CMDBObjectFieldFactory(type=self.network, name="name", order=0)
+        CMDBObjectFieldFactory(type=self.network, name="parent", order=1, reference_type=self.network)
+        CMDBObjectFieldFactory(type=self.address, name="ip_address", order=0)
+        CMDBObjectFieldFactory(type=self.address, name="network", order=1, reference_type=self.network)
+        registry.invalidate()
+
+        self.instance = FakeServiceNow(require_auth=False)
+        self.instance.start()
+        self.client = ServiceNowClient(base_url=self.instance.base_url)
+        self.planner = SyncPlanner("token", client=self.client, batch_size=2)
+
+    def tearDown(self):
+        self.client.close()
+        self.instance.stop()
+        CMDBObjectType.objects.all().delete()
+        CMDBObjectField.objects.all().delete()
+        CMDBObject.objects.all().delete()
+        CMDBObjectValue.objects.all().delete()
+
+    def create(self, cmdb_type, object_id, **values):
+        cmdb_object = CMDBObject.objects.create(type=cmdb_type, object_id=object_id)
+        cmdb_object.set_fields(values)
+        return cmdb_object
+
+    def record(self, cmdb_object):
+        cmdb_object.refresh_from_db()
+        return self.instance.table(cmdb_object.type.endpoint)[cmdb_object.service_now_id]
+
+    def test_type_order(self):
+        ordered = type_order([registry.get_for_type(self.address), registry.get_for_type(self.network)])
+        self.assertEqual([schema.type_id for schema in ordered], [self.network.pk, self.address.pk])
+
+    def test_references_are_sent_as_sys_ids(self):
+        network = self.create(self.network, 1, name="lan", parent='')
+        child = self.create(self.network, 2, name="vlan", parent='1')
+        addresses = [self.create(self.address, i, ip_address="10.0.0.{}".format(i), network='2') for i in (10, 11, 12)]
+        orphan = self.create(self.address, 13, ip_address="10.0.1.1", network='99')
+
+        stats = self.planner.run(CMDBObject.objects.all())
+        self.assertEqual((stats['levels'], stats['created'], stats['failed'], stats['deferred']), (3, 6, 0, 0))
+
+        self.assertEqual(self.record(child)['parent'], self.record(network)['sys_id'])
+        for address in addresses:
+            self.assertEqual(self.record(address)['network'], child.service_now_id)
+        self.assertNotIn('network', self.record(orphan))
+        # One POST per object and no follow-up PUTs.
+        self.assertEqual(self.instance.calls[('POST', '/api/now/v1/batch', 200)], 4)
+
+        stats = SyncPlanner("token", client=self.client).run(CMDBObject.objects.all())
+        self.assertEqual((stats['skipped'], stats['levels']), (6, 1))
+
+    def test_reference_cycle(self):
+        first = self.create(self.network, 1, name="a", parent='2')
+        second = self.create(self.network, 2, name="b", parent='1')
+
+        stats = self.planner.run(CMDBObject.objects.all())
+        self.assertEqual((stats['created'], stats['deferred']), (2, 2))
+        first_record, second_record = self.record(first), self.record(second)
+        self.assertEqual(first_record['parent'], second.service_now_id)
+        self.assertEqual(second_record['parent'], first.service_now_id)
+
+    def test_failed_batch_keeps_the_others(self):
+        networks = [self.create(self.network, i, name="net{}".format(i), parent='') for i in (1, 2, 3, 4)]
+        batch = self.client.batch
+
+        def fail_first_batch(access_token, rest_requests):
+            if any(rest_request['id'] == str(networks[0].pk) for rest_request in rest_requests):
+                raise ConnectionError()
+            return batch(access_token, rest_requests)
+
+        with patch.object(self.client, 'batch', side_effect=fail_first_batch):
+            stats = self.planner.push_level(self.planner.load(CMDBObject.objects.order_by('pk')))
+        self.assertEqual((stats['created'], stats['failed']), (2, 2))
+        for network in networks[2:]:
+            self.assertIn(self.record(network)['sys_id'], self.instance.table('cmdb_ci_ip_network'))
+            self.assertEqual(self.planner.references.get((self.network.pk, network.object_id)), network.service_now_id)
@@ -0,0 +1,69 @@
+import json
+import time
+from unittest.mock import MagicMock, patch
+
+from service_now_cmdb.models import CMDBObjectType, CMDBObjectField, CMDBObject, CMDBObjectValue
+from service_now_cmdb.pull import TablePuller
+from service_now_cmdb.tests.base_test import BaseTest
+from service_now_cmdb.tests.models.factories import CMDBCompleteType
+
+
+class TestTablePuller(BaseTest):
+    def setUp(self):
+        self.cmdb_type = CMDBCompleteType()
+        self.cmdb_object = CMDBObject.objects.get(type=self.cmdb_type)
+        self.cmdb_object.service_now_id = 'a1'
+        self.cmdb_object.save()
+        self.client = MagicMock()
+        self.puller = TablePuller(self.cmdb_type, "token", client=self.client, page_size=2)
+
+    def tearDown(self):
+        CMDBObjectType.objects.all().delete()
+        CMDBObjectField.objects.all().delete()
+        CMDBObject.objects.all().delete()
+        CMDBObjectValue.objects.all().delete()
+
+    def respond(self, *pages):
+        responses = []
+        for page in pages:
+            response = MagicMock(status_code=200, text=json.dumps({'result': page}))
+            responses.append(response)
+        self.client.send.side_effect = responses
+
+    def test_query(self):
+        self.assertEqual(self.puller.query('', ''), "ORDERBYsys_id")
+        self.assertEqual(self.puller.query('2017-10-01 00:00:00', 'a1'),
+                         "sys_updated_on>=2017-10-01 00:00:00^sys_id>a1^ORDERBYsys_id")
+        self.assertEqual(self.puller.query('', 'a1', 'discovery_source=MyApp'),
+                         "discovery_source=MyApp^sys_id>a1^ORDERBYsys_id")
+
+    @patch('service_now_cmdb.pull.time.time', return_value=1507075260)
+    def test_run(self, _):
+        self.respond(
+            [{'sys_id': 'a1', 'sys_updated_on': '2017-10-02 00:00:00', 'subnet': '10.0.0.0'},
+             {'sys_id': 'a2', 'sys_updated_on': '2017-10-03 00:00:00', 'subnet': '10.0.1.0'}],
+            [],
+        )
+        stats = self.puller.run()
+        self.assertEqual(stats, {'records': 2, 'created': 0, 'updated': 1})
+        self.assertEqual(self.cmdb_object.key_value, {'subnet': '10.0.0.0'})
+        # The start of the run minus the overlap, not the newest sys_updated_on.
+        self.assertEqual(CMDBObjectType.objects.get(pk=self.cmdb_type.pk).pull_watermark, '2017-10-04 00:00:00')
+
+        params = self.client.send.call_args_list[1][1]['params']
+        self.assertEqual(params['sysparm_query'], "sys_id>a2^ORDERBYsys_id")
+        self.assertEqual(params['sysparm_fields'], "sys_id,sys_updated_on,subnet")
+
+    def test_short_page_is_not_the_end(self):
+        self.respond(
+            [{'sys_id': 'a1', 'sys_updated_on': '2017-10-02 00:00:00', 'subnet': '10.0.0.0'}],
+            [{'sys_id': 'a3', 'sys_updated_on': '2017-10-02 00:00:00', 'subnet': '10.0.2.0'}],
+            [],
+        )
+        self.assertEqual(self.puller.run()['records'], 2)
+        self.assertEqual(self.client.send.call_count, 3)
+
+    def test_bad_token(self):
+        self.client.send.return_value = MagicMock(status_code=401)
+        with self.assertRaises(ValueError):
+            self.puller.run()
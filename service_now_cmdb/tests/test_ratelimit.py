@@ -0,0 +1,52 @@
+from unittest.mock import MagicMock, patch
+
+from service_now_cmdb.client import ServiceNowClient
+from service_now_cmdb.ratelimit import TokenBucket, RateLimiter, RetryPolicy, endpoint_from_url, reset_rate_limiter
+from service_now_cmdb.tests.base_test import BaseTest
+
+
+class TestRateLimit(BaseTest):
+    def tearDown(self):
+        reset_rate_limiter()
+
+    def test_endpoint_from_url(self):
+        self.assertEqual(endpoint_from_url("https://a.service-now.com/api/now/table/cmdb_ci/abc"), "cmdb_ci")
+        self.assertEqual(endpoint_from_url("https://a.service-now.com/api/now/v2/table/cmdb_ci?x=1"), "cmdb_ci")
+        self.assertEqual(endpoint_from_url("https://a.service-now.com/api/now/v1/batch"), "batch")
+        self.assertEqual(endpoint_from_url("https://a.service-now.com/oauth_token.do"), "")
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=10, burst=2)
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertGreater(bucket.reserve(), 0.0)
+
+    def test_rate_limiter_per_endpoint(self):
+        limiter = RateLimiter({'cmdb_ci': {'rate': 1}})
+        self.assertEqual(limiter.reserve('cmdb_ci'), 0.0)
+        self.assertGreater(limiter.reserve('cmdb_ci'), 0.0)
+        self.assertEqual(limiter.reserve('other'), 0.0)
+
+    def test_retry_after(self):
+        policy = RetryPolicy(max_retries=2, backoff=1, max_backoff=30)
+        response = MagicMock(status_code=429, headers={'Retry-After': '7'})
+        self.assertEqual(policy.delay(response, 0), 7.0)
+        self.assertIsNone(policy.delay(response, 2))
+        self.assertIsNone(policy.delay(MagicMock(status_code=200, headers={}), 0))
+
+    def test_backoff_with_jitter(self):
+        policy = RetryPolicy(max_retries=5, backoff=1, max_backoff=4)
+        response = MagicMock(status_code=503, headers={})
+        for attempt in range(5):
+            self.assertLessEqual(policy.delay(response, attempt), 4)
+
+    @patch('service_now_cmdb.client.time.sleep')
+    def test_client_retries_throttled_requests(self, sleep):
+        client = ServiceNowClient(domain="test")
+        client.retry_policy = RetryPolicy(max_retries=3, backoff=1, max_backoff=1)
+        throttled = MagicMock(status_code=429, headers={'Retry-After': '1'})
+        ok = MagicMock(status_code=200, headers={})
+        with patch.object(client.session, 'request', side_effect=[throttled, throttled, ok]) as request:
+            self.assertIs(client.get(client.table_url('cmdb_ci')), ok)
+        self.assertEqual(request.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
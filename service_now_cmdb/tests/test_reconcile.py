@@ -0,0 +1,82 @@
+from unittest.mock import MagicMock, patch
+
+from service_now_cmdb.models import CMDBObjectType, CMDBObjectField, CMDBObject, CMDBObjectValue
+from service_now_cmdb.reconcile import Reconciler
+from service_now_cmdb.tests.base_test import BaseTest
+from service_now_cmdb.tests.models.factories import CMDBCompleteType
+
+
+class TestReconciler(BaseTest):
+    def setUp(self):
+        self.cmdb_type = CMDBCompleteType()
+        self.cmdb_object = CMDBObject.objects.get(type=self.cmdb_type)
+        self.client = MagicMock()
+        self.reconciler = Reconciler(self.cmdb_type, "token", client=self.client, page_size=10, batch_size=10)
+
+    def tearDown(self):
+        CMDBObjectType.objects.all().delete()
+        CMDBObjectField.objects.all().delete()
+        CMDBObject.objects.all().delete()
+        CMDBObjectValue.objects.all().delete()
+
+    def diff(self, records):
+        with patch.object(self.reconciler.puller, 'pages', return_value=iter([records])):
+            return self.reconciler.diff()
+
+    def test_unlinked_object_is_created(self):
+        result = self.diff([])
+        self.assertEqual([payload.object_id for payload in result.creates], [self.cmdb_object.pk])
+        self.assertEqual(result.updates, [])
+
+    def test_drift_and_orphans(self):
+        CMDBObject.objects.filter(pk=self.cmdb_object.pk).update(service_now_id='abc')
+        result = self.diff([
+            {'sys_id': 'abc', 'subnet': '10.0.0.0'},
+            {'sys_id': 'zzz', 'subnet': '10.0.0.1'},
+        ])
+        self.assertEqual(result.creates, [])
+        self.assertEqual(result.drift, {self.cmdb_object.pk: {'subnet': ('55.55.55.122', '10.0.0.0')}})
+        self.assertEqual((result.orphans, result.orphan_count), ([], 1))
+
+    def test_in_sync(self):
+        CMDBObject.objects.filter(pk=self.cmdb_object.pk).update(service_now_id='abc')
+        result = self.diff([{'sys_id': 'abc', 'subnet': '55.55.55.122'}])
+        self.assertEqual((result.creates, result.updates, result.orphan_count), ([], [], 0))
+
+    def test_deleted_remotely_is_recreated(self):
+        CMDBObject.objects.filter(pk=self.cmdb_object.pk).update(service_now_id='gone')
+        result = self.diff([])
+        self.assertEqual(len(result.creates), 1)
+        self.assertIsNone(result.creates[0].service_now_id)
+
+    def test_orphans_are_scoped(self):
+        CMDBObject.objects.filter(pk=self.cmdb_object.pk).update(service_now_id='abc')
+        self.reconciler.orphan_query = 'discovery_source=MyApp'
+        pages = [
+            iter([[{'sys_id': 'abc', 'subnet': '55.55.55.122'}, {'sys_id': 'other', 'subnet': '10.0.0.1'}]]),
+            iter([[{'sys_id': 'abc'}, {'sys_id': 'mine'}]]),
+        ]
+        with patch.object(self.reconciler.puller, 'pages', side_effect=pages) as mock_pages:
+            result = self.reconciler.diff()
+        self.assertEqual((result.orphans, result.orphan_count), (['mine'], 1))
+        self.assertEqual(mock_pages.call_args[1]['condition'], 'discovery_source=MyApp')
+
+    def test_delete_orphans_requires_a_scope(self):
+        result = self.diff([{'sys_id': 'zzz', 'subnet': '10.0.0.1'}])
+        with self.assertRaises(ValueError):
+            self.reconciler.apply(result, delete_orphans=True)
+        self.client.batch.assert_not_called()
+
+    def test_apply(self):
+        CMDBObject.objects.filter(pk=self.cmdb_object.pk).update(service_now_id='gone')
+        self.reconciler.orphan_query = 'discovery_source=MyApp'
+        pages = [iter([[{'sys_id': 'zzz', 'subnet': '10.0.0.1'}]]), iter([[{'sys_id': 'zzz'}]])]
+        with patch.object(self.reconciler.puller, 'pages', side_effect=pages):
+            result = self.reconciler.diff()
+        self.client.batch.side_effect = [
+            {str(self.cmdb_object.pk): (201, {'result': {'sys_id': 'new'}})},
+            {'zzz': (204, None)},
+        ]
+        stats = self.reconciler.apply(result, delete_orphans=True)
+        self.assertEqual(stats, {'sent': 1, 'failed': 0, 'deleted': 1})
+        self.assertEqual(CMDBObject.objects.get(pk=self.cmdb_object.pk).service_now_id, 'new')
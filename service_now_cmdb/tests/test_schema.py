@@ -0,0 +1,57 @@
+from django.db import transaction
+
+from service_now_cmdb.models.cmdb import CMDBObjectType, CMDBObjectField, CMDBObject, CMDBObjectValue
+from service_now_cmdb.schema import registry
+from service_now_cmdb.tests.base_test import BaseTest
+from service_now_cmdb.tests.models.factories import CMDBCompleteType
+
+
+class TestSchemaRegistry(BaseTest):
+    def setUp(self):
+        registry.invalidate()
+        self.cmdb_type = CMDBCompleteType()
+
+    def tearDown(self):
+        CMDBObjectType.objects.all().delete()
+        CMDBObjectField.objects.all().delete()
+        CMDBObject.objects.all().delete()
+        CMDBObjectValue.objects.all().delete()
+
+    def test_get_for_type(self):
+        schema = registry.get_for_type(self.cmdb_type)
+        self.assertEqual(schema.endpoint, self.cmdb_type.endpoint)
+        self.assertEqual(schema.field_names, ['subnet'])
+
+    def test_get_for_missing_type(self):
+        with self.assertRaises(CMDBObjectType.DoesNotExist):
+            registry.get_for_type(-1)
+
+    def test_invalidated_on_field_save(self):
+        registry.get_for_type(self.cmdb_type)
+        CMDBObjectField.objects.create(name='mask', type=self.cmdb_type, order=2)
+        self.assertIn('mask', registry.get_for_type(self.cmdb_type).field_names)
+
+    def test_invalidated_after_commit(self):
+        registry.get_for_type(self.cmdb_type)
+        with transaction.atomic():
+            CMDBObjectField.objects.create(name='mask', type=self.cmdb_type, order=2)
+            CMDBObject.objects.get(type=self.cmdb_type).set_fields({'mask': '255.255.255.0'})
+            # The other threads keep the committed schema.
+            self.assertNotIn('mask', registry._schema[0][self.cmdb_type.pk].field_names)
+        self.assertIsNone(registry._schema)
+        self.assertIn('mask', registry.get_for_type(self.cmdb_type).field_names)
+
+    def test_rolled_back_change_is_dropped(self):
+        registry.get_for_type(self.cmdb_type)
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                CMDBObjectField.objects.create(name='mask', type=self.cmdb_type, order=2)
+                self.assertIn('mask', registry.get_for_type(self.cmdb_type).field_names)
+                raise RuntimeError()
+        self.assertNotIn('mask', registry.get_for_type(self.cmdb_type).field_names)
+
+    def test_invalidated_on_type_save(self):
+        registry.get_for_type(self.cmdb_type)
+        self.cmdb_type.endpoint = 'cmdb_ci_ip_address'
+        self.cmdb_type.save()
+        self.assertEqual(registry.get_for_type(self.cmdb_type).endpoint, 'cmdb_ci_ip_address')
@@ -0,0 +1,87 @@
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.test import override_settings
+
+from service_now_cmdb import signals
+from service_now_cmdb.apps import ServiceNowCMDB
+from service_now_cmdb.models import CMDBObjectType, CMDBObject, CMDBOutbox
+from service_now_cmdb.tests.base_test import BaseTest
+
+
+class TestAutoSync(BaseTest):
+    def setUp(self):
+        self.cmdb_type = CMDBObjectType.objects.create(name='user', endpoint='sys_user',
+                                                       content_type=ContentType.objects.get_for_model(User))
+        signals.connect()
+
+    def tearDown(self):
+        signals.disconnect()
+        User.objects.filter(username__startswith='auto-sync').delete()
+        CMDBObjectType.objects.all().delete()
+        CMDBObject.objects.all().delete()
+        CMDBOutbox.objects.all().delete()
+
+    def test_saves_in_transaction_are_coalesced(self):
+        with transaction.atomic():
+            user = User.objects.create(username='auto-sync')
+            user.first_name = 'Jeff'
+            user.save()
+            user.save()
+            self.assertFalse(CMDBObject.objects.exists())
+
+        cmdb_object = CMDBObject.objects.get(type=self.cmdb_type, object_id=user.pk)
+        self.assertEqual(CMDBOutbox.objects.filter(object=cmdb_object).count(), 1)
+
+    def test_coalesce_block(self):
+        with signals.coalesce():
+            users = [User.objects.create(username='auto-sync-{}'.format(i)) for i in range(3)]
+            self.assertFalse(CMDBObject.objects.exists())
+        self.assertEqual(CMDBOutbox.objects.filter(object__object_id__in=[u.pk for u in users]).count(), 3)
+
+    def test_delete_removes_cmdb_object(self):
+        user = User.objects.create(username='auto-sync')
+        self.assertTrue(CMDBObject.objects.filter(object_id=user.pk).exists())
+        user.delete()
+        self.assertFalse(CMDBObject.objects.filter(type=self.cmdb_type, object_id=user.pk).exists())
+
+    def test_rolled_back_changes_are_dropped(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                User.objects.create(id=99999, username='auto-sync-rolled-back')
+                raise RuntimeError()
+
+        with transaction.atomic():
+            user = User.objects.create(username='auto-sync')
+        self.assertEqual(list(CMDBObject.objects.values_list('object_id', flat=True)), [user.pk])
+
+    def test_delete_queues_removal_of_linked_record(self):
+        user = User.objects.create(username='auto-sync')
+        object_id = user.pk
+        CMDBObject.objects.filter(object_id=object_id).update(service_now_id='abc')
+        user.delete()
+        outbox = CMDBOutbox.objects.get(object__type=self.cmdb_type, object__object_id=object_id)
+        self.assertTrue(outbox.remove)
+
+
+class TestAutoSyncSetting(BaseTest):
+    def setUp(self):
+        self.cmdb_type = CMDBObjectType.objects.create(name='user', endpoint='sys_user',
+                                                       content_type=ContentType.objects.get_for_model(User))
+
+    def tearDown(self):
+        User.objects.filter(username__startswith='auto-sync').delete()
+        CMDBObjectType.objects.all().delete()
+        CMDBObject.objects.all().delete()
+        CMDBOutbox.objects.all().delete()
+
+    def test_setting_enables_auto_sync(self):
+        # ready() registers the setting's receiver, so the app config must be the package's own.
+        self.assertIsInstance(apps.get_app_config('service_now_cmdb'), ServiceNowCMDB)
+        with override_settings(SERVICE_NOW_AUTO_SYNC=True):
+            user = User.objects.create(username='auto-sync')
+        self.assertTrue(CMDBOutbox.objects.filter(object__type=self.cmdb_type, object__object_id=user.pk).exists())
+
+        User.objects.create(username='auto-sync-off')
+        self.assertEqual(CMDBOutbox.objects.count(), 1)
@@ -0,0 +1,94 @@
+from django.test import override_settings
+
+from service_now_cmdb.client import get_client, reset_client
+from service_now_cmdb.models import CMDBObjectType, CMDBObjectField, CMDBObject, CMDBObjectValue, ServiceNowToken
+from service_now_cmdb.pull import TablePuller
+from service_now_cmdb.simulator import FakeServiceNow
+from service_now_cmdb.tests.base_test import BaseTest
+from service_now_cmdb.tests.models.factories import CMDBCompleteType, UserFactory
+from service_now_cmdb.tokens import TokenProvider
+
+
+class TestFakeServiceNow(BaseTest):
+    def setUp(self):
+        self.instance = FakeServiceNow(users={'admin': 'secret'})
+        self.instance.start()
+        self.settings = override_settings(SERVICE_NOW_BASE_URL=self.instance.base_url, SERVICE_NOW_CLIENT_ID="id",
+                                          SERVICE_NOW_CLIENT_SECRET="secret", SERVICE_NOW_RETRY_BACKOFF=0.01)
+        self.settings.enable()
+        reset_client()
+        self.client = get_client()
+        self.access_token = self.instance.issue_token()['access_token']
+
+    def tearDown(self):
+        reset_client()
+        self.settings.disable()
+        self.instance.stop()
+        ServiceNowToken.objects.all().delete()
+        CMDBObjectType.objects.all().delete()
+        CMDBObjectField.objects.all().delete()
+        CMDBObject.objects.all().delete()
+        CMDBObjectValue.objects.all().delete()
+
+    def test_base_url_setting(self):
+        self.assertEqual(self.client.base_url, self.instance.base_url)
+
+    def test_password_grant(self):
+        data = ServiceNowToken.get_credentials('admin', 'secret')
+        self.assertIn(data['access_token'], self.instance.access_tokens)
+        with self.assertRaises(ValueError):
+            ServiceNowToken.get_credentials('admin', 'wrong')
+
+    def test_table_api(self):
+        r = self.client.send('POST', self.client.table_url('cmdb_ci_ip_network'), self.access_token,
+                             json={'subnet': '10.0.0.0'})
+        self.assertEqual(r.status_code, 201)
+        sys_id = r.json()['result']['sys_id']
+
+        r = self.client.send('PUT', self.client.table_url('cmdb_ci_ip_network', sys_id), self.access_token,
+                             json={'subnet': '10.0.1.0'})
+        self.assertEqual(r.json()['result']['subnet'], '10.0.1.0')
+
+        r = self.client.send('GET', self.client.table_url('cmdb_ci_ip_network'), self.access_token,
+                             params={'sysparm_query': 'subnet=10.0.1.0', 'sysparm_fields': 'sys_id'})
+        self.assertEqual(r.json()['result'], [{'sys_id': sys_id}])
+
+        r = self.client.send('DELETE', self.client.table_url('cmdb_ci_ip_network', sys_id), self.access_token)
+        self.assertEqual(r.status_code, 204)
+        self.assertEqual(self.instance.table('cmdb_ci_ip_network'), {})
+
+    def test_batch(self):
+        sys_id = self.instance.insert('cmdb_ci', name='a')['sys_id']
+        results = self.client.batch(self.access_token, [
+            self.client.batch_request(1, 'POST', 'api/now/table/cmdb_ci', {'name': 'b'}),
+            self.client.batch_request(2, 'PUT', 'api/now/table/cmdb_ci/{}'.format(sys_id), {'name': 'c'}),
+            self.client.batch_request(3, 'GET', 'api/now/table/cmdb_ci/missing'),
+        ])
+        self.assertEqual(results['1'][0], 201)
+        self.assertEqual(results['2'], (200, {'result': dict(self.instance.table('cmdb_ci')[sys_id])}))
+        self.assertEqual(results['3'][0], 404)
+
+    def test_throttled_requests_are_retried(self):
+        self.instance.inject(429, count=2, retry_after=0)
+        r = self.client.send('GET', self.client.table_url('cmdb_ci'), self.access_token)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(self.instance.calls[('GET', '/api/now/table/cmdb_ci', 429)], 2)
+
+    def test_pull_refreshes_expired_token(self):
+        cmdb_type = CMDBCompleteType(endpoint='cmdb_ci_ip_network')
+        cmdb_objects = list(CMDBObject.objects.filter(type=cmdb_type))
+        for index, cmdb_object in enumerate(cmdb_objects):
+            cmdb_object.service_now_id = self.instance.insert(cmdb_type.endpoint,
+                                                              subnet='10.0.{}.0'.format(index))['sys_id']
+            cmdb_object.save()
+        for _ in range(3):
+            self.instance.insert(cmdb_type.endpoint, subnet='192.168.0.0')
+
+        user = UserFactory()
+        ServiceNowToken.create_token(ServiceNowToken.get_credentials('admin', 'secret'), user)
+        self.instance.expire_tokens()
+
+        stats = TablePuller(cmdb_type, TokenProvider(user), page_size=2).run()
+        self.assertEqual(stats['records'], len(cmdb_objects) + 3)
+        self.assertEqual(cmdb_objects[0].key_value, {'subnet': '10.0.0.0'})
+        self.assertEqual(self.instance.calls[('POST', '/oauth_token.do', 200)], 2)
@@ -0,0 +1,75 @@
+from unittest.mock import MagicMock
+
+from django.utils import timezone
+from requests import ConnectionError
+
+from service_now_cmdb.models import CMDBObjectType, CMDBObjectField, CMDBObject, CMDBObjectValue, CMDBOutbox
+from service_now_cmdb.sync import OutboxWorker
+from service_now_cmdb.tests.base_test import BaseTest
+from service_now_cmdb.tests.models.factories import CMDBCompleteType
+
+
+class TestOutboxWorker(BaseTest):
+    def setUp(self):
+        self.cmdb_type = CMDBCompleteType()
+        self.cmdb_object = CMDBObject.objects.get(type=self.cmdb_type)
+        self.handler = MagicMock()
+
+    def tearDown(self):
+        CMDBOutbox.objects.all().delete()
+        CMDBObjectType.objects.all().delete()
+        CMDBObjectField.objects.all().delete()
+        CMDBObject.objects.all().delete()
+        CMDBObjectValue.objects.all().delete()
+
+    def test_enqueue_collapses(self):
+        CMDBOutbox.enqueue(self.cmdb_object)
+        CMDBOutbox.enqueue(self.cmdb_object)
+        self.assertEqual(CMDBOutbox.objects.count(), 1)
+
+    def test_enqueue_keeps_lease(self):
+        CMDBOutbox.enqueue(self.cmdb_object)
+        worker = OutboxWorker(self.handler, concurrency=1)
+        leased = worker.claim()[0]
+        CMDBOutbox.enqueue(self.cmdb_object)
+        CMDBOutbox.enqueue_many([self.cmdb_object])
+        outbox = CMDBOutbox.objects.get(object=self.cmdb_object)
+        self.assertGreater(outbox.available, timezone.now())
+        self.assertEqual(worker.claim(), [])
+
+        self.assertEqual(worker._finish([leased], {}), (1, 0))
+        self.assertEqual(len(worker.claim()), 1)
+
+    def test_successful_push(self):
+        CMDBOutbox.enqueue(self.cmdb_object)
+        self.handler.push_many.return_value = {'created': [self.cmdb_object], 'updated': [], 'failed': []}
+        worker = OutboxWorker(self.handler, concurrency=1)
+        self.assertEqual(worker.run_once(), (1, 0))
+        self.assertFalse(CMDBOutbox.objects.exists())
+
+    def test_failed_push_is_retried_later(self):
+        CMDBOutbox.enqueue(self.cmdb_object)
+        self.handler.push_many.side_effect = ValueError("Bad Access Token")
+        worker = OutboxWorker(self.handler, concurrency=1)
+        self.assertEqual(worker.run_once(), (0, 1))
+        outbox = CMDBOutbox.objects.get(object=self.cmdb_object)
+        self.assertEqual(outbox.attempts, 1)
+        self.assertEqual(outbox.last_error, "Bad Access Token")
+
+    def test_removal(self):
+        CMDBOutbox.enqueue_many([self.cmdb_object], remove=True)
+        self.handler.delete_many.return_value = {'deleted': [self.cmdb_object], 'failed': []}
+        worker = OutboxWorker(self.handler, concurrency=1)
+        self.assertEqual(worker.run_once(), (1, 0))
+        self.handler.push_many.assert_not_called()
+        self.assertEqual(list(self.handler.delete_many.call_args[0][0]), [self.cmdb_object])
+
+    def test_connection_error_is_retried_later(self):
+        CMDBOutbox.enqueue(self.cmdb_object)
+        self.handler.push_many.side_effect = ConnectionError("Connection refused")
+        worker = OutboxWorker(self.handler, concurrency=1)
+        self.assertEqual(worker.run_once(), (0, 1))
+        self.assertEqual(CMDBOutbox.objects.get(object=self.cmdb_object).attempts, 1)
+
+    def test_empty_outbox(self):
+        self.assertEqual(OutboxWorker(self.handler).run_once(), (0, 0))
@@ -0,0 +1,52 @@
+from unittest.mock import patch
+
+from django.utils import timezone
+
+from service_now_cmdb.models.token import ServiceNowToken
+from service_now_cmdb.tests.base_test import BaseTest
+from service_now_cmdb.tests.models.factories import ServiceNowTokenFactory
+from service_now_cmdb.tokens import TokenProvider, get_token_provider, reset_token_providers
+
+
+class TestTokenProvider(BaseTest):
+    def setUp(self):
+        # ServiceNowTokenFactory always uses the same user, whose token another test may have left behind.
+        ServiceNowToken.objects.all().delete()
+        self.token = ServiceNowTokenFactory(expires=timezone.now() + timezone.timedelta(hours=1))
+        self.provider = TokenProvider(self.token.user, refresh_margin=60)
+
+    def tearDown(self):
+        ServiceNowToken.objects.all().delete()
+        reset_token_providers()
+
+    def test_cached_token(self):
+        self.assertEqual(self.provider.get(), self.token.access_token)
+        with patch.object(ServiceNowToken.objects, 'get') as get:
+            self.assertEqual(self.provider.get(), self.token.access_token)
+            get.assert_not_called()
+
+    def test_peek(self):
+        self.assertIsNone(self.provider.peek())
+        self.provider.get()
+        self.assertEqual(self.provider.peek(), self.token.access_token)
+        self.provider._token.expires = timezone.now()
+        self.assertIsNone(self.provider.peek())
+
+    @patch('service_now_cmdb.models.token.ServiceNowToken.get_new_token')
+    def test_refresh_before_expiry(self, get_new_token):
+        ServiceNowToken.objects.filter(pk=self.token.pk).update(expires=timezone.now() + timezone.timedelta(seconds=30))
+        self.provider.get()
+        get_new_token.assert_called_once_with()
+
+    @patch('service_now_cmdb.models.token.ServiceNowToken.get_new_token')
+    def test_refresh_skipped_when_already_replaced(self, get_new_token):
+        self.provider.refresh(stale="an older token")
+        get_new_token.assert_not_called()
+
+    @patch('service_now_cmdb.models.token.ServiceNowToken.get_new_token')
+    def test_refresh_rejected_token(self, get_new_token):
+        self.provider.refresh(stale=self.token.access_token)
+        get_new_token.assert_called_once_with()
+
+    def test_get_token_provider_is_shared(self):
+        self.assertIs(get_token_provider(self.token.user), get_token_provider(self.token.user))
@@ -0,0 +1,117 @@
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from service_now_cmdb.models import ServiceNowToken
+
+DEFAULT_TOKEN_REFRESH_MARGIN = 60
+
+
+class TokenProvider:
+    """
+    Keeps a user's ServiceNow access token in memory and refreshes it shortly before it expires.
+
+    Only one refresh runs at a time: a lock serializes the threads of this process and the token row is locked with
+    SELECT ... FOR UPDATE so other processes wait and then reuse the token that was just fetched.
+
+    A TokenProvider can be passed wherever an access token is expected. The clients then retry a request that got a
+    401 once with a refreshed token.
+    """
+
+    def __init__(self, user, refresh_margin=None):
+        self.user = user
+        self.refresh_margin = timezone.timedelta(seconds=(
+            refresh_margin if refresh_margin is not None else
+            getattr(settings, 'SERVICE_NOW_TOKEN_REFRESH_MARGIN', DEFAULT_TOKEN_REFRESH_MARGIN)
+        ))
+        self._lock = threading.Lock()
+        self._token = None
+
+    def __str__(self):
+        return self.get()
+
+    @property
+    def token(self):
+        """
+        :return: the cached ServiceNowToken, loaded on first use
+        """
+        if self._token is None:
+            with self._lock:
+                if self._token is None:
+                    self._token = ServiceNowToken.objects.get(user=self.user)
+        return self._token
+
+    def _is_fresh(self, token):
+        return bool(token.expires) and token.expires - self.refresh_margin > timezone.now()
+
+    def peek(self):
+        """
+        The cached access token without any locking, query or refresh, so it is safe to call on an event loop.
+
+        :return: the cached access token if it is still fresh, else None
+        """
+        token = self._token
+        if token is not None and self._is_fresh(token):
+            return token.access_token
+        return None
+
+    def get(self):
+        """
+        :return: a valid access token
+        """
+        token = self.token
+        if self._is_fresh(token):
+            return token.access_token
+        return self.refresh(stale=token.access_token)
+
+    def refresh(self, stale=None):
+        """
+        Fetch a new access token unless another thread or process already replaced the stale one.
+
+        :param stale: the access token that was rejected or is about to expire
+        :return: a valid access token
+        """
+        with self._lock:
+            if self._token is not None and self._token.access_token != stale and self._is_fresh(self._token):
+                return self._token.access_token
+
+            with transaction.atomic():
+                token = ServiceNowToken.objects.select_for_update().get(user=self.user)
+                if token.access_token == stale or not self._is_fresh(token):
+                    token.get_new_token()
+            self._token = token
+            return token.access_token
+
+    def reset(self):
+        """
+        Drop the cached token so the next call reads it from the database again.
+        """
+        with self._lock:
+            self._token = None
+
+
+_providers = dict()
+_providers_lock = threading.Lock()
+
+
+def get_token_provider(user):
+    """
+    Return the per process TokenProvider of the user.
+
+    :param user:
+    :return: TokenProvider
+    """
+    provider = _providers.get(user.pk)
+    if provider is None:
+        with _providers_lock:
+            provider = _providers.get(user.pk)
+            if provider is None:
+                provider = _providers[user.pk] = TokenProvider(user)
+    return provider
+
+
+def reset_token_providers():
+    with _providers_lock:
+        _providers.clear()
@@ -0,0 +1,143 @@
+from collections import namedtuple
+
+from django.db import transaction, IntegrityError
+
+from service_now_cmdb.models import CMDBObject, CMDBObjectValue, CMDBOutbox
+from service_now_cmdb.models.cmdb import json_storage
+from service_now_cmdb.schema import registry
+
+DEFAULT_UPSERT_BATCH_SIZE = 1000
+
+UpsertRecord = namedtuple('UpsertRecord', ['type_id', 'object_id', 'fields'])
+
+
+class BulkUpserter:
+    """
+    Creates or updates CMDB objects and their values from records such as
+    {"type": "IP Network", "object_id": 42, "fields": {"subnet": "10.0.0.0"}}.
+
+    Records are checked against the cached schema; invalid ones are reported and skipped. Valid ones are written a
+    batch at a time with one query for the existing objects, one bulk insert for the new ones and the bulk value
+    writes of CMDBObjectValue.objects.bulk_set, inside one transaction per batch.
+    """
+
+    def __init__(self, queue=False, batch_size=None):
+        self.queue = queue
+        self.batch_size = batch_size or DEFAULT_UPSERT_BATCH_SIZE
+        self.schemas = dict()
+        for schema in registry.all():
+            self.schemas[str(schema.type_id)] = schema
+            self.schemas.setdefault(schema.name, schema)
+        # Row storage keeps values in a CharField; JSON attributes have no limit.
+        self.max_length = None if json_storage() else CMDBObjectValue._meta.get_field('value').max_length
+        self.stats = {'received': 0, 'objects_created': 0, 'created': 0, 'updated': 0, 'queued': 0}
+        self.errors = []
+
+    def validate(self, record):
+        """
+        :param record: decoded record
+        :return: UpsertRecord
+        :raises ValueError: describing the first problem of the record
+        """
+        if not isinstance(record, dict):
+            raise ValueError("A record must be an object.")
+        schema = self.schemas.get(str(record.get('type')))
+        if schema is None:
+            raise ValueError("Unknown CMDB object type '{}'.".format(record.get('type')))
+        try:
+            object_id = int(record.get('object_id'))
+        except (TypeError, ValueError):
+            raise ValueError("object_id must be an integer.")
+        if object_id < 0:
+            raise ValueError("object_id must be positive.")
+        fields = record.get('fields') or {}
+        if not isinstance(fields, dict):
+            raise ValueError("fields must be an object.")
+        sourced = {field.name for field in schema.sourced_fields}
+        values = dict()
+        for name, value in fields.items():
+            if name not in schema.field_ids:
+                raise ValueError("There is no field '{}' associated with the object type '{}'.".format(
+                    name, schema.name))
+            if name in sourced:
+                raise ValueError("The field '{}' is computed from the mapped model.".format(name))
+            values[name] = self.clean_value(name, value)
+        return UpsertRecord(schema.type_id, object_id, values)
+
+    def clean_value(self, name, value):
+        """
+        :return: the value as stored, null as ''
+        :raises ValueError: if the value is an object or an array, or too long
+        """
+        if isinstance(value, (dict, list)):
+            raise ValueError("The value of the field '{}' must be a string, a number or null.".format(name))
+        value = '' if value is None else str(value)
+        if self.max_length is not None and len(value) > self.max_length:
+            raise ValueError("The value of the field '{}' is longer than {} characters.".format(name, self.max_length))
+        return value
+
+    def _objects(self, keys):
+        """
+        :param keys: set of (type_id, object_id)
+        :return: Dictionary of (type_id, object_id) -> CMDBObject, creating the missing objects
+        """
+        def existing():
+            queryset = CMDBObject.objects.filter(type_id__in={type_id for type_id, _ in keys},
+                                                 object_id__in={object_id for _, object_id in keys})
+            return {(cmdb_object.type_id, cmdb_object.object_id): cmdb_object
+                    for cmdb_object in queryset.only('pk', 'type_id', 'object_id')
+                    if (cmdb_object.type_id, cmdb_object.object_id) in keys}
+
+        objects = existing()
+        missing = keys - set(objects)
+        if missing:
+            try:
+                with transaction.atomic():
+                    CMDBObject.objects.bulk_create([CMDBObject(type_id=type_id, object_id=object_id)
+                                                    for type_id, object_id in missing])
+                self.stats['objects_created'] += len(missing)
+            except IntegrityError:
+                # Another request created some of them in the meantime.
+                for type_id, object_id in missing - set(existing()):
+                    CMDBObject.objects.get_or_create(type_id=type_id, object_id=object_id)
+            objects = existing()
+        return objects
+
+    def write(self, records):
+        """
+        :param records: list of UpsertRecord
+        """
+        with transaction.atomic():
+            objects = self._objects({(record.type_id, record.object_id) for record in records})
+            changed = set()
+            created, updated = CMDBObjectValue.objects.bulk_set(
+                ((objects[(record.type_id, record.object_id)], name, value)
+                 for record in records for name, value in record.fields.items()),
+                batch_size=self.batch_size, changed=changed
+            )
+            self.stats['created'] += created
+            self.stats['updated'] += updated
+            if self.queue and changed:
+                self.stats['queued'] += CMDBOutbox.enqueue_many([CMDBObject(pk=pk) for pk in changed])
+
+    def run(self, records):
+        """
+        :param records: iterable of decoded records, or of ValueError for records that could not be decoded
+        :return: Dictionary with the counts and the errors as {"index": ..., "error": ...}
+        """
+        batch = []
+        for index, record in enumerate(records):
+            self.stats['received'] += 1
+            try:
+                if isinstance(record, ValueError):
+                    raise record
+                batch.append(self.validate(record))
+            except ValueError as e:
+                self.errors.append({'index': index, 'error': str(e)})
+                continue
+            if len(batch) >= self.batch_size:
+                self.write(batch)
+                batch = []
+        if batch:
+            self.write(batch)
+        return dict(self.stats, errors=self.errors)
@@ -1,7 +1,7 @@
-from django.conf.urls import url
+from django.conf.urls import url, include
 
 app_name = 'service_now_cmdb'
 
 urlpatterns = [
-
-]
\ No newline at end of file
+    url(r'^api/', include('service_now_cmdb.api.urls')),
+]
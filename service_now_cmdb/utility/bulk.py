@@ -0,0 +1,49 @@
+from django.db.models import Case, When, Value
+
+
+def chunks(iterable, size):
+    """
+    Split an iterable into lists of at most size items.
+
+    :param iterable:
+    :param size:
+    :return: Generator
+    """
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def bulk_update(objs, fields, batch_size=None):
+    """
+    Update the given fields on many saved instances of one model with one UPDATE per batch.
+
+    Uses QuerySet.bulk_update when Django provides it, otherwise builds the same CASE WHEN statement.
+
+    :param objs: list of model instances
+    :param fields: list of field names
+    :param batch_size:
+    :return: number of rows updated
+    """
+    objs = list(objs)
+    if not objs:
+        return 0
+    model = type(objs[0])
+    manager = model._default_manager
+    if hasattr(manager, 'bulk_update'):
+        return manager.bulk_update(objs, fields, batch_size=batch_size) or len(objs)
+
+    updated = 0
+    for batch in chunks(objs, batch_size or len(objs)):
+        kwargs = dict()
+        for name in fields:
+            field = model._meta.get_field(name)
+            whens = [When(pk=obj.pk, then=Value(getattr(obj, field.attname), output_field=field)) for obj in batch]
+            kwargs[field.attname] = Case(*whens, output_field=field)
+        updated += manager.filter(pk__in=[obj.pk for obj in batch]).update(**kwargs)
+    return updated
@@ -0,0 +1,66 @@
+import json
+
+from django.db import models
+from django.db.models import Lookup
+
+
+class JSONTextField(models.TextField):
+    """
+    A dictionary serialized as JSON text, so it works on every database backend. On PostgreSQL the column can be
+    indexed and queried as jsonb through the has_values lookup.
+    """
+
+    def from_db_value(self, value, expression, connection, *args):
+        return self.to_python(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, dict):
+            return value
+        if not value:
+            return dict()
+        return json.loads(value)
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            return value
+        return json.dumps(value, sort_keys=True)
+
+    def value_to_string(self, obj):
+        return self.get_prep_value(self.value_from_object(obj))
+
+
+@JSONTextField.register_lookup
+class HasValues(Lookup):
+    """
+    Filter on key/value pairs of the dictionary: attributes__has_values={'name': 'core-01'}.
+
+    PostgreSQL uses jsonb containment, which the GIN index on the column serves. Other backends compare
+    json_extract() of each key, unquoted on MySQL where it returns JSON.
+    """
+    lookup_name = 'has_values'
+    prepare_rhs = False
+
+    def extract_sql(self, compiler, connection, template):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        if not self.rhs:
+            return '1 = 1', []
+        conditions = []
+        params = []
+        for name, value in sorted(self.rhs.items()):
+            conditions.append(template.format(lhs))
+            params.extend(lhs_params + ['$."{}"'.format(name), str(value)])
+        return " AND ".join(conditions), params
+
+    def as_sql(self, compiler, connection):
+        return self.extract_sql(compiler, connection, "json_extract({}, %s) = %s")
+
+    def as_mysql(self, compiler, connection):
+        return self.extract_sql(compiler, connection, "JSON_UNQUOTE(JSON_EXTRACT({}, %s)) = %s")
+
+    def as_postgresql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        return "({})::jsonb @> %s::jsonb".format(lhs), lhs_params + [
+            json.dumps({name: str(value) for name, value in self.rhs.items()})
+        ]
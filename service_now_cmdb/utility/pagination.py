@@ -0,0 +1,26 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+DEFAULT_ESTIMATE_THRESHOLD = 100000
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    A paginator that takes the number of rows of an unfiltered PostgreSQL table from the planner statistics instead of
+    running COUNT(*), which scans the whole table. Small tables, filtered querysets and other databases are counted
+    exactly.
+    """
+    estimate_threshold = DEFAULT_ESTIMATE_THRESHOLD
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[getattr(queryset, 'db', 'default')]
+        if connection.vendor == 'postgresql' and hasattr(queryset, 'query') and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT reltuples FROM pg_class WHERE relname = %s", [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] >= self.estimate_threshold:
+                return int(row[0])
+        return super(EstimatedCountPaginator, self).count